@@ -0,0 +1,548 @@
+'''
+Library API of EzAudioMeta, to tag (and read) files from Python without the
+CLI: nothing is printed and the process is never terminated, the files are
+yielded back as result objects and the errors raised as the exceptions
+below. The CLI (EzAudioMeta.main) is built on top of it.
+
+    from EzAudioMeta.api import Parsers, tag_files
+
+    for result in tag_files(paths, {"album": "Infierno", "year": 1999},
+                            Parsers(track_number="\\d+(?= )"), jobs=4):
+        print(result.file, result.written)
+
+The building blocks tag_files, read_tags and hash_audio are made of are
+public too, for callers that drive the pool themselves (the CLI and the
+service do): worker_pool creates the executor, tag_results and
+hash_results run files through it in order, and tag_file, plan_file,
+read_file_tags and hash_file are the work done per file in the workers.
+Their tuples are documented in each function, and audio_extensions are the
+extensions of the files they can open.
+'''
+from collections import namedtuple
+from hashlib import sha1
+from re import error
+from time import perf_counter
+
+from EzAudioMeta.audio import base_audio
+from EzAudioMeta.audio.artwork import artwork_data, describe_artwork
+from EzAudioMeta.utilities.optional_string_matchers import\
+    OptionalStringMatchers
+
+str_tags = ["album", "albumartist", "comment", "composer", "genre",
+            "lyrics", "tracktitle", "isrc", "artist"]
+
+int_tags = ["compilation", "discnumber", "totaldiscs", "totaltracks",
+            "tracknumber", "year", ]
+
+valid_extensions = ["aac", "aiff", "dsf", "flac", "m4a", "mp3",
+                    "ogg", "opus", "wav", "wv"]
+
+# valid_extensions as a set, to check the extension of each file.
+audio_extensions = frozenset(valid_extensions)
+
+# tags written by --export, 'artwork' is left out (it's binary) and so is
+# 'title' (it's the same as 'tracktitle').
+export_tags = str_tags + int_tags
+
+_op_str_matchers = OptionalStringMatchers()
+
+# the artwork set to all the files, shared with each worker once (see
+# worker_pool) instead of with each file.
+_shared_artwork = None
+
+# A file that could not be tagged. stage is where it failed: 'parse' (the
+# file name), 'load', 'set' or 'write' ('hash' for hash_audio).
+TagFailure = namedtuple("TagFailure", ["file", "error_type", "message",
+                                       "stage"])
+
+# The tagged file of tag_files. tags are the tags set to it (with the ones
+# parsed from its name, and the sha1 digest of the artwork). written is True
+# if the file was saved, False if its tags were already up to date.
+# full_rewrite is True if the whole file had to be rewritten, False if the
+# tags were updated in place, None if not written or unknown. failure is
+# None if the file was tagged, else a TagFailure.
+TagResult = namedtuple("TagResult", ["file", "tags", "written",
+                                     "full_rewrite", "failure"])
+
+# The file read by read_tags. tags is a dict of the tags read, None if the
+# file couldn't be read, then failure is its TagFailure.
+ReadResult = namedtuple("ReadResult", ["file", "tags", "failure"])
+
+# The file hashed by hash_audio. audio_digest is the sha1 digest of its audio
+# payload (see audio.audio_hash), None if the file couldn't be hashed, then
+# failure is its TagFailure.
+HashResult = namedtuple("HashResult", ["file", "audio_digest", "failure"])
+
+# The regex expressions the tracktitle (capitalized, as is or cleaned up and
+# capitalized, see OptionalStringMatchers) and the tracknumber are parsed
+# from the file names with. The ones left None are not parsed.
+Parsers = namedtuple("Parsers", ["title_capitalize", "title_as_is",
+                                 "title_clean", "track_number"],
+                     defaults=(None, None, None, None))
+
+
+class EzAudioMetaError(Exception):
+    '''
+    Base of the errors raised by the API.
+    '''
+
+
+class InvalidTagError(EzAudioMetaError, ValueError):
+    '''
+    A tag that doesn't exist, a value of the wrong type, or no tags at all.
+    '''
+
+
+class InvalidPatternError(EzAudioMetaError, ValueError):
+    '''
+    A parser that is not a valid regex expression.
+    '''
+
+
+class TaggingError(EzAudioMetaError):
+    '''
+    A file that couldn't be tagged (or read), its TagFailure is in failure.
+    '''
+
+    def __init__(self, failure: TagFailure) -> None:
+        super().__init__(f"{failure.file} [{failure.stage}]" +
+                         f" {failure.error_type}: {failure.message}")
+        self.failure = failure
+
+
+def validate_tags(tags: dict) -> dict:
+    '''
+    Receives the tags to set, the str_tags have to be strings, the int_tags
+    integers and the 'artwork' an image (bytes or a music_tag Artwork).
+    -----
+    Returns: a dict of the tags that are not None.
+    Raises: InvalidTagError if a tag doesn't exist or is of the wrong type.
+    '''
+    tags_to_set = {}
+    for tag, value in tags.items():
+        if value is None:
+            continue
+        if tag in str_tags:
+            if not isinstance(value, str):
+                raise InvalidTagError(f"'{tag}' is expected to be a" +
+                                      " sequence of characters.")
+        elif tag in int_tags:
+            if not isinstance(value, int):
+                raise InvalidTagError(f"'{tag}' is expected to be a" +
+                                      " sequence of numbers.")
+        elif tag == "artwork":
+            if not isinstance(value, bytes) and not hasattr(value, "raw"):
+                raise InvalidTagError("'artwork' is expected to be the" +
+                                      " bytes of a JPEG or PNG image.")
+        else:
+            raise InvalidTagError(f"Unknown tag: '{tag}'.")
+        tags_to_set[tag] = value
+    return tags_to_set
+
+
+def compile_parsers(parsers: Parsers = None) -> Parsers:
+    '''
+    Returns: the parsers with their regex expressions compiled (and cached,
+    see OptionalStringMatchers.compile_pattern).
+    Raises: InvalidPatternError if an expression is not valid.
+    '''
+    compiled = []
+    for pattern in (parsers or Parsers()):
+        try:
+            compiled.append(None if pattern is None
+                            else _op_str_matchers.compile_pattern(pattern))
+        except error as e:
+            raise InvalidPatternError("Error in regex:" + pattern + ":" +
+                                      e.msg) from e
+    return Parsers(*compiled)
+
+
+def tag_files(paths, tags: dict, parsers: Parsers = None, jobs: int = 1,
+              padding: int = None, keep_going: bool = False):
+    '''
+    Tags the audio files of the given paths (any iterable, like the
+    generator of utilities.file_discovery.scan_audio_files, it's consumed as
+    the files are tagged) with the tags, and the tags parsed from the name
+    of each file with the parsers. With more than 1 job, the files are
+    tagged in a pool of worker processes. The artwork (if any) is sent to
+    each worker once. padding is the padding reserved in the files whose
+    tags don't fit (see BaseAudio.write_tags). The tags and parsers are
+    validated here, before any file is touched.
+    -----
+    Returns: a generator of a TagResult for each file, in the same order as
+    the paths (the files whose name can't be parsed too). The files are
+    tagged as it's iterated.
+    Raises: InvalidTagError or InvalidPatternError. The generator raises
+    TaggingError on the first file that fails, unless keep_going is set,
+    then the failures are yielded as results.
+    '''
+    tags_to_set = validate_tags(tags)
+    parsers = compile_parsers(parsers)
+    if not tags_to_set and not any(parsers):
+        raise InvalidTagError("No tags specified.")
+    artwork = tags_to_set.pop("artwork", None)
+    if isinstance(artwork, bytes):
+        from EzAudioMeta.audio.artwork import artwork_from_bytes
+        try:
+            artwork = artwork_from_bytes(artwork)
+        except ValueError as e:
+            raise InvalidTagError(f"'artwork': {e}") from e
+    return _tagged(paths, tags_to_set, parsers, jobs, padding, keep_going,
+                   artwork)
+
+
+def _tagged(paths, tags_to_set: dict, parsers: Parsers, jobs: int,
+            padding: int, keep_going: bool, artwork):
+    from functools import partial
+
+    if artwork is not None:
+        tags_to_set = dict(tags_to_set,
+                           artwork=sha1(artwork_data(artwork)).hexdigest())
+    executor, workers = worker_pool(jobs, artwork)
+    try:
+        for file, file_tags, (written, failure, _, full_rewrite) in\
+                tag_results(paths, tags_to_set, parsers,
+                            partial(tag_file, padding=padding), executor,
+                            workers):
+            if failure is not None and not keep_going:
+                raise TaggingError(failure)
+            yield TagResult(file, file_tags, written, full_rewrite, failure)
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+def read_tags(paths, tags: list = None, jobs: int = 1,
+              keep_going: bool = False):
+    '''
+    Reads the given tags (by default export_tags) of the audio files of the
+    given paths, only their tag header when the format is supported by the
+    header reader. With more than 1 job, in a pool of worker processes.
+    -----
+    Returns: a generator of a ReadResult for each file, in the same order
+    as the paths.
+    Raises: InvalidTagError if a tag can't be read. The generator raises
+    TaggingError on the first file that fails, unless keep_going is set,
+    then the failures are yielded as results.
+    '''
+    tags = export_tags if tags is None else list(tags)
+    for tag in tags:
+        if tag not in export_tags:
+            raise InvalidTagError(f"Unknown tag: '{tag}'.")
+    return _read(paths, tags, jobs, keep_going)
+
+
+def _read(paths, tags: list, jobs: int, keep_going: bool):
+    from functools import partial
+    from EzAudioMeta.utilities.pipeline import run_pipeline
+
+    executor, workers = worker_pool(jobs)
+    try:
+        for file, (row, failure) in run_pipeline(
+                paths, lambda file: file, partial(read_file_tags, tags=tags),
+                executor, workers):
+            if failure is not None and not keep_going:
+                raise TaggingError(failure)
+            if row is not None:
+                del row["file"]
+            yield ReadResult(file, row, failure)
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+def hash_audio(paths, jobs: int = 1, keep_going: bool = False):
+    '''
+    Hashes the audio payload of the files of the given paths, skipping their
+    tags, so the files with the same audio get the same digest. With more
+    than 1 job, in a pool of worker processes.
+    -----
+    Returns: a generator of a HashResult for each file, in the same order
+    as the paths.
+    Raises: the generator raises TaggingError on the first file that fails,
+    unless keep_going is set, then the failures are yielded as results.
+    '''
+    executor, workers = worker_pool(jobs)
+    try:
+        for file, (digest, failure, _) in hash_results(paths, executor,
+                                                       workers):
+            if failure is not None and not keep_going:
+                raise TaggingError(failure)
+            yield HashResult(file, digest, failure)
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+def hash_results(files, executor, workers: int, known=None):
+    '''
+    Runs the files through the pipeline (see utilities.pipeline), their
+    audio is hashed (hash_file) in the executor. If known(file) returns a
+    digest, the file is not hashed again.
+    -----
+    Yields: a tuple (file, outcome) for each file, in the same order as the
+    files, with outcome what hash_file returned (audio_digest, failure,
+    file_stat). A known file is yielded in its place with its digest and
+    no file_stat.
+    '''
+    from EzAudioMeta.utilities.pipeline import Finished, run_pipeline
+
+    def prepare(a_file):
+        if known is not None:
+            digest = known(a_file)
+            if digest is not None:
+                return Finished(a_file, (digest, None, None))
+        return a_file
+
+    yield from run_pipeline(files, prepare, hash_file, executor, workers)
+
+
+def hash_file(file: str) -> tuple:
+    '''
+    Hashes the audio payload of a file. Runs in the worker processes, so
+    nothing is printed here.
+    -----
+    Returns: a tuple (audio_digest, failure, file_stat). file_stat is a
+    tuple (size, mtime_ns) of the file before it was hashed. failure is None
+    if the file was hashed, else a TagFailure.
+    '''
+    from os import stat
+    from EzAudioMeta.audio.audio_hash import audio_digest
+
+    try:
+        file_stat = stat(file)
+        digest = audio_digest(file)
+    except Exception as e:
+        return None, TagFailure(file, type(e).__name__, str(e), "hash"), None
+    return digest, None, (file_stat.st_size, file_stat.st_mtime_ns)
+
+
+def tag_results(files, tags_to_set: dict, parsers: tuple, work, executor,
+                workers: int, skip=None, timings=None, profiler=None):
+    '''
+    Runs the files through the pipeline (see utilities.pipeline): the tags
+    of each file are parsed from its name with the parsers, and the work
+    (tag_file or plan_file) runs in the executor. A file can also be a
+    (file, tags) pair, then its tags are set on top of tags_to_set (like
+    the rows of a manifest). The files skip(file, file_tags) is True for are
+    not sent to the work. If timings are given, the discovery and parse
+    stages are timed (and the work is asked to time its stages). If a
+    profiler is given, the parse stage is profiled.
+    -----
+    Yields: a tuple (file, file_tags, outcome) for each file, in order, with
+    outcome what the work returned (written, failure, stage_seconds,
+    full_rewrite). A file whose name couldn't be parsed is not sent to the
+    work, it's yielded in its place with its file_tags None and its failure.
+    '''
+    from EzAudioMeta.utilities.pipeline import Finished, run_pipeline
+
+    timed = timings is not None
+
+    def prepare(a_file):
+        start = perf_counter() if timed else 0
+        file_tags = tags_to_set
+        if isinstance(a_file, tuple):
+            a_file, row_tags = a_file
+            file_tags = dict(tags_to_set, **row_tags)
+        try:
+            file_tags = _parsed_tags(a_file, file_tags, *parsers)
+        except Exception as e:
+            failure = TagFailure(a_file, type(e).__name__, str(e), "parse")
+            return Finished((a_file, None, timed),
+                            (False, failure, None, None))
+        if timed:
+            timings.add("parse", perf_counter() - start)
+        if skip is not None and skip(a_file, file_tags):
+            return None
+        return a_file, file_tags, timed
+
+    if profiler is not None:
+        prepare = profiler.wrap(prepare)
+    if timed:
+        files = timings.timed(files)
+
+    for (a_file, file_tags, _), outcome in run_pipeline(files, prepare, work,
+                                                        executor, workers):
+        yield a_file, file_tags, outcome
+
+
+def _parsed_tags(a_file,
+                 tags_to_set: dict,
+                 parse_title_capitalize,
+                 parse_title_as_is,
+                 parse_title_clean,
+                 parse_track_number) -> dict:
+    '''
+    Returns the tags to set to the given file, with the tags parsed from the
+    file name added.
+    '''
+    # each file gets its own copy, the parsed tags differ per file.
+    tags_to_set = dict(tags_to_set)
+
+    # If parse from title is set, then each time a track is received, the
+    # file name will be parsed to extract the track title and added to
+    # the tags to set dict. Since its called for all tracks, it will always
+    # update before setting the tags to file.
+    if parse_title_capitalize:
+        tags_to_set["tracktitle"] =\
+             _op_str_matchers.\
+             extract_track_title_capitalize(a_file,
+                                            parse_title_capitalize)
+
+    if parse_title_as_is:
+        tags_to_set["tracktitle"] =\
+             _op_str_matchers.extract_track_title_as_is(a_file,
+                                                        parse_title_as_is)
+
+    if parse_title_clean:
+        tags_to_set["tracktitle"] =\
+            _op_str_matchers.extract_track_title_cleanup_and_capitalize(
+                a_file,
+                parse_title_clean
+            )
+
+    if parse_track_number:
+        # like OptionalStringMatchers.extract_track_number, but a match that
+        # is not a number is a failure of the file, not the end of the
+        # process.
+        match = _op_str_matchers.compile_pattern(parse_track_number)\
+            .search(a_file)
+        tags_to_set["tracknumber"] = int(match.group(0)) if match else 0
+
+    return tags_to_set
+
+
+def worker_pool(jobs: int, artwork=None) -> tuple:
+    '''
+    Returns: a tuple (executor, workers) with the executor the files are
+    processed in and how many of them are sent to it at the same time.
+    The artwork (if any) is shared with each worker when it starts.
+    '''
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    if jobs <= 1:
+        # a single worker thread, the files are still processed one at a
+        # time.
+        return ThreadPoolExecutor(max_workers=1, initializer=_share_artwork,
+                                  initargs=(artwork,)), 1
+    # twice the jobs, so each process has the next file already queued.
+    return ProcessPoolExecutor(max_workers=jobs, initializer=_share_artwork,
+                               initargs=(artwork,)), jobs * 2
+
+
+def _share_artwork(artwork) -> None:
+    global _shared_artwork
+    _shared_artwork = artwork
+
+
+def _with_shared_artwork(tags_to_set: dict) -> dict:
+    '''
+    Returns the tags to set with the digest of the artwork replaced by the
+    artwork shared with the worker.
+    '''
+    if "artwork" not in tags_to_set:
+        return tags_to_set
+    return dict(tags_to_set, artwork=_shared_artwork)
+
+
+def tag_file(file_and_tags: tuple, padding: int = None) -> tuple:
+    '''
+    Loads, sets and writes the tags of a single (file, tags_to_set, timed)
+    item, reserving the given padding if the tags don't fit (see
+    BaseAudio.write_tags). Runs in the worker processes, so nothing is
+    printed here.
+    -----
+    Returns: a tuple (written, failure, stage_seconds, full_rewrite).
+    written is True if the file was saved, False if its tags were already up
+    to date. failure is None if the file was tagged, else a TagFailure.
+    stage_seconds is a dict of the seconds each stage took if timed is set,
+    else None. full_rewrite is True if the whole file had to be rewritten,
+    False if the tags were updated in place, None if not written or
+    unknown.
+    '''
+    file, tags_to_set, timed = file_and_tags
+    tags_to_set = _with_shared_artwork(tags_to_set)
+    stage = "load"
+    audio_file = base_audio.BaseAudio()
+    try:
+        start = perf_counter() if timed else 0
+        # the current values are compared with the header reader, the file
+        # is only fully loaded if a tag has to change.
+        audio_file.load_track(file, header_only=True)
+        loaded = perf_counter() if timed else 0
+        header_load_seconds = audio_file.full_load_seconds
+        stage = "set"
+        audio_file.set_tags(**tags_to_set)
+        tags_set = perf_counter() if timed else 0
+        stage = "write"
+        written = audio_file.write_tags(padding)
+    except Exception as e:
+        # the full load happens on the first tag that changes.
+        if stage == "set" and not audio_file.is_loaded:
+            stage = "load"
+        failure = TagFailure(file, type(e).__name__, str(e), stage)
+        return False, failure, None, None
+
+    if not timed:
+        return written, None, None, audio_file.full_rewrite
+    # music_tag loads the file either instead of the header reader, or
+    # when setting the first tag that changes.
+    set_load_seconds = audio_file.full_load_seconds - header_load_seconds
+    return written, None, {
+        "read_header": loaded - start - header_load_seconds,
+        "load": audio_file.full_load_seconds,
+        "set": tags_set - loaded - set_load_seconds,
+        "write": perf_counter() - tags_set,
+    }, audio_file.full_rewrite
+
+
+def plan_file(file_and_tags: tuple) -> tuple:
+    '''
+    Reads the current tags of a single (file, tags_to_set, timed) item and
+    compares them with the tags to set, nothing is written. Runs in the
+    worker processes, so nothing is printed here.
+    -----
+    Returns: a tuple (changes, failure, stage_seconds, None), like
+    tag_file. changes is a dict of tag: (current value, new value) of the
+    tags that would change. failure is None if the file was read, else a
+    TagFailure. stage_seconds is a dict of the seconds each stage took if
+    timed is set, else None.
+    '''
+    file, tags_to_set, timed = file_and_tags
+    tags_to_set = _with_shared_artwork(tags_to_set)
+    audio_file = base_audio.BaseAudio()
+    try:
+        start = perf_counter() if timed else 0
+        audio_file.load_track(file, header_only=True)
+        changes = audio_file.tag_changes(**tags_to_set)
+    except Exception as e:
+        failure = TagFailure(file, type(e).__name__, str(e), "load")
+        return {}, failure, None, None
+    # the images are not sent back, only what they are.
+    if "artwork" in changes:
+        changes["artwork"] = tuple(describe_artwork(artwork)
+                                   for artwork in changes["artwork"])
+
+    if not timed:
+        return changes, None, None, None
+    # the file is fully loaded if a tag can't be read from its header.
+    return changes, None, {
+        "read_header": perf_counter() - start - audio_file.full_load_seconds,
+        "load": audio_file.full_load_seconds,
+    }, None
+
+
+def read_file_tags(file: str, tags: list = export_tags) -> tuple:
+    '''
+    Reads the given tags (by default the tags exported, export_tags) of a
+    file. Runs in the worker processes, so nothing is printed here.
+    -----
+    Returns: a tuple (row, failure). row is a dict with the file and its
+    tags, None if the file couldn't be read. failure is None if the file was
+    read, else a TagFailure.
+    '''
+    audio_file = base_audio.BaseAudio()
+    try:
+        audio_file.load_track(file, header_only=True)
+        row = {tag: audio_file.get_tag(tag) for tag in tags}
+    except Exception as e:
+        return None, TagFailure(file, type(e).__name__, str(e), "load")
+    row["file"] = file
+    return row, None
@@ -0,0 +1,136 @@
+'''
+Cover images for the 'artwork' tag. The image is read (and resized, if asked
+to) once, and the same music_tag Artwork is set to every file, with its
+format and size already known so it's not decoded again for each file.
+Resizing needs Pillow, it's optional otherwise.
+'''
+from io import BytesIO
+from struct import unpack
+
+# JPEG start of frame markers (the ones with the image size).
+_JPEG_SOF_MARKERS = frozenset([0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+                               0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF])
+# bits per pixel of each PNG color type, per bit of depth.
+_PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+
+def image_info(data: bytes) -> tuple:
+    '''
+    Reads the format, size and color depth of a JPEG or PNG image from its
+    header.
+    -----
+    Returns: a tuple (format, width, height, depth).
+    Raises: ValueError if the data is not a JPEG or PNG image.
+    '''
+    try:
+        if data[:8] == b"\x89PNG\r\n\x1a\n" and data[12:16] == b"IHDR":
+            width, height, bit_depth, color_type = unpack(">IIBB",
+                                                          data[16:26])
+            return "png", width, height, bit_depth * _PNG_CHANNELS[color_type]
+        if data[:3] == b"\xff\xd8\xff":
+            return _jpeg_info(data)
+    except (KeyError, IndexError, ValueError) as e:
+        raise ValueError("The image is damaged.") from e
+    raise ValueError("The image is expected to be a JPEG or PNG file.")
+
+
+def _jpeg_info(data: bytes) -> tuple:
+    offset = 2
+    while offset + 4 <= len(data):
+        if data[offset] != 0xFF:
+            raise ValueError()
+        marker = data[offset + 1]
+        # padding between markers.
+        if marker == 0xFF:
+            offset += 1
+            continue
+        length = unpack(">H", data[offset + 2:offset + 4])[0]
+        if marker in _JPEG_SOF_MARKERS:
+            bits, height, width, components = unpack(
+                ">BHHB", data[offset + 4:offset + 10])
+            return "jpeg", width, height, bits * components
+        offset += 2 + length
+    raise ValueError()
+
+
+def read_artwork(image_path: str, max_size: int = None):
+    '''
+    Reads the image file and returns it as a music_tag Artwork, ready to be
+    set to any number of files. If max_size is given, an image wider or
+    taller than max_size pixels is scaled down (keeping its aspect ratio)
+    and encoded again in its format.
+    -----
+    Raises: ValueError if it's not a JPEG or PNG image, ImportError if it
+    has to be resized and Pillow is not installed, OSError if it can't be
+    read.
+    '''
+    with open(image_path, "rb") as image_file:
+        data = image_file.read()
+    fmt, width, height, _ = image_info(data)
+
+    if max_size is not None and max(width, height) > max_size:
+        data = _resized(data, fmt, max_size)
+
+    return artwork_from_bytes(data)
+
+
+def artwork_from_bytes(data: bytes):
+    '''
+    Returns the image data as a music_tag Artwork, with its format and size
+    read from its header (music_tag would decode it with Pillow otherwise).
+    -----
+    Raises: ValueError if it's not a JPEG or PNG image.
+    '''
+    from music_tag.file import Artwork
+
+    fmt, width, height, depth = image_info(data)
+    return Artwork(data, width=width, height=height, fmt=fmt, depth=depth)
+
+
+def artwork_data(artwork) -> bytes:
+    '''
+    Returns the image data of an Artwork (or of the bytes given), to compare
+    it. The APEv2 tags (WavPack) keep a file name before the data, it's
+    left out.
+    '''
+    if artwork is None:
+        return None
+    data = getattr(artwork, "raw", artwork)
+    if not data.startswith((b"\xff\xd8", b"\x89PNG")):
+        name_end = data.find(b"\x00", 0, 256)
+        if name_end != -1:
+            return data[name_end + 1:]
+    return data
+
+
+def _resized(data: bytes, fmt: str, max_size: int) -> bytes:
+    try:
+        from PIL import Image
+    except ImportError as e:
+        raise ImportError("Pillow is needed to resize the artwork" +
+                          " (pip install Pillow).") from e
+
+    image = Image.open(BytesIO(data))
+    image.thumbnail((max_size, max_size))
+    resized = BytesIO()
+    if fmt == "jpeg":
+        if image.mode not in ("RGB", "L", "CMYK"):
+            image = image.convert("RGB")
+        image.save(resized, "JPEG", quality=90)
+    else:
+        image.save(resized, "PNG", optimize=True)
+    return resized.getvalue()
+
+
+def describe_artwork(artwork) -> str:
+    '''
+    A short description of an Artwork (or of the image bytes), to print it.
+    '''
+    if artwork is None:
+        return "None"
+    data = artwork_data(artwork)
+    try:
+        fmt, width, height, _ = image_info(data)
+    except ValueError:
+        return f"<image, {len(data)} bytes>"
+    return f"<{fmt} {width}x{height}, {len(data)} bytes>"
@@ -0,0 +1,227 @@
+'''
+Digest of the audio payload of a file: only the bytes of the audio frames
+(or samples) are hashed, the metadata around them (ID3v1/v2, APEv2 and
+Lyrics3 tags, FLAC metadata blocks, the Ogg header packets, the MP4 'moov'
+atom, RIFF/AIFF chunks other than the samples) is skipped. Two files with
+the same audio get the same digest no matter their tags, and retagging a
+file doesn't change its digest.
+
+The file is mapped in memory (mmap) and hashed in chunks of CHUNK_SIZE bytes,
+so it's never read whole into memory. Where the payload is depends on the
+format, which comes from the first bytes of the file (see format_sniffer).
+'''
+from hashlib import sha1
+from mmap import mmap, ACCESS_READ
+from os import fstat
+from struct import unpack_from
+
+from EzAudioMeta.audio.format_sniffer import sniff_format
+
+# bytes hashed on each update of the digest.
+CHUNK_SIZE = 1 << 20
+
+
+def audio_digest(file_path: str) -> str:
+    '''
+    Returns the sha1 digest (hex) of the audio payload of the file.
+    -----
+    Raises: ValueError if it's not a supported audio file or its payload
+    can't be found, OSError if it can't be read.
+    '''
+    with open(file_path, "rb") as audio_file:
+        fd = audio_file.fileno()
+        payload = _PAYLOADS.get(sniff_format(file_path, fd))
+        if payload is None:
+            raise ValueError(f"{file_path} is not a supported audio file.")
+        if fstat(fd).st_size == 0:
+            raise ValueError(f"{file_path} is empty.")
+        with mmap(fd, 0, access=ACCESS_READ) as data:
+            ranges = payload(data)
+            if not ranges:
+                raise ValueError(f"No audio found in {file_path}.")
+            digest = sha1()
+            view = memoryview(data)
+            try:
+                for start, end in ranges:
+                    for offset in range(start, end, CHUNK_SIZE):
+                        digest.update(view[offset:min(end,
+                                                      offset + CHUNK_SIZE)])
+            finally:
+                view.release()
+    return digest.hexdigest()
+
+
+def _syncsafe(data, offset: int) -> int:
+    return (data[offset] << 21) | (data[offset + 1] << 14) |\
+        (data[offset + 2] << 7) | data[offset + 3]
+
+
+def _leading_tags_end(data) -> int:
+    '''
+    Returns where the ID3v2 tags at the start of the file end.
+    '''
+    start = 0
+    while data[start:start + 3] == b"ID3" and start + 10 <= len(data):
+        size = 10 + _syncsafe(data, start + 6)
+        if data[start + 5] & 0x10:
+            # a footer.
+            size += 10
+        start += size
+    return min(start, len(data))
+
+
+def _trailing_tags_start(data, end: int) -> int:
+    '''
+    Returns where the tags at the end of the file (ID3v1, APEv2, Lyrics3v2
+    and appended ID3v2, in any order) start.
+    '''
+    while True:
+        if end >= 128 and data[end - 128:end - 125] == b"TAG":
+            end -= 128
+        elif end >= 32 and data[end - 32:end - 24] == b"APETAGEX":
+            size, flags = unpack_from("<I4xI", data, end - 20)
+            # the size counts the footer, not the header.
+            end -= size + (32 if flags & 0x80000000 else 0)
+        elif end >= 15 and data[end - 9:end] == b"LYRICS200" and\
+                data[end - 15:end - 9].isdigit():
+            end -= 15 + int(data[end - 15:end - 9])
+        elif end >= 10 and data[end - 10:end - 7] == b"3DI":
+            end -= 20 + _syncsafe(data, end - 4)
+        else:
+            return max(end, 0)
+
+
+def _frames_payload(data) -> list:
+    '''
+    MPEG audio, ADTS and WavPack: the frames (blocks) between the tags.
+    '''
+    start = _leading_tags_end(data)
+    end = _trailing_tags_start(data, len(data))
+    return [(start, end)] if start < end else []
+
+
+def _flac_payload(data) -> list:
+    '''
+    FLAC: the frames after the last metadata block.
+    '''
+    offset = _leading_tags_end(data)
+    if data[offset:offset + 4] != b"fLaC":
+        return []
+    offset += 4
+    last_block = False
+    while not last_block and offset + 4 <= len(data):
+        last_block = bool(data[offset] & 0x80)
+        offset += 4 + int.from_bytes(data[offset + 1:offset + 4], "big")
+    end = _trailing_tags_start(data, len(data))
+    return [(offset, end)] if last_block and offset < end else []
+
+
+def _ogg_payload(data) -> list:
+    '''
+    Ogg Vorbis and Opus: the body of the pages of the first logical stream
+    after its header packets (3 for Vorbis, 2 for Opus). The header packets
+    end a page, so the audio packets start on a page of their own. The
+    page headers are skipped too, their sequence numbers and checksums
+    change when the comment packet changes size.
+    '''
+    headers = None
+    serial = None
+    packets = 0
+    ranges = []
+    offset = 0
+    while offset + 27 <= len(data) and data[offset:offset + 4] == b"OggS":
+        segments = data[offset + 26]
+        segment_table = data[offset + 27:offset + 27 + segments]
+        body_start = offset + 27 + segments
+        body_end = body_start + sum(segment_table)
+        page_serial = data[offset + 14:offset + 18]
+        if serial is None:
+            serial = page_serial
+            if data[body_start:body_start + 7] == b"\x01vorbis":
+                headers = 3
+            elif data[body_start:body_start + 8] == b"OpusHead":
+                headers = 2
+            else:
+                return []
+        if page_serial == serial:
+            if packets >= headers:
+                ranges.append((body_start, min(body_end, len(data))))
+            else:
+                packets += sum(1 for lacing in segment_table if lacing < 255)
+        offset = body_end
+    return ranges
+
+
+def _mp4_payload(data) -> list:
+    '''
+    MP4: the 'mdat' atoms, the tags are in the 'moov' atom.
+    '''
+    ranges = []
+    offset = 0
+    while offset + 8 <= len(data):
+        size, atom_type = unpack_from(">I4s", data, offset)
+        header_size = 8
+        if size == 1:
+            size = unpack_from(">Q", data, offset + 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = len(data) - offset
+        if size < header_size:
+            break
+        if atom_type == b"mdat":
+            ranges.append((offset + header_size,
+                           min(offset + size, len(data))))
+        offset += size
+    return ranges
+
+
+def _chunk_payload(data, start: int, endianness: str, chunk_id: bytes) -> list:
+    '''
+    RIFF and IFF chunks (WAVE and AIFF): the chunk with the samples.
+    '''
+    offset = start
+    while offset + 8 <= len(data):
+        found_id, size = unpack_from(endianness + "4sI", data, offset)
+        if found_id == chunk_id:
+            return [(offset + 8, min(offset + 8 + size, len(data)))]
+        # chunks are padded to an even size.
+        offset += 8 + size + (size & 1)
+    return []
+
+
+def _wav_payload(data) -> list:
+    return _chunk_payload(data, 12, "<", b"data")
+
+
+def _aiff_payload(data) -> list:
+    return _chunk_payload(data, 12, ">", b"SSND")
+
+
+def _dsf_payload(data) -> list:
+    '''
+    DSF: the 'data' chunk, after the 'DSD ' and 'fmt ' chunks. The ID3 tag
+    is at the end of the file.
+    '''
+    offset = unpack_from("<Q", data, 4)[0]
+    while offset + 12 <= len(data):
+        chunk_id, size = unpack_from("<4sQ", data, offset)
+        if chunk_id == b"data":
+            return [(offset + 12, min(offset + size, len(data)))]
+        if size < 12:
+            break
+        offset += size
+    return []
+
+
+_PAYLOADS = {
+    "aac": _frames_payload,
+    "aiff": _aiff_payload,
+    "dsf": _dsf_payload,
+    "flac": _flac_payload,
+    "m4a": _mp4_payload,
+    "mp3": _frames_payload,
+    "ogg": _ogg_payload,
+    "opus": _ogg_payload,
+    "wav": _wav_payload,
+    "wv": _frames_payload,
+}
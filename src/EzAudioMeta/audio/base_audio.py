@@ -1,15 +1,51 @@
-from music_tag import load_file
+from importlib import import_module
+from time import perf_counter
+
+from EzAudioMeta.audio.header_reader import read_tags
+from EzAudioMeta.audio.artwork import artwork_data, artwork_from_bytes
+from EzAudioMeta.audio.format_sniffer import sniff_format
+
+# the music_tag class of each format (see format_sniffer), the file is
+# loaded with it straight away instead of music_tag.load_file trying every
+# format mutagen knows.
+_MUSIC_TAG_CLASSES = {
+    "aac": ("music_tag.aac", "AacFile"),
+    "aiff": ("music_tag.aiff", "AiffFile"),
+    "dsf": ("music_tag.dsf", "DsfFile"),
+    "flac": ("music_tag.flac", "FlacFile"),
+    "m4a": ("music_tag.mp4", "Mp4File"),
+    "mp3": ("music_tag.id3", "Mp3File"),
+    "ogg": ("music_tag.vorbis", "OggVorbisFile"),
+    "opus": ("music_tag.vorbis", "OggOpusFile"),
+    "wav": ("music_tag.wave", "WaveId3File"),
+    "wv": ("music_tag.apev2", "WavePackFile"),
+}
 
 
 class BaseAudio:
 
+    # tag names accepted by music_tag for the same tag.
+    _tag_aliases = {"title": "tracktitle"}
+
+    # formats whose tags mutagen saves with a padding callback.
+    _padding_formats = frozenset(["aiff", "dsf", "flac", "m4a", "mp3",
+                                  "ogg", "opus", "wav"])
+
     def __init__(self) -> None:
         self._current_file = None
+        self._file_path = None
+        # the format of the file, see format_sniffer.
+        self._format = None
+        self._header_tags = None
+        self._tags_changed = False
+        # seconds spent fully loading the file with music_tag (--timings).
+        self.full_load_seconds = 0.0
+        # if the last write had to move the audio data (see write_tags).
+        self.full_rewrite = None
         self.str_tags = [
                     "album",
                     "albumartist",
                     "artist",
-                    "artwork",
                     "comment",
                     "composer",
                     "genre",
@@ -27,20 +63,100 @@ class BaseAudio:
                     "year",
         ]
 
-    def load_track(self, file_path) -> None:
+    def load_track(self, file_path, header_only: bool = False) -> None:
         '''
         Loads an audio file.
+        header_only -- Only the tag header of the file is read (if the
+        format is supported by the header reader). The file is fully loaded
+        by music_tag the first time a tag is set, or when a tag the header
+        reader doesn't know (like 'artwork') is read.
         ---
-        Raises: NotImplementedError
+        Raises: NotImplementedError if it's not a supported audio file.
         '''
-        self._current_file = load_file(file_path)
+        self._file_path = file_path
+        self._format = None
+        self._current_file = None
+        self._header_tags = None
+        self._tags_changed = False
+        self.full_load_seconds = 0.0
+        self.full_rewrite = None
+
+        if header_only:
+            self._header_tags = read_tags(file_path)
+            if self._header_tags is not None:
+                return
+
+        self._load_file()
+
+    @property
+    def is_loaded(self) -> bool:
+        '''
+        True once the file is fully loaded by music_tag.
+        '''
+        return self._current_file is not None
+
+    def _loaded_file(self):
+        '''
+        Returns the music_tag file, loading it if only the tag header was
+        read.
+        '''
+        if self._current_file is None:
+            self._load_file()
+        return self._current_file
+
+    def _load_file(self) -> None:
+        start = perf_counter()
+        # the format comes from the first bytes of the file, a misnamed
+        # file is loaded as what it is, without music_tag.load_file trying
+        # every format mutagen knows.
+        self._format = sniff_format(self._file_path)
+        if self._format is None:
+            # not told by its first bytes (like an mp3 file with junk or
+            # padding before its first frame), mutagen looks further.
+            self._current_file = self._load_any_format()
+        else:
+            module, class_name = _MUSIC_TAG_CLASSES[self._format]
+            music_tag_class = getattr(import_module(module), class_name)
+            self._current_file = music_tag_class(
+                self._file_path,
+                _mfile=music_tag_class.mutagen_kls(self._file_path))
+        self.full_load_seconds += perf_counter() - start
+
+    def _load_any_format(self):
+        '''
+        Returns: the file loaded by music_tag.load_file, with its format
+        set from the music_tag class it was loaded with.
+        -----
+        Raises: NotImplementedError if it's not a supported audio file.
+        '''
+        from music_tag import load_file
+        from mutagen import MutagenError
+
+        try:
+            music_tag_file = load_file(self._file_path, err="ignore")
+        except MutagenError:
+            # mutagen guessed a format (from the extension) it isn't.
+            music_tag_file = None
+        if music_tag_file is None:
+            raise NotImplementedError(f"{self._file_path} is not a" +
+                                      " supported audio file.")
+        class_name = type(music_tag_file).__name__
+        self._format = next((audio_format for audio_format, (_, name)
+                             in _MUSIC_TAG_CLASSES.items()
+                             if name == class_name), None)
+        return music_tag_file
 
     def get_tag(self, tag_name) -> object:
         '''
         Returns the first value of the specified tag
         as a string or an integer (like track number or year).
         '''
-        tag = self._current_file[tag_name]
+        if self._current_file is None and self._header_tags is not None:
+            header_tag = self._tag_aliases.get(tag_name, tag_name)
+            if header_tag in self._header_tags:
+                return self._header_tags[header_tag]
+
+        tag = self._loaded_file()[tag_name]
         return tag.first
 
     def set_tag(self, tag_name, tag_value) -> None:
@@ -53,7 +169,6 @@ class BaseAudio:
         album
         albumartist
         artist
-        artwork
         comment
         composer
         genre
@@ -68,13 +183,60 @@ class BaseAudio:
         totaltracks
         tracknumber
         year
+        ---
+        'artwork' is expected to be the bytes of a JPEG or PNG image, or a
+        music_tag Artwork (see audio.artwork.read_artwork).
         '''
         if tag_name in self.str_tags and not isinstance(tag_value, str):
             raise TypeError(f"{tag_name} is expected to be of type str")
         if tag_name in self.int_tags and not isinstance(tag_value, int):
             raise TypeError(f"{tag_name} is expected to be of type int")
+        if tag_name == "artwork":
+            if isinstance(tag_value, bytes):
+                tag_value = artwork_from_bytes(tag_value)
+            elif not hasattr(tag_value, "raw"):
+                raise TypeError("artwork is expected to be of type bytes")
+
+        if self._is_current_value(tag_name, tag_value):
+            return
+
+        self._loaded_file()[tag_name] = tag_value
+        self._tags_changed = True
+
+    def _is_current_value(self, tag_name, tag_value) -> bool:
+        '''
+        Returns True if the tag already holds the given value. An empty str
+        is the same as a tag that is not set. A value that can't be read
+        is taken as different.
+        '''
+        try:
+            current_value = self.get_tag(tag_name)
+        except (ValueError, KeyError):
+            return False
+        if tag_value == "" and current_value is None:
+            return True
+        # the images are compared by their data.
+        if tag_name == "artwork":
+            return artwork_data(current_value) == artwork_data(tag_value)
+        return current_value == tag_value
 
-        self._current_file[tag_name] = tag_value
+    def tag_changes(self, **kwargs_tags) -> dict:
+        '''
+        Returns the tags that would change if they were set, as a dict of
+        tag_name: (current value, new value). Nothing is set, the file is
+        only fully loaded if a tag can't be read from its header. A current
+        value that can't be read is None.
+        '''
+        changes = {}
+        for tag_name, tag_value in kwargs_tags.items():
+            if self._is_current_value(tag_name, tag_value):
+                continue
+            try:
+                current_value = self.get_tag(tag_name)
+            except (ValueError, KeyError):
+                current_value = None
+            changes[tag_name] = (current_value, tag_value)
+        return changes
 
     def set_tags(self, **kwargs_tags) -> None:
         '''
@@ -102,8 +264,43 @@ class BaseAudio:
         for key in kwargs_tags:
             self.set_tag(key, kwargs_tags[key])
 
-    def write_tags(self):
+    def write_tags(self, padding: int = None) -> bool:
+        '''
+        Writes the actual tags to the file. If no tag was changed since the
+        file was loaded (all the tags set already had the same value), the
+        file is not saved at all.
+        padding -- Bytes of padding reserved after the tags when they don't
+        fit in the space the file has for them. Tags that fit are written in
+        place, keeping the padding left. If None, mutagen picks the padding.
+        After writing, full_rewrite is True if the audio data after the tags
+        had to be moved (the whole file is rewritten), False if the tags
+        were updated in place, or None if the format doesn't tell.
+        -----
+        Returns: True if the file was saved, False if it was skipped.
+        '''
+        if not self._tags_changed:
+            return False
+        self.full_rewrite = None
+        if self._format in self._padding_formats:
+            self._current_file.save(padding=self._padding_callback(padding))
+        else:
+            self._current_file.save()
+        self._tags_changed = False
+        return True
+
+    def _padding_callback(self, padding: int):
         '''
-        Writes the actual tags to the file.
+        Returns the padding callback for mutagen, it records if the tags
+        were written in place.
         '''
-        self._current_file.save()
+        def padding_for(info) -> int:
+            if padding is None:
+                new_padding = info.get_default_padding()
+            elif info.padding >= 0:
+                new_padding = info.padding
+            else:
+                new_padding = padding
+            # resizing the tags moves the data that follows them.
+            self.full_rewrite = new_padding != info.padding and info.size > 0
+            return new_padding
+        return padding_for
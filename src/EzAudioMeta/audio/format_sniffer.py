@@ -0,0 +1,142 @@
+'''
+Audio format detection from the first bytes of a file (its magic bytes),
+instead of its extension. A single small read (os.pread, or a seek and a
+read where there is no pread, like on Windows) is done per file, and the
+format found is cached by the (device, inode, mtime) of the file, so a file
+that didn't change is not read again (like the same file tagged by several
+batches of --watch or requests of --serve).
+
+The formats are named after the extension they usually have (see
+api.valid_extensions): ID3/MPEG audio is 'mp3', 'fLaC' is 'flac', 'OggS' is
+'ogg' (Vorbis) or 'opus', RIFF/WAVE is 'wav', FORM/AIFF is 'aiff', 'DSD ' is
+'dsf', 'wvpk' is 'wv', an MP4 'ftyp' is 'm4a' and ADTS/ADIF is 'aac'.
+'''
+from os import (close, fstat, lseek, open as open_fd, read, stat, O_RDONLY,
+                SEEK_CUR, SEEK_SET)
+from threading import Lock
+
+try:
+    from os import pread
+except ImportError:
+    # Windows.
+    pread = None
+try:
+    from os import O_BINARY
+except ImportError:
+    # only Windows opens files as text by default.
+    O_BINARY = 0
+
+# bytes read from the start of the file, enough for every header below
+# (and for the first Ogg page).
+SNIFF_SIZE = 512
+
+# formats kept in the cache, the oldest one is dropped when it's full.
+_FORMAT_CACHE_SIZE = 16384
+
+_format_cache = {}
+_format_cache_lock = Lock()
+
+
+def sniff_format(file_path: str, fd: int = None) -> str:
+    '''
+    Returns the format of the audio file, from its first bytes. If the file
+    is already open, its file descriptor can be given so it's read through
+    it (without moving its offset).
+    -----
+    Returns: the format, None if it's not a supported audio format.
+    Raises: OSError if the file can't be read.
+    '''
+    file_stat = stat(file_path) if fd is None else fstat(fd)
+    key = (file_stat.st_dev, file_stat.st_ino, file_stat.st_mtime_ns)
+    with _format_cache_lock:
+        if key in _format_cache:
+            return _format_cache[key]
+
+    if fd is None:
+        fd = open_fd(file_path, O_RDONLY | O_BINARY)
+        try:
+            audio_format = _sniff(fd)
+        finally:
+            close(fd)
+    else:
+        audio_format = _sniff(fd)
+
+    with _format_cache_lock:
+        if len(_format_cache) >= _FORMAT_CACHE_SIZE:
+            del _format_cache[next(iter(_format_cache))]
+        _format_cache[key] = audio_format
+    return audio_format
+
+
+def _read_at(fd: int, size: int, offset: int) -> bytes:
+    '''
+    Returns: up to size bytes of the file from the offset, without moving
+    the offset of the file descriptor.
+    '''
+    if pread is not None:
+        return pread(fd, size, offset)
+    current = lseek(fd, 0, SEEK_CUR)
+    try:
+        lseek(fd, offset, SEEK_SET)
+        return read(fd, size)
+    finally:
+        lseek(fd, current, SEEK_SET)
+
+
+def _sniff(fd: int) -> str:
+    header = _read_at(fd, SNIFF_SIZE, 0)
+    if header[:3] == b"ID3" and len(header) >= 10:
+        # the format is whatever follows the ID3 tag (FLAC and AAC files
+        # can have one too), MPEG audio if it can't be told.
+        size = 10 + _syncsafe(header[6:10])
+        if header[5] & 0x10:
+            # a footer.
+            size += 10
+        return _sniff_header(_read_at(fd, 16, size)) or "mp3"
+    return _sniff_header(header)
+
+
+def _sniff_header(header: bytes) -> str:
+    magic = header[:4]
+    if magic == b"fLaC":
+        return "flac"
+    if magic == b"OggS":
+        return _sniff_ogg(header)
+    if magic == b"RIFF" and header[8:12] == b"WAVE":
+        return "wav"
+    if magic == b"FORM" and header[8:12] in (b"AIFF", b"AIFC"):
+        return "aiff"
+    if magic == b"DSD ":
+        return "dsf"
+    if magic == b"wvpk":
+        return "wv"
+    if header[4:8] == b"ftyp":
+        return "m4a"
+    if magic == b"ADIF":
+        return "aac"
+    if len(header) >= 2 and header[0] == 0xFF:
+        # ADTS: a 12 bits sync word and layer 0, MPEG audio: an 11 bits
+        # sync word and layer 1 to 3.
+        if header[1] & 0xF6 == 0xF0:
+            return "aac"
+        if header[1] & 0xE0 == 0xE0 and header[1] & 0x06 and\
+                header[1] & 0x18 != 0x08:
+            return "mp3"
+    return None
+
+
+def _sniff_ogg(header: bytes) -> str:
+    # the first packet of the stream (its codec header) follows the page
+    # header and its segment table.
+    if len(header) < 27:
+        return None
+    start = 27 + header[26]
+    if header[start:start + 7] == b"\x01vorbis":
+        return "ogg"
+    if header[start:start + 8] == b"OpusHead":
+        return "opus"
+    return None
+
+
+def _syncsafe(data: bytes) -> int:
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
@@ -0,0 +1,463 @@
+'''
+Header only tag reader. Parses just the tag container of an audio file (ID3v2
+frames, FLAC metadata blocks, Ogg comment packets and MP4 'ilst' atoms)
+without building the full music_tag/mutagen objects, for jobs that only read
+a few tags. The values returned follow music_tag, so they can be compared
+with the ones set through BaseAudio.
+
+Readers are registered per format (see format_sniffer, the format comes from
+the first bytes of the file, not its extension) in _READERS. A reader returns
+None when it can't give the same result as music_tag (unsupported container
+version, compressed frames, etc.), so the caller can fall back to it.
+'''
+from re import match
+from struct import error
+from struct import unpack
+
+from EzAudioMeta.audio.format_sniffer import sniff_format
+
+# every tag known by the header reader, the ones missing from a file
+# are None.
+TAG_NAMES = ("album", "albumartist", "artist", "comment", "compilation",
+             "composer", "discnumber", "genre", "isrc", "lyrics",
+             "totaldiscs", "totaltracks", "tracknumber", "tracktitle", "year")
+
+
+def read_tags(file_path: str) -> dict:
+    '''
+    Receives the path to an audio file and returns a dict with the first
+    value of each tag in TAG_NAMES. Tags whose value can't be parsed are
+    left out of the dict.
+    -----
+    Returns: None if the format of the file is not supported by the header
+    reader.
+    Raises: OSError if the file can't be read.
+    '''
+    with open(file_path, "rb") as audio_file:
+        reader = _READERS.get(sniff_format(file_path, audio_file.fileno()))
+        if reader is None:
+            return None
+        try:
+            raw_tags = reader(audio_file)
+        except (error, IndexError, KeyError, UnicodeDecodeError):
+            # a damaged or unexpected container, music_tag decides.
+            return None
+    if raw_tags is None:
+        return None
+    return _to_tags(raw_tags)
+
+
+def _to_tags(raw_tags: dict) -> dict:
+    '''
+    Receives the raw tags (a list of str values per tag name) and converts
+    them the same way music_tag does.
+    '''
+    tags = dict.fromkeys(TAG_NAMES)
+    for tag_name, values in raw_tags.items():
+        if not values:
+            continue
+        try:
+            tags[tag_name] = _CONVERTERS.get(tag_name, str)(values[0])
+        except (TypeError, ValueError):
+            del tags[tag_name]
+    return tags
+
+
+def _to_year(value) -> int:
+    '''
+    Same rules as music_tag's year sanitizer.
+    '''
+    value = value.split(",")[0]
+    try:
+        return int(value)
+    except ValueError:
+        if match(r'^[0-9]{4}[-\s][0-9]{2}[-\s][0-9]{2}$', value):
+            return int(value[:4])
+        if match(r'^[0-9]{2}[-/\s][0-9]{2}[-/\s][0-9]{4}$', value):
+            return int(value[-4:])
+        raise
+
+
+def _to_bool_int(value) -> int:
+    '''
+    Same rules as music_tag's bool sanitizer, as an int.
+    '''
+    if isinstance(value, bool):
+        return value
+    value = str(value).strip().lower()
+    if value in ("true", "1"):
+        return 1
+    if value in ("false", "0", ""):
+        return 0
+    return int(int(value) != 0)
+
+
+_CONVERTERS = {
+    "compilation": _to_bool_int,
+    "discnumber": int,
+    "totaldiscs": int,
+    "totaltracks": int,
+    "tracknumber": int,
+    "year": _to_year,
+}
+
+
+def _split_number(values: list, raw_tags: dict, number_tag: str,
+                  total_tag: str) -> None:
+    '''
+    Splits a 'number/total' value (ID3 TRCK and TPOS) into both tags.
+    '''
+    if not values:
+        return
+    numbers = values[0].split("/")
+    raw_tags[number_tag] = [numbers[0]]
+    if len(numbers) > 1:
+        raw_tags[total_tag] = [numbers[1]]
+
+
+# ID3v2 ----------------------------------------------------------------------
+
+_ID3_TEXT_FRAMES = {
+    b"TIT2": "tracktitle",
+    b"TPE1": "artist",
+    b"TALB": "album",
+    b"TPE2": "albumartist",
+    b"TCOM": "composer",
+    b"TCON": "genre",
+    b"TSRC": "isrc",
+    b"TCMP": "compilation",
+}
+
+# music_tag looks for the year in the first of these frames, mutagen
+# presents TORY as TDOR and TYER as TDRC.
+_ID3_YEAR_FRAMES = ((b"TDOR", b"TORY"), (b"TDRC", b"TYER"))
+
+_ID3_ENCODINGS = {0: "latin-1", 1: "utf-16", 2: "utf-16-be", 3: "utf-8"}
+
+
+def _syncsafe(data: bytes) -> int:
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+
+def _read_id3(audio_file) -> dict:
+    header = audio_file.read(10)
+    if len(header) < 10 or header[:3] != b"ID3":
+        # a file that doesn't start with an MPEG frame is left to music_tag,
+        # it looks for the first frame (or fails if it's not an mp3).
+        if len(header) < 2 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+            return None
+        # mutagen reads ID3v1 tags at the end of the file, those are left to
+        # music_tag.
+        audio_file.seek(0, 2)
+        if audio_file.tell() >= 128:
+            audio_file.seek(-128, 2)
+            if audio_file.read(3) == b"TAG":
+                return None
+        return {}
+
+    version = header[3]
+    flags = header[5]
+    # ID3v2.2 and unsynchronised tags are left to music_tag.
+    if version not in (3, 4) or flags & 0x80:
+        return None
+
+    data = audio_file.read(_syncsafe(header[6:10]))
+    offset = 0
+    if flags & 0x40:
+        if version == 3:
+            offset = 4 + unpack(">I", data[:4])[0]
+        else:
+            offset = _syncsafe(data[:4])
+
+    frames = {}
+    while offset + 10 <= len(data):
+        frame_id = data[offset:offset + 4]
+        if frame_id[0] == 0:
+            break
+        if version == 4:
+            size = _syncsafe(data[offset + 4:offset + 8])
+            # grouped, compressed, encrypted or unsynchronised frames, or
+            # frames with a data length indicator
+            if data[offset + 9] & 0x4F:
+                return None
+        else:
+            size = unpack(">I", data[offset + 4:offset + 8])[0]
+            if data[offset + 9] & 0xE0:
+                return None
+        frame = data[offset + 10:offset + 10 + size]
+        offset += 10 + size
+        if frame_id not in frames and len(frame) > 0:
+            frames[frame_id] = frame
+
+    raw_tags = {}
+    for frame_id, tag_name in _ID3_TEXT_FRAMES.items():
+        if frame_id in frames:
+            raw_tags[tag_name] = _id3_text(frames[frame_id])
+    for frame_ids in _ID3_YEAR_FRAMES:
+        year = [frames[frame_id] for frame_id in frame_ids
+                if frame_id in frames]
+        if year:
+            raw_tags["year"] = _id3_text(year[0])
+            break
+    _split_number(_id3_text(frames.get(b"TRCK", b"\x00")), raw_tags,
+                  "tracknumber", "totaltracks")
+    _split_number(_id3_text(frames.get(b"TPOS", b"\x00")), raw_tags,
+                  "discnumber", "totaldiscs")
+    if b"COMM" in frames:
+        raw_tags["comment"] = _id3_described_text(frames[b"COMM"])
+    if b"USLT" in frames:
+        raw_tags["lyrics"] = _id3_described_text(frames[b"USLT"])[:1]
+    return raw_tags
+
+
+def _id3_decode(encoding: int, data: bytes) -> list:
+    text = data.decode(_ID3_ENCODINGS[encoding])
+    values = [value.lstrip("\ufeff") for value in text.split("\x00")]
+    while values and not values[-1]:
+        values.pop()
+    return values
+
+
+def _id3_text(frame: bytes) -> list:
+    return _id3_decode(frame[0], frame[1:])
+
+
+def _id3_described_text(frame: bytes) -> list:
+    '''
+    COMM and USLT frames: encoding, language, a description (ended by a
+    null character) and the text.
+    '''
+    encoding = frame[0]
+    data = frame[4:]
+    if encoding in (1, 2):
+        end = 0
+        while end + 1 < len(data) and data[end:end + 2] != b"\x00\x00":
+            end += 2
+        return _id3_decode(encoding, data[end + 2:])
+    return _id3_decode(encoding, data[data.find(b"\x00") + 1:])
+
+
+# Vorbis comments (FLAC and Ogg) ---------------------------------------------
+
+_VORBIS_FIELDS = {
+    "title": "tracktitle",
+    "artist": "artist",
+    "album": "album",
+    "albumartist": "albumartist",
+    "composer": "composer",
+    "tracknumber": "tracknumber",
+    "tracktotal": "totaltracks",
+    "discnumber": "discnumber",
+    "disctotal": "totaldiscs",
+    "genre": "genre",
+    "lyrics": "lyrics",
+    "isrc": "isrc",
+    "comment": "comment",
+    "compilation": "compilation",
+}
+
+
+def _parse_vorbis_comment(data: bytes) -> dict:
+    vendor_length = unpack("<I", data[:4])[0]
+    offset = 4 + vendor_length
+    count = unpack("<I", data[offset:offset + 4])[0]
+    offset += 4
+    fields = {}
+    for _ in range(count):
+        length = unpack("<I", data[offset:offset + 4])[0]
+        comment = data[offset + 4:offset + 4 + length].decode("utf-8",
+                                                              "replace")
+        offset += 4 + length
+        key, _, value = comment.partition("=")
+        fields.setdefault(key.lower(), []).append(value)
+
+    raw_tags = {}
+    for field, tag_name in _VORBIS_FIELDS.items():
+        if field in fields:
+            raw_tags[tag_name] = fields[field]
+    year = fields.get("date") or fields.get("originaldate")
+    if year:
+        raw_tags["year"] = year
+    return raw_tags
+
+
+def _read_flac(audio_file) -> dict:
+    marker = audio_file.read(4)
+    # an ID3 tag in front of the FLAC stream is skipped, like mutagen does.
+    if marker[:3] == b"ID3":
+        header = marker + audio_file.read(6)
+        audio_file.seek(10 + _syncsafe(header[6:10]))
+        marker = audio_file.read(4)
+    if marker != b"fLaC":
+        return None
+
+    last_block = False
+    while not last_block:
+        block_header = audio_file.read(4)
+        if len(block_header) < 4:
+            return None
+        last_block = bool(block_header[0] & 0x80)
+        block_type = block_header[0] & 0x7F
+        size = int.from_bytes(block_header[1:], "big")
+        if block_type == 4:
+            return _parse_vorbis_comment(audio_file.read(size))
+        audio_file.seek(size, 1)
+    return {}
+
+
+def _read_ogg(audio_file) -> dict:
+    '''
+    Reads the pages of the first logical stream until its second packet (the
+    comment header) is complete. Only Vorbis and Opus streams are read.
+    '''
+    packets = [b""]
+    serial = None
+    while len(packets) < 3:
+        header = audio_file.read(27)
+        if len(header) < 27 or header[:4] != b"OggS":
+            return None
+        page_serial = header[14:18]
+        segment_table = audio_file.read(header[26])
+        body = audio_file.read(sum(segment_table))
+        if serial is None:
+            serial = page_serial
+        elif page_serial != serial:
+            continue
+        offset = 0
+        for lacing in segment_table:
+            packets[-1] += body[offset:offset + lacing]
+            offset += lacing
+            if lacing < 255:
+                packets.append(b"")
+
+    if packets[0].startswith(b"\x01vorbis") and\
+            packets[1].startswith(b"\x03vorbis"):
+        return _parse_vorbis_comment(packets[1][7:])
+    if packets[0].startswith(b"OpusHead") and\
+            packets[1].startswith(b"OpusTags"):
+        return _parse_vorbis_comment(packets[1][8:])
+    return None
+
+
+# MP4 ------------------------------------------------------------------------
+
+_MP4_TEXT_ATOMS = {
+    b"\xa9nam": "tracktitle",
+    b"\xa9ART": "artist",
+    b"\xa9alb": "album",
+    b"aART": "albumartist",
+    b"\xa9wrt": "composer",
+    b"\xa9gen": "genre",
+    b"\xa9day": "year",
+    b"\xa9lyr": "lyrics",
+    b"\xa9cmt": "comment",
+}
+
+_MP4_ISRC_ATOM = (b"com.apple.iTunes", b"ISRC")
+
+
+def _mp4_atoms(audio_file, start: int, end: int):
+    '''
+    Yields (type, data start, data end) for each atom between start and end.
+    Only the atom headers are read.
+    '''
+    offset = start
+    while offset + 8 <= end:
+        audio_file.seek(offset)
+        size, atom_type = unpack(">I4s", audio_file.read(8))
+        header_size = 8
+        if size == 1:
+            size = unpack(">Q", audio_file.read(8))[0]
+            header_size = 16
+        elif size == 0:
+            size = end - offset
+        if size < header_size:
+            return
+        yield atom_type, offset + header_size, offset + size
+        offset += size
+
+
+def _find_mp4_atom(audio_file, start: int, end: int, atom_type: bytes):
+    for found_type, data_start, data_end in _mp4_atoms(audio_file, start,
+                                                       end):
+        if found_type == atom_type:
+            return data_start, data_end
+    return None
+
+
+def _mp4_data(item: bytes) -> list:
+    '''
+    Returns the (type, payload) of each 'data' atom of an 'ilst' item, and
+    the 'mean' and 'name' of freeform items.
+    '''
+    values = []
+    offset = 0
+    while offset + 8 <= len(item):
+        size, atom_type = unpack(">I4s", item[offset:offset + 8])
+        if size < 8:
+            break
+        payload = item[offset + 8:offset + size]
+        if atom_type == b"data":
+            values.append((unpack(">I", payload[:4])[0] & 0xFFFFFF,
+                           payload[8:]))
+        elif atom_type in (b"mean", b"name"):
+            values.append((atom_type, payload[4:]))
+        offset += size
+    return values
+
+
+def _read_mp4(audio_file) -> dict:
+    audio_file.seek(0, 2)
+    file_size = audio_file.tell()
+
+    moov = _find_mp4_atom(audio_file, 0, file_size, b"moov")
+    udta = moov and _find_mp4_atom(audio_file, *moov, b"udta")
+    meta = udta and _find_mp4_atom(audio_file, *udta, b"meta")
+    if not meta:
+        return {}
+    # 'meta' is a full atom, 4 bytes of version and flags before its atoms.
+    ilst = _find_mp4_atom(audio_file, meta[0] + 4, meta[1], b"ilst")
+    if not ilst:
+        return {}
+
+    raw_tags = {}
+    for atom_type, data_start, data_end in list(_mp4_atoms(audio_file,
+                                                           *ilst)):
+        audio_file.seek(data_start)
+        values = _mp4_data(audio_file.read(data_end - data_start))
+        if atom_type in _MP4_TEXT_ATOMS:
+            raw_tags[_MP4_TEXT_ATOMS[atom_type]] = [
+                payload.decode("utf-8") for data_type, payload in values
+                if data_type == 1]
+        elif atom_type in (b"trkn", b"disk") and values:
+            if len(values[0][1]) < 6:
+                return None
+            number, total = unpack(">2xHH", values[0][1][:6])
+            if atom_type == b"trkn":
+                raw_tags["tracknumber"] = [number]
+                raw_tags["totaltracks"] = [total]
+            else:
+                raw_tags["discnumber"] = [number]
+                raw_tags["totaldiscs"] = [total]
+        elif atom_type == b"cpil" and values:
+            raw_tags["compilation"] = [bool(values[0][1][:1] != b"\x00")]
+        elif atom_type == b"gnre":
+            # mutagen turns the numeric genre into a '\xa9gen' name.
+            return None
+        elif atom_type == b"----":
+            names = tuple(payload for data_type, payload in values
+                          if data_type in (b"mean", b"name"))
+            if names == _MP4_ISRC_ATOM:
+                raw_tags["isrc"] = [payload.decode("utf-8")
+                                    for data_type, payload in values
+                                    if isinstance(data_type, int)]
+    return raw_tags
+
+
+_READERS = {
+    "flac": _read_flac,
+    "m4a": _read_mp4,
+    "mp3": _read_id3,
+    "ogg": _read_ogg,
+    "opus": _read_ogg,
+}
@@ -1,24 +1,30 @@
-from os import path, listdir
-from sys import platform
+from os import path, cpu_count
+from collections import namedtuple
+from contextlib import contextmanager
+from functools import partial
+from hashlib import sha1
+from json import dumps
+from typing import TYPE_CHECKING
+import sys
 
 import click
-from EzAudioMeta.utilities.optional_string_matchers import\
-    OptionalStringMatchers
-from EzAudioMeta.audio import base_audio
+from EzAudioMeta.api import (InvalidPatternError, InvalidTagError, Parsers,
+                             TagFailure, audio_extensions, compile_parsers,
+                             export_tags, int_tags, plan_file, read_file_tags,
+                             str_tags, tag_file, tag_results, validate_tags,
+                             worker_pool)
+from EzAudioMeta.utilities.file_discovery import scan_audio_files
+from EzAudioMeta.utilities.tag_export import EXPORT_FORMATS, TagExportWriter
+from EzAudioMeta.utilities.manifest import read_manifest
+from EzAudioMeta.audio.artwork import artwork_data
 
-str_tags = ["album", "albumartist", "comment", "composer", "genre",
-            "lyrics", "tracktitle", "isrc", "artist"]
-
-int_tags = ["compilation", "discnumber", "totaldiscs", "totaltracks",
-            "tracknumber", "year", ]
-
-valid_extensions = ["aac", "aiff", "dsf", "flac", "m4a", "mp3",
-                    "ogg", "opus", "wav", "wv"]
-
-if platform.startswith("win32"):
-    file_delimit = "\\"
-elif platform.startswith("linux"):
-    file_delimit = "/"
+# The modules that take long to import (asyncio, multiprocessing, sqlite3,
+# cProfile, and music_tag in base_audio) are imported when they are first
+# used, so --help and the validation errors don't wait for them.
+if TYPE_CHECKING:
+    from EzAudioMeta.utilities.state_index import StateIndex
+    from EzAudioMeta.utilities.instrumentation import StageTimings, Profiler
+    from EzAudioMeta.utilities.progress import ProgressReporter
 
 parse_cap_help = "Parses the 'tracktitle' from the actual file name." +\
     " The track title is capitalized as a title." +\
@@ -36,8 +42,108 @@ parse_clean_help = "Parses the 'tracktitle' from the actual file name." +\
 parse_track_number = "Parses the 'tracknumber' from the actual file name." +\
     " You must provide a valid regex expresion." +\
     " Ej. \\d+(?=.+\\.mp3)."
+jobs_help = "Number of worker processes used to tag the files." +\
+    " Defaults to the number of CPU cores. Use 1 to tag the files one" +\
+    " after another in the current process."
+recursive_help = "Also looks for audio files in the sub directories of" +\
+    " --files-directory."
+detect_format_help = "Also tags the files of --files-directory that don't" +\
+    " have an audio extension (misnamed or without an extension) when" +\
+    " their first bytes say they are audio. Not used by --watch."
+state_file_help = "Path to a state file where the tagged files are" +\
+    " recorded. Files that were not modified since they were tagged with" +\
+    " the same tags by a previous run are skipped without being opened."
+force_help = "Tags all the files, even the ones that the --state-file" +\
+    " says are up to date."
+keep_going_help = "Keeps tagging the rest of the files when one fails." +\
+    " The failures are summarized at the end, and the process terminates" +\
+    " with 1 if there was any."
+failure_report_help = "Path to a file where the failures are written as" +\
+    " JSON lines (file, error_type, message, stage). Used with --keep-going."
+timings_help = "Prints how long each stage (discover, parse, read_header," +\
+    " load, set, write) took per file: count, total, p50, p95 and max, and" +\
+    " the slowest files."
+profile_help = "Profiles the run with cProfile and writes the stats to the" +\
+    " given file (readable with pstats). The worker processes of --jobs are" +\
+    " not profiled, use --jobs 1 to profile the tagging too."
+progress_help = "Shows the progress of the run: files done out of the" +\
+    " total, files/s, MB/s read and written, the time left and the" +\
+    " failures so far. The line is updated in place on a terminal, else a" +\
+    " line is printed every 10 seconds. Printed to the standard error."
+export_help = "Instead of setting tags, reads the tags of the files and" +\
+    " writes them as JSON lines or CSV, one row per file."
+export_output_help = "Path to the file --export (or --hash-audio) writes" +\
+    " to. Defaults to" +\
+    " the standard output."
+import_manifest_help = "Path to a manifest with a 'path' column and a" +\
+    " column per tag, as CSV (.csv) or JSON lines, the tags of each row are" +\
+    " set to its file. The tags given as options are set to all the files." +\
+    " All the rows are validated before any file is tagged."
+dry_run_help = "Prints the tags that would change in each file (current" +\
+    " value -> new value) without writing any file."
+padding_help = "Bytes of padding reserved after the tags of the files whose" +\
+    " tags don't fit in the space they have, so the next edits are written" +\
+    " in place instead of rewriting the whole file. Defaults to what" +\
+    " mutagen picks (about 1 KiB)."
+rewrite_report_help = "Path to a file where the paths of the files that" +\
+    " had to be fully rewritten are written, one per line."
+artwork_help = "Path to a JPEG or PNG image set as the 'artwork' of all" +\
+    " the files. It's read once and the same image is set to every file."
+artwork_max_size_help = "Scales the --artwork down (keeping its aspect" +\
+    " ratio) when it's wider or taller than the given pixels, before it's" +\
+    " set. Needs Pillow."
+watch_help = "Keeps running and tags the audio files that are added to" +\
+    " (or modified in) --files-directory, as they arrive. The files already" +\
+    " there are tagged first. Uses inotify on Linux, polls the directories" +\
+    " elsewhere (see --watch-polling). Stop it with Ctrl+C."
+watch_settle_help = "Seconds a file has to stay unchanged before --watch" +\
+    " tags it, so files still being copied are not tagged half written." +\
+    " Defaults to 2."
+watch_polling_help = "Makes --watch poll instead of using inotify, for" +\
+    " network shares where inotify doesn't see the changes. Every second a" +\
+    " stat per directory is done and only the directories that changed are" +\
+    " listed, every file is stat'ed once a minute: a file modified in place" +\
+    " (not added or renamed) can take a minute to be seen."
+serve_help = "Instead of tagging, serves a JSON API to set and get the" +\
+    " tags of files (see EzAudioMeta.service) on the given address:" +\
+    " HOST:PORT or PORT for HTTP on localhost, anything else is the path of" +\
+    " a Unix socket. --jobs worker processes are kept warm between the" +\
+    " requests. Stop it with Ctrl+C."
+hash_audio_help = "Instead of setting tags, hashes the audio of the files" +\
+    " (skipping their tags) and writes a JSON line per file with the" +\
+    " digest, whether its audio changed since it was recorded in the" +\
+    " --state-file, and the first file seen with the same audio. With a" +\
+    " --state-file, the files that were not modified are not read again."
+compact_state_help = "Removes the entries of files that no longer exist" +\
+    " or were modified from the --state-file, then exits."
+
+_stage_descriptions = {
+    "parse": "parsing the name of",
+    "load": "loading",
+    "set": "setting the tags of",
+    "write": "writing",
+    "hash": "hashing the audio of",
+}
+
+# The options of a section of a --from-file (see parse_from_file_sections).
+# name is the name of the section, None for a file without sections.
+FromFileSection = namedtuple("FromFileSection", ["name", "tags", "file",
+                                                 "files_directory",
+                                                 "parse_title_capitalize",
+                                                 "parse_title_as_is",
+                                                 "parse_title_clean",
+                                                 "parse_track_number"])
 
-_op_str_matchers = OptionalStringMatchers()
+# the options of a --from-file other than the tags, and the field of
+# FromFileSection each one sets.
+_from_file_options = {
+    "file": "file",
+    "files-directory": "files_directory",
+    "parse-title-capitalize": "parse_title_capitalize",
+    "parse-title-as-is": "parse_title_as_is",
+    "parse-title-clean": "parse_title_clean",
+    "parse-track-number": "parse_track_number",
+}
 
 
 @click.command()
@@ -63,12 +169,44 @@ _op_str_matchers = OptionalStringMatchers()
 @click.option('--parse-title-as-is', type=str, help=parse_asis_help)
 @click.option('--parse-title-clean', type=str, help=parse_clean_help)
 @click.option('--parse-track-number', type=str, help=parse_track_number)
+@click.option('--jobs', type=int, default=cpu_count() or 1, help=jobs_help)
+@click.option('--recursive', is_flag=True, help=recursive_help)
+@click.option('--detect-format', is_flag=True, help=detect_format_help)
+@click.option('--state-file', type=str, help=state_file_help)
+@click.option('--force', is_flag=True, help=force_help)
+@click.option('--compact-state', is_flag=True, help=compact_state_help)
+@click.option('--keep-going', is_flag=True, help=keep_going_help)
+@click.option('--failure-report', type=str, help=failure_report_help)
+@click.option('--timings', is_flag=True, help=timings_help)
+@click.option('--profile', type=str, help=profile_help)
+@click.option('--progress', is_flag=True, help=progress_help)
+@click.option('--export', type=click.Choice(EXPORT_FORMATS), help=export_help)
+@click.option('--export-output', type=str, help=export_output_help)
+@click.option('--import-manifest', type=str, help=import_manifest_help)
+@click.option('--dry-run', is_flag=True, help=dry_run_help)
+@click.option('--padding', type=click.IntRange(min=0), help=padding_help)
+@click.option('--rewrite-report', type=str, help=rewrite_report_help)
+@click.option('--artwork', type=str, help=artwork_help)
+@click.option('--artwork-max-size', type=click.IntRange(min=1),
+              help=artwork_max_size_help)
+@click.option('--watch', is_flag=True, help=watch_help)
+@click.option('--watch-settle', type=click.FloatRange(min=0), default=2.0,
+              help=watch_settle_help)
+@click.option('--watch-polling', is_flag=True, help=watch_polling_help)
+@click.option('--serve', type=str, help=serve_help)
+@click.option('--hash-audio', is_flag=True, help=hash_audio_help)
 def cli(file, files_directory, from_file, album, albumartist, artist, comment,
         compilation,
         composer, discnumber, genre, lyrics,
         totaldiscs, totaltracks,
         tracknumber, tracktitle, year, isrc, parse_title_capitalize,
-        parse_title_as_is, parse_title_clean, parse_track_number):
+        parse_title_as_is, parse_title_clean, parse_track_number, jobs,
+        recursive, detect_format, state_file, force, compact_state,
+        keep_going, failure_report, timings, profile, progress, export,
+        export_output,
+        import_manifest, dry_run, padding, rewrite_report, artwork,
+        artwork_max_size, watch, watch_settle, watch_polling, serve,
+        hash_audio):
     '''
     This CLI application receives an audio file and the tags that are to be
     setted/changed. Most tags are expected to be character
@@ -76,6 +214,15 @@ def cli(file, files_directory, from_file, album, albumartist, artist, comment,
     are expected to be set.
     '''
 
+    if compact_state:
+        compact_state_file(state_file)
+        return
+
+    if serve:
+        from EzAudioMeta import service
+        service.serve(serve, jobs, padding)
+        return
+
     tags = {
         "album": album,
         "albumartist": albumartist,
@@ -92,79 +239,247 @@ def cli(file, files_directory, from_file, album, albumartist, artist, comment,
         "tracktitle": tracktitle,
         "year": year,
         "isrc": isrc,
+        "artwork": artwork,
     }
 
     if from_file is not None:
+        sections = parse_from_file_sections(tags,
+                                            file,
+                                            files_directory,
+                                            from_file,
+                                            parse_title_capitalize,
+                                            parse_title_as_is,
+                                            parse_title_clean,
+                                            parse_track_number)
+        # each section is a job of its own, all run in this process.
+        if sections[0].name is not None:
+            if import_manifest or export or watch or hash_audio:
+                print("A --from-file with sections can't be used with" +
+                      " --import-manifest, --export, --watch or" +
+                      " --hash-audio.")
+                exit(1)
+            sections = validate_sections(from_file, sections,
+                                         artwork_max_size)
+            with instrumented_run(state_file, timings, profile) as\
+                    (state_index, stage_timings, profiler):
+                tag_sections(sections, jobs, recursive, detect_format,
+                             state_index, force, keep_going, failure_report,
+                             stage_timings, profiler, dry_run, padding,
+                             rewrite_report, artwork_max_size, progress)
+            return
         (tags,
          file,
          files_directory,
          parse_title_capitalize,
          parse_title_as_is,
          parse_title_clean,
-         parse_track_number) = parse_from_file(tags,
-                                               file,
-                                               files_directory,
-                                               from_file,
-                                               parse_title_capitalize,
-                                               parse_title_as_is,
-                                               parse_title_clean,
-                                               parse_track_number)
-
-    file_validation(file, files_directory)
-
-    # look for all files in dir if valid
-    if files_directory and not file:
-        actual_files = list(
-                        filter(
-                            lambda a: a.split(".")[-1] in valid_extensions,
-                            listdir(files_directory))
-                        )
-
-        for i in range(len(actual_files)):
-            actual_files[i] = files_directory + file_delimit + actual_files[i]
-    # else just 1 file
+         parse_track_number) = sections[0][1:]
+
+    if import_manifest and export:
+        print("--import-manifest and --export can't be used together.")
+        exit(1)
+
+    if hash_audio and (import_manifest or export or watch):
+        print("--hash-audio can't be used with --import-manifest, --export" +
+              " or --watch.")
+        exit(1)
+
+    if not import_manifest:
+        file_validation(file, files_directory)
+
+    if watch and (not files_directory or file or import_manifest or export):
+        print("--watch needs --files-directory (and no --file," +
+              " --import-manifest or --export).")
+        exit(1)
+
+    # the files and their tags are read from the manifest, row by row
+    if import_manifest:
+        validate_manifest(import_manifest)
+        actual_files = manifest_files(import_manifest)
+    # look for all files in dir if valid, they are yielded as they are found
+    elif files_directory and not file:
+        actual_files = scan_audio_files(files_directory, audio_extensions,
+                                        recursive, detect_format)
+    # else just 1 file, no need for worker processes
     else:
         actual_files = [file]
+        jobs = 1
 
-    tags_validation((parse_title_as_is
-                    or parse_title_capitalize
-                    or parse_title_clean),
-                    parse_track_number, **tags)
+    if export:
+        export_files(actual_files, export, export_output, jobs, keep_going,
+                     failure_report)
+        return
+
+    # the progress of a --file or a --files-directory (it's counted in the
+    # background), --watch has no end.
+    progress_reporter = None
+    if progress and not watch:
+        progress_reporter = new_progress_reporter(
+            None if import_manifest else file, files_directory, recursive,
+            detect_format)
+
+    if hash_audio:
+        with instrumented_run(state_file, profile=profile) as\
+                (state_index, _, _):
+            hash_files(actual_files, export_output, jobs, state_index, force,
+                       keep_going, failure_report, progress_reporter)
+        return
+
+    # the manifest has its own tags.
+    if not import_manifest:
+        tags_validation((parse_title_as_is
+                        or parse_title_capitalize
+                        or parse_title_clean),
+                        parse_track_number, **tags)
 
     tags_to_set = actual_tags(**tags)
+    # the path of the image, it's read once below.
+    artwork = tags_to_set.pop("artwork", None)
+
+    # the regex expressions are compiled (and validated) before any file is
+    # touched.
+    try:
+        parsers = compile_parsers(Parsers(parse_title_capitalize,
+                                          parse_title_as_is,
+                                          parse_title_clean,
+                                          parse_track_number))
+    except InvalidPatternError as e:
+        print(e)
+        exit(1)
 
     validate_tags_types(**tags_to_set)
 
-    for a_file in actual_files:
+    if artwork is not None:
+        artwork = load_artwork(artwork, artwork_max_size)
+
+    with instrumented_run(state_file, timings, profile) as\
+            (state_index, stage_timings, profiler):
+        if watch:
+            watch_files(files_directory, recursive, watch_settle,
+                        watch_polling, tags_to_set, parsers, jobs,
+                        state_index, force, failure_report, stage_timings,
+                        profiler, dry_run, padding, rewrite_report, artwork)
+        else:
+            tag_files(actual_files, tags_to_set, parsers, jobs,
+                      state_index, force, keep_going, failure_report,
+                      stage_timings, profiler, dry_run, padding,
+                      rewrite_report, artwork,
+                      progress=progress_reporter)
+
+
+@contextmanager
+def instrumented_run(state_file: str = None, timings: bool = False,
+                     profile: str = None):
+    '''
+    Opens the state index and starts the profiler (the ones given) for a
+    run, and closes them (writing the profile) when it ends.
+    -----
+    Yields: a tuple (state_index, stage_timings, profiler), None the ones
+    not used.
+    '''
+    state_index = None
+    if state_file:
+        from EzAudioMeta.utilities.state_index import StateIndex
+        state_index = StateIndex(state_file)
+    stage_timings = None
+    profiler = None
+    if timings or profile:
+        from EzAudioMeta.utilities.instrumentation import (StageTimings,
+                                                           Profiler)
+        stage_timings = StageTimings() if timings else None
+        profiler = Profiler() if profile else None
+    if profiler is not None:
+        profiler.enable()
+
+    try:
+        yield state_index, stage_timings, profiler
+    finally:
+        if state_index is not None:
+            state_index.close()
+        if profiler is not None:
+            profiler.disable()
+            if profiler.dump(profile):
+                print(f"Profile written to {profile}")
+            else:
+                print(f"Nothing was profiled, {profile} was not written.")
+
+
+def new_progress_reporter(file: str = None, files_directory: str = None,
+                          recursive: bool = False,
+                          detect_format: bool = False) -> "ProgressReporter":
+    '''
+    Returns: a ProgressReporter for the given file (1 file) or files
+    directory, whose files are counted in the background. The total of
+    anything else is unknown.
+    '''
+    from EzAudioMeta.utilities.progress import ProgressReporter
+
+    if file:
+        return ProgressReporter(total=1)
+    progress_reporter = ProgressReporter()
+    if files_directory:
+        progress_reporter.count_total(scan_audio_files(files_directory,
+                                                       audio_extensions,
+                                                       recursive,
+                                                       detect_format))
+    return progress_reporter
+
 
-        # If parse from title is set, then each time a track is received, the
-        # file name will be parsed to extract the track title and added to
-        # the tags to set dict. Since its called for all tracks, it will always
-        # update before setting the tags to file.
-        if parse_title_capitalize:
-            tags_to_set["tracktitle"] =\
-                 _op_str_matchers.\
-                 extract_track_title_capitalize(a_file,
-                                                parse_title_capitalize)
+def load_artwork(artwork_path: str, max_size: int = None):
+    '''
+    Reads (and scales down, if max_size is given) the artwork image once,
+    for all the files. If it can't be used, the process is terminated with
+    1 before any file is touched.
+    -----
+    Returns: the music_tag Artwork.
+    '''
+    file_validation(from_file=artwork_path)
+    from EzAudioMeta.audio.artwork import read_artwork
+    try:
+        return read_artwork(artwork_path, max_size)
+    except (ValueError, ImportError, OSError) as e:
+        print(f"{artwork_path}: {e}")
+        exit(1)
 
-        if parse_title_as_is:
-            tags_to_set["tracktitle"] =\
-                 _op_str_matchers.extract_track_title_as_is(a_file,
-                                                            parse_title_as_is)
 
-        if parse_title_clean:
-            tags_to_set["tracktitle"] =\
-                _op_str_matchers.extract_track_title_cleanup_and_capitalize(
-                    a_file,
-                    parse_title_clean
-                )
+def validate_manifest(manifest: str) -> None:
+    '''
+    Validates every row of the manifest before any file is tagged. Each
+    invalid row is printed with its line number, and if there is any, the
+    process is terminated with 1.
+    '''
+    file_validation(from_file=manifest)
+    invalid = 0
+    for row in read_manifest(manifest, str_tags, int_tags, audio_extensions):
+        if row.error is not None:
+            invalid += 1
+            print(f"{manifest}:{row.line}: {row.error}")
+    if invalid:
+        print(f"{invalid} invalid row(s) in {manifest}, no file was tagged.")
+        exit(1)
 
-        if parse_track_number:
-            tags_to_set["tracknumber"] =\
-                _op_str_matchers.extract_track_number(a_file,
-                                                      parse_track_number)
 
-        base_audio_wrapper(a_file, **tags_to_set)
+def manifest_files(manifest: str):
+    '''
+    Yields a (file, tags) pair for each row of a (validated) manifest.
+    '''
+    for row in read_manifest(manifest, str_tags, int_tags, audio_extensions):
+        yield row.file, row.tags
+
+
+def compact_state_file(state_file: str) -> None:
+    '''
+    Removes the stale entries of the given state file.
+    '''
+    if state_file is None:
+        print("No state file specified.")
+        exit(1)
+    file_validation(from_file=state_file)
+    from EzAudioMeta.utilities.state_index import StateIndex
+    state_index = StateIndex(state_file)
+    removed = state_index.compact()
+    state_index.close()
+    print(f"{removed} stale entrie(s) removed from {state_file}.")
 
 
 def parse_from_file(tags: dict,
@@ -177,70 +492,258 @@ def parse_from_file(tags: dict,
                     parse_track_number: str) -> tuple:
     '''
     Receives the tags dict and
-    maps the values from the given text file.
+    maps the values from the given text file. If the text file has
+    sections (see parse_from_file_sections), these are the options of the
+    first one.
     -----
     Returns: a tuple (tags, file, files_directory, parse_title_capitalize
     parse_title_as_is, title).
     '''
+    return parse_from_file_sections(tags,
+                                    file,
+                                    files_directory,
+                                    from_file,
+                                    parse_title_capitalize,
+                                    parse_title_as_is,
+                                    parse_title_clean,
+                                    parse_track_number)[0][1:]
+
+
+def parse_from_file_sections(tags: dict,
+                             file: str,
+                             files_directory: str,
+                             from_file: str,
+                             parse_title_capitalize: str,
+                             parse_title_as_is: str,
+                             parse_title_clean: str,
+                             parse_track_number: str) -> list:
+    '''
+    Receives the tags dict and the options of the command line, and maps
+    the values from the given text file, line by line. A "[name]" line
+    starts a section, a job with its own file or files-directory, tags and
+    parse patterns, set on top of the options before the first section.
+    An option set twice in a section, or a section name used twice,
+    terminates the process with 1.
+    -----
+    Returns: a list with a FromFileSection for each section, or a single
+    one named None if the text file has no sections.
+    '''
     file_validation(from_file=from_file)
+    options = {
+        "name": None,
+        "tags": tags,
+        "file": file,
+        "files_directory": files_directory,
+        "parse_title_capitalize": parse_title_capitalize,
+        "parse_title_as_is": parse_title_as_is,
+        "parse_title_clean": parse_title_clean,
+        "parse_track_number": parse_track_number,
+    }
+    # the options before the first section, the base of every section.
+    defaults = None
+    sections = []
+    # the options set in the current section.
+    section_options = None
     with open(from_file, 'r') as text_file:
-        lines = text_file.readlines()
+        # line by line, the file is never read whole.
+        for line_number, line in enumerate(text_file, start=1):
+            name = _section_name(line)
+            if name is not None:
+                if defaults is None:
+                    defaults = options
+                else:
+                    sections.append(FromFileSection(**options))
+                if any(section.name == name for section in sections):
+                    print(f"{from_file}:{line_number}: the section [{name}]" +
+                          " is already defined.")
+                    exit(1)
+                options = dict(defaults, name=name,
+                               tags=dict(defaults["tags"]))
+                section_options = set()
+                continue
 
-        for line in lines:
             tmp = line.split("=", 1)
 
             # this is for regular tags only
             # they are added to tags dict
             if tmp[0] in tags.keys():
-                tags[tmp[0]] = tmp[1].strip()
+                options["tags"][tmp[0]] = tmp[1].strip()
 
                 try:
                     if tmp[0] in int_tags:
-                        tags[tmp[0]] = int(tags[tmp[0]])
+                        options["tags"][tmp[0]] =\
+                            int(options["tags"][tmp[0]])
                 except Exception as e:
                     print(e)
                     print("The following tag is expected to" +
                           f" be a number: {tmp[0]}")
                     exit(1)
 
-            elif tmp[0] == "file":
-                file = tmp[1].strip()
+            elif tmp[0] in _from_file_options:
+                options[_from_file_options[tmp[0]]] = tmp[1].strip()
 
-            elif tmp[0] == "files-directory":
-                files_directory = tmp[1].strip()
+            else:
+                continue
 
-            elif tmp[0] == "parse-title-capitalize":
-                parse_title_capitalize = tmp[1].strip()
+            # in a section, a later line doesn't silently replace an option.
+            if section_options is not None:
+                if tmp[0] in section_options:
+                    print(f"{from_file}:{line_number}: '{tmp[0]}' is" +
+                          f" already set in [{options['name']}].")
+                    exit(1)
+                section_options.add(tmp[0])
 
-            elif tmp[0] == "parse-title-as-is":
-                parse_title_as_is = tmp[1].strip()
+    sections.append(FromFileSection(**options))
+    return sections
+
+
+def _section_name(line: str) -> str:
+    '''
+    Returns: the name of the section a "[name]" line starts, else None.
+    '''
+    line = line.strip()
+    if len(line) > 2 and line[0] == "[" and line[-1] == "]":
+        return line[1:-1].strip()
+    return None
 
-            elif tmp[0] == "parse-title-clean":
-                parse_title_clean = tmp[1].strip()
 
-            elif tmp[0] == "parse-track-number":
-                parse_track_number = tmp[1].strip()
+def validate_sections(from_file: str, sections: list,
+                      artwork_max_size: int = None) -> list:
+    '''
+    Validates every section of a --from-file before any file is tagged: its
+    file or files directory, its tags (and artwork) and its parse patterns.
+    Each invalid section is printed, and if there is any, the process is
+    terminated with 1.
+    -----
+    Returns: a list with a tuple (section, tags_to_set, parsers, artwork)
+    for each section: the tags that are set, the compiled parsers (see
+    api.compile_parsers) and the path of the artwork, if any.
+    '''
+    from EzAudioMeta.audio.artwork import read_artwork
 
-    return(tags,
-           file,
-           files_directory,
-           parse_title_capitalize,
-           parse_title_as_is,
-           parse_title_clean,
-           parse_track_number)
+    validated = []
+    invalid = 0
+    # each image is only read once, even if several sections set it.
+    artwork_errors = {}
+    for section in sections:
+        tags_to_set = actual_tags(**section.tags)
+        artwork = tags_to_set.pop("artwork", None)
+        error = _target_error(section.file, section.files_directory)
+        try:
+            validate_tags(tags_to_set)
+            parsers = compile_parsers(Parsers(*section[4:]))
+        except (InvalidTagError, InvalidPatternError) as e:
+            error = error or str(e)
+        if not error and not tags_to_set and artwork is None and\
+                not any(parsers):
+            error = "No tags specified."
+        if not error and artwork is not None:
+            if artwork not in artwork_errors:
+                try:
+                    read_artwork(artwork, artwork_max_size)
+                    artwork_errors[artwork] = None
+                except (ValueError, ImportError, OSError) as e:
+                    artwork_errors[artwork] = f"{artwork}: {e}"
+            error = artwork_errors[artwork]
+        if error:
+            invalid += 1
+            print(f"{from_file}: [{section.name}] {error}")
+            continue
+        validated.append((section, tags_to_set, parsers, artwork))
+    if invalid:
+        print(f"{invalid} invalid section(s) in {from_file}, no file was" +
+              " tagged.")
+        exit(1)
+    return validated
+
+
+def _target_error(file: str, files_directory: str) -> str:
+    '''
+    Returns: what is wrong with the file or files directory of a section,
+    None if it can be tagged.
+    '''
+    if file:
+        if not path.isfile(file):
+            return f"{file} doesn't exist or is not a file."
+    elif files_directory:
+        if not path.isdir(files_directory):
+            return f"{files_directory} doesn't exist or is not a directory."
+    else:
+        return "No file or directory specified."
+    return None
+
+
+def tag_sections(sections: list, jobs: int, recursive: bool = False,
+                 detect_format: bool = False,
+                 state_index: "StateIndex" = None, force: bool = False,
+                 keep_going: bool = False, failure_report: str = None,
+                 timings: "StageTimings" = None,
+                 profiler: "Profiler" = None, dry_run: bool = False,
+                 padding: int = None, rewrite_report: str = None,
+                 artwork_max_size: int = None,
+                 progress: bool = False) -> None:
+    '''
+    Tags the files of each validated section of a --from-file (see
+    validate_sections) through tag_files, one section after another, in the
+    same pool of worker processes. A new pool is only started when the
+    artwork changes (it's shared with the workers when they start). The
+    first file that fails terminates the process with 1, unless keep_going
+    is set, then the failures of every section are reported (and appended
+    to the failure report) and the process is terminated with 1 at the
+    end. If progress is set, the progress of each section is shown.
+    '''
+    # the failures and the files rewritten of every section are appended.
+    for report in (failure_report, rewrite_report):
+        if report:
+            open(report, "w").close()
+    pool = None
+    pool_artwork = None
+    artwork = None
+    failed = 0
+    try:
+        for section, tags_to_set, parsers, artwork_path in sections:
+            if pool is None or artwork_path != pool_artwork:
+                if pool is not None:
+                    pool[0].shutdown()
+                artwork = load_artwork(artwork_path, artwork_max_size)\
+                    if artwork_path else None
+                pool = worker_pool(jobs, artwork)
+                pool_artwork = artwork_path
+            if section.file:
+                print(f"[{section.name}] {section.file}")
+                files = [section.file]
+            else:
+                print(f"[{section.name}] {section.files_directory}")
+                files = scan_audio_files(section.files_directory,
+                                         audio_extensions, recursive,
+                                         detect_format)
+            progress_reporter = new_progress_reporter(
+                section.file, section.files_directory, recursive,
+                detect_format) if progress else None
+            failed += tag_files(files, tags_to_set, parsers, jobs,
+                                state_index, force, keep_going,
+                                failure_report, timings, profiler, dry_run,
+                                padding, rewrite_report, artwork, pool,
+                                batch=True, progress=progress_reporter)
+            if state_index is not None:
+                state_index.commit()
+    finally:
+        if pool is not None:
+            pool[0].shutdown(cancel_futures=True)
+    if failed:
+        exit(1)
 
 
 def validate_tags_types(**tags_to_set):
     '''
-    Validates that each actual tag is of the expected type
+    Validates that each actual tag is of the expected type (see
+    api.validate_tags), else terminates the process with 1.
     '''
-    for tag in tags_to_set:
-        if tag in str_tags and not isinstance(tags_to_set[tag], str):
-            print(f"'{tag}' is expected to be a sequence of characters.")
-            exit(1)
-        elif tag in int_tags and not isinstance(tags_to_set[tag], int):
-            print(f"'{tag}' is expected to be a sequence of numbers.")
-            exit(1)
+    try:
+        validate_tags(tags_to_set)
+    except InvalidTagError as e:
+        print(e)
+        exit(1)
 
 
 def actual_tags(**tags) -> dict:
@@ -308,25 +811,388 @@ def file_validation(file=None, files_directory=None, from_file=None) -> None:
             exit(1)
 
 
-def base_audio_wrapper(file, **tags_to_set):
+def tag_files(actual_files, tags_to_set: dict, parsers: tuple, jobs: int,
+              state_index: "StateIndex" = None, force: bool = False,
+              keep_going: bool = False, failure_report: str = None,
+              timings: "StageTimings" = None,
+              profiler: "Profiler" = None, dry_run: bool = False,
+              padding: int = None, rewrite_report: str = None,
+              artwork=None, pool: tuple = None,
+              batch: bool = False,
+              progress: "ProgressReporter" = None) -> int:
     '''
-    send and write tags to file
+    Receives the files to tag, the tags to set and the file name parsers
+    (parse_title_capitalize, parse_title_as_is, parse_title_clean,
+    parse_track_number), and writes the tags of each file. A file can also
+    be a (file, tags) pair, then its tags are set on top of tags_to_set
+    (like the rows of a manifest). The files go
+    through a pipeline (see api.tag_results): they are discovered, their
+    names parsed and their tags written concurrently, with more than 1 job
+    in a pool of worker processes. Results are checked in the same order as
+    the files were received, the first error found is printed and the
+    process is terminated with 1. At the end, the number of files written
+    and skipped (their tags were already up to date) is printed.
+    If a state index is given, the files it has as up to date are not
+    opened at all (unless force is set), and the files tagged are recorded
+    in it.
+    If keep_going is set, the files that fail are collected instead, and
+    summarized (and written to the failure report, if any) at the end.
+    If timings are given, the seconds each stage took for each file are
+    collected and their stats printed at the end. If a profiler is given,
+    the threads of the pipeline are profiled too (the worker processes
+    are not).
+    If dry_run is set, no file is written (nor recorded in the state
+    index), the tags that would change in each file are printed instead.
+    padding is the padding reserved in the files whose tags don't fit (see
+    BaseAudio.write_tags). If padding or a rewrite report is given, the
+    number of files written in place and fully rewritten is printed, and the
+    paths of the ones rewritten are written to the rewrite report.
+    If an artwork (a music_tag Artwork) is given, it's set to all the
+    files. It's sent to each worker process once, the files only carry its
+    digest (which is what the state index records).
+    If a pool (executor, workers) is given (see worker_pool), the files are
+    tagged in it and it's left open. If batch is set (a batch of --watch or
+    a section of a --from-file), the failures kept with keep_going don't
+    terminate the process, they (and the files rewritten) are appended to
+    the reports.
+    If a progress reporter is given, each file done (or skipped) is added
+    to it, and it's closed before the summary.
+    -----
+    Returns: the number of files that failed.
     '''
+    if state_index is not None:
+        # not imported without one, it imports sqlite3.
+        from EzAudioMeta.utilities.state_index import tags_digest
+
+    counts = {"written": 0, "skipped": 0, "up_to_date": 0, "in_place": 0,
+              "rewritten": 0}
+    failures = []
+    timed = timings is not None
+
+    def up_to_date(a_file, file_tags) -> bool:
+        if state_index is None or force or\
+                not state_index.is_up_to_date(a_file, tags_digest(file_tags)):
+            return False
+        counts["up_to_date"] += 1
+        if progress is not None:
+            progress.skipped()
+        return True
+
+    if artwork is not None:
+        tags_to_set = dict(tags_to_set,
+                           artwork=sha1(artwork_data(artwork)).hexdigest())
+
+    work = plan_file if dry_run else partial(tag_file, padding=padding)
+    executor, workers = pool or worker_pool(jobs, artwork)
+    if profiler is not None and jobs <= 1:
+        work = profiler.wrap(work)
+
+    if dry_run:
+        print("Dry run, no file is written.")
+    if progress is not None:
+        progress.start(executor)
+    rewritten_files = open(rewrite_report, "a" if batch else "w",
+                           encoding="utf-8")\
+        if rewrite_report and not dry_run else None
+
     try:
-        audio_file = base_audio.BaseAudio()
-        audio_file.load_track(file)
-        audio_file.set_tags(**tags_to_set)
-        audio_file.write_tags()
-    except NotImplementedError as nie:
-        print(nie)
-        print(f"Error while loading file:{file}")
+        for a_file, file_tags, (written, failure, stage_seconds,
+                                full_rewrite) in\
+                tag_results(actual_files, tags_to_set, parsers, work,
+                            executor, workers, up_to_date, timings,
+                            profiler):
+            if failure is not None:
+                failures.append(failure)
+            elif dry_run:
+                # written holds the tags that would change.
+                print_plan(a_file, written)
+                counts["written" if written else "skipped"] += 1
+            else:
+                counts["written" if written else "skipped"] += 1
+                if full_rewrite is not None:
+                    counts["rewritten" if full_rewrite else "in_place"] += 1
+                if full_rewrite and rewritten_files is not None:
+                    rewritten_files.write(a_file + "\n")
+                if state_index is not None:
+                    state_index.record(a_file, tags_digest(file_tags))
+            if stage_seconds is not None:
+                timings.add_file(a_file, stage_seconds)
+            if progress is not None:
+                progress.done(failure is not None)
+            if failures and not keep_going:
+                break
+    finally:
+        if progress is not None:
+            progress.close()
+        if pool is None:
+            executor.shutdown(cancel_futures=True)
+        if rewritten_files is not None:
+            rewritten_files.close()
+
+    if timed:
+        timings.report()
+
+    if failures and not keep_going:
+        print(_failure_message(failures[0]))
         exit(1)
-    except TypeError as te:
-        print(te)
+
+    would_be = "would be " if dry_run else ""
+    print(f"{counts['written']} file(s) {would_be}written," +
+          f" {counts['skipped']} file(s) {would_be}skipped (tags already" +
+          " up to date).")
+    if padding is not None or rewrite_report:
+        print(f"{counts['in_place']} file(s) updated in place," +
+              f" {counts['rewritten']} file(s) fully rewritten (the tags" +
+              " didn't fit in the space reserved for them).")
+    if state_index is not None:
+        print(f"{counts['up_to_date']} file(s) not opened (unchanged since" +
+              " the last run).")
+
+    if failures:
+        report_failures(failures, failure_report, append=batch)
+        if not batch:
+            exit(1)
+    return len(failures)
+
+
+def watch_files(files_directory: str, recursive: bool, settle: float,
+                polling: bool, tags_to_set: dict, parsers: tuple, jobs: int,
+                state_index: "StateIndex" = None, force: bool = False,
+                failure_report: str = None, timings: "StageTimings" = None,
+                profiler: "Profiler" = None, dry_run: bool = False,
+                padding: int = None, rewrite_report: str = None,
+                artwork=None) -> None:
+    '''
+    Tags the audio files of the directory as they are added or modified
+    (see utilities.watcher), until interrupted with Ctrl+C. The files
+    already there are tagged first. Each batch of files that settled goes
+    through tag_files, in the same pool of worker processes for the whole
+    run. A file that fails is reported (and appended to the failure
+    report) without stopping the watch.
+    '''
+    from EzAudioMeta.utilities.watcher import DirectoryWatcher
+
+    watcher = DirectoryWatcher(files_directory, audio_extensions, recursive,
+                               settle, polling)
+    pool = worker_pool(jobs, artwork)
+    # the failures and the files rewritten of every batch are appended.
+    for report in (failure_report, rewrite_report):
+        if report:
+            open(report, "w").close()
+    print(f"Watching {files_directory} ({watcher.method})," +
+          " press Ctrl+C to stop.", flush=True)
+    try:
+        for files in watcher.batches():
+            tag_files(files, tags_to_set, parsers, jobs, state_index, force,
+                      True, failure_report, timings, profiler, dry_run,
+                      padding, rewrite_report, artwork, pool, batch=True)
+            if state_index is not None:
+                state_index.commit()
+            sys.stdout.flush()
+    except KeyboardInterrupt:
+        print("Stopped watching.")
+    finally:
+        pool[0].shutdown(cancel_futures=True)
+        watcher.close()
+
+
+def print_plan(file: str, changes: dict) -> None:
+    '''
+    Prints the tags that would change in a file, if any.
+    '''
+    if not changes:
+        return
+    print(file)
+    for tag, (current_value, new_value) in changes.items():
+        # the images are described by plan_file.
+        if tag == "artwork":
+            print(f"  {tag}: {current_value} -> {new_value}")
+            continue
+        print(f"  {tag}: {current_value!r} -> {new_value!r}")
+
+
+def export_files(actual_files, export_format: str, export_output: str,
+                 jobs: int, keep_going: bool = False,
+                 failure_report: str = None) -> None:
+    '''
+    Reads the tags (export_tags) of each file and writes them, in the same
+    order as the files were received, to the export output (or the standard
+    output) as JSON lines or CSV. Only the tag header of the files is read
+    when the format is supported by the header reader, with more than 1 job
+    in a pool of worker processes. When writing to the standard output, the
+    messages are printed to the standard error.
+    The first file that can't be read terminates the process with 1, unless
+    keep_going is set, then the failures are summarized at the end.
+    '''
+    from EzAudioMeta.utilities.pipeline import run_pipeline
+
+    messages = sys.stderr if export_output is None else None
+    output = open(export_output, "w", newline="", encoding="utf-8")\
+        if export_output else sys.stdout
+    export_writer = TagExportWriter(output, export_format, export_tags)
+    executor, workers = worker_pool(jobs)
+    exported = 0
+    failures = []
+
+    try:
+        for a_file, (row, failure) in run_pipeline(
+                actual_files, lambda a_file: a_file, read_file_tags,
+                executor, workers):
+            if failure is not None:
+                failures.append(failure)
+                if not keep_going:
+                    break
+                continue
+            export_writer.write(row)
+            exported += 1
+    finally:
+        executor.shutdown(cancel_futures=True)
+        export_writer.flush()
+        if export_output:
+            output.close()
+
+    if failures and not keep_going:
+        print(_failure_message(failures[0]), file=messages)
         exit(1)
-    except Exception as e:
-        print(e)
+
+    print(f"{exported} file(s) exported.", file=messages)
+    if failures:
+        report_failures(failures, failure_report, messages)
+        exit(1)
+
+
+def hash_files(actual_files, hash_output: str, jobs: int,
+               state_index: "StateIndex" = None, force: bool = False,
+               keep_going: bool = False, failure_report: str = None,
+               progress: "ProgressReporter" = None) -> None:
+    '''
+    Hashes the audio payload of each file (see audio.audio_hash) and writes
+    a JSON line per file to the hash output (or the standard output), in
+    the same order as the files, with its audio_digest, its status and
+    duplicate_of: the first file seen with the same audio (None for that
+    first file itself, and for a file with no duplicate). The status is
+    'hashed' for a file that is not in the state index, 'unchanged' for a
+    file not modified since it was hashed (it's not read again, unless
+    force is set), 'tags_changed' for a file modified with the same audio
+    and 'audio_changed' for a file whose audio changed. Without a state
+    index, the duplicates are only looked for in the files of this run.
+    With one, the first file seen is the first recorded in it, in this or a
+    previous run.
+    The first file that can't be hashed terminates the process with 1,
+    unless keep_going is set, then the failures are summarized at the end.
+    If a progress reporter is given, each file hashed is added to it.
+    '''
+    from EzAudioMeta.api import hash_results
+
+    messages = sys.stderr if hash_output is None else None
+    output = open(hash_output, "w", newline="", encoding="utf-8")\
+        if hash_output else sys.stdout
+    hash_writer = TagExportWriter(output, "jsonl",
+                                  ["audio_digest", "status", "duplicate_of"])
+    executor, workers = worker_pool(jobs)
+    known = None
+    if state_index is not None and not force:
+        known = state_index.unchanged_audio_digest
+    # the first file of each digest, when there is no state index.
+    first_files = {}
+    counts = dict.fromkeys(["hashed", "unchanged", "tags_changed",
+                            "audio_changed"], 0)
+    duplicates = 0
+    failures = []
+    if progress is not None:
+        progress.start(executor)
+
+    try:
+        for a_file, (digest, failure, file_stat) in hash_results(
+                actual_files, executor, workers, known):
+            if progress is not None:
+                progress.done(failure is not None)
+            if failure is not None:
+                failures.append(failure)
+                if not keep_going:
+                    break
+                continue
+            status = "unchanged"
+            if state_index is None:
+                status = "hashed"
+                duplicate_of = first_files.setdefault(digest, a_file)
+                if duplicate_of == a_file:
+                    duplicate_of = None
+            else:
+                # the files not modified since they were hashed have no
+                # file_stat, they were not read again.
+                if file_stat is not None:
+                    stored = state_index.stored_audio_digest(a_file)
+                    if stored is None:
+                        status = "hashed"
+                    elif stored[2] == digest:
+                        status = "tags_changed"
+                    else:
+                        status = "audio_changed"
+                    state_index.record_audio_digest(a_file, *file_stat,
+                                                    digest)
+                duplicate_of = state_index.same_audio(a_file, digest)
+            counts[status] += 1
+            duplicates += duplicate_of is not None
+            hash_writer.write({"file": a_file, "audio_digest": digest,
+                               "status": status,
+                               "duplicate_of": duplicate_of})
+    finally:
+        if progress is not None:
+            progress.close()
+        executor.shutdown(cancel_futures=True)
+        hash_writer.flush()
+        if hash_output:
+            output.close()
+
+    if failures and not keep_going:
+        print(_failure_message(failures[0]), file=messages)
+        exit(1)
+
+    print(", ".join(f"{count} file(s) {status.replace('_', ' ')}"
+                    for status, count in counts.items()) +
+          f", {duplicates} with the same audio as another file.",
+          file=messages)
+    if failures:
+        report_failures(failures, failure_report, messages)
+        exit(1)
+
+
+def report_failures(failures: list, failure_report: str = None,
+                    messages=None, append: bool = False) -> None:
+    '''
+    Prints a summary of the files that failed (to the messages stream, the
+    standard output by default), and writes them as JSON lines to the
+    failure report file, if given (after what it has, if append is set).
+    '''
+    print(f"{len(failures)} file(s) failed:", file=messages)
+    for failure in failures:
+        print(f"  {failure.file} [{failure.stage}] {failure.error_type}:" +
+              f" {failure.message}", file=messages)
+
+    if failure_report:
+        with open(failure_report, "a" if append else "w") as report:
+            for failure in failures:
+                report.write(dumps(failure._asdict()) + "\n")
+
+
+def _failure_message(failure: TagFailure) -> str:
+    return f"{failure.message}\nError while" +\
+        f" {_stage_descriptions[failure.stage]} file:{failure.file}"
+
+
+def base_audio_wrapper(file, **tags_to_set) -> bool:
+    '''
+    send and write tags to file
+    -----
+    Returns: True if the file was saved, False if its tags were already up
+    to date.
+    '''
+    written, failure, _, _ = tag_file((file, tags_to_set, False))
+    if failure is not None:
+        print(_failure_message(failure))
         exit(1)
+    return written
 
 
 if __name__ == "__main__":
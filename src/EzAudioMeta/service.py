@@ -0,0 +1,425 @@
+'''
+Local tagging service (--serve): a JSON API over HTTP, on localhost or on a
+Unix socket, so a tool that tags many small batches doesn't pay the start up
+of the interpreter, click and music_tag on each of them. The worker pool is
+started (and music_tag imported in it) before the first request.
+
+    POST /set    {"file": "path", "artist": "...", ...}
+                 -> {"file": "path", "written": true, "full_rewrite": false}
+    POST /get    {"file": "path", "tags": ["artist", ...]}
+                 -> {"file": "path", "artist": "...", ...}
+    POST /batch  {"requests": [{"op": "set", ...}, {"op": "get", ...}]}
+                 -> {"results": [...]}
+    GET /status  -> {"status": "ok", "workers": 4}
+
+A set request is a row of an --import-manifest JSON lines manifest, and the
+response of a get is a row of --export. The requests to the same file are
+run one after another, the ones to different files at the same time.
+
+A web page can send requests to localhost too, so the POST requests have to
+be 'Content-Type: application/json' (a page can't send that without the
+consent of the service, 415 otherwise). Over HTTP, the Host has to be a
+loopback address or localhost, with the port listened on (403 otherwise),
+so a name of another site resolved to 127.0.0.1 (DNS rebinding) is refused.
+'''
+from collections import defaultdict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from ipaddress import ip_address
+from json import dumps, loads, JSONDecodeError
+from os import lstat, path, remove
+from socket import AF_INET6
+from stat import S_ISSOCK
+from socketserver import ThreadingMixIn, UnixStreamServer
+from threading import Lock
+
+from EzAudioMeta.api import (audio_extensions, export_tags, int_tags,
+                             read_file_tags, str_tags, tag_file)
+from EzAudioMeta.utilities.manifest import validate_row
+
+# the biggest request body accepted, in bytes.
+MAX_REQUEST_SIZE = 16 * 1024 * 1024
+
+_OPERATIONS = ("set", "get")
+_ROUTES = ("/set", "/get", "/batch")
+
+
+class InvalidRequest(ValueError):
+    '''
+    A request that can't be run, answered with 400.
+    '''
+
+
+class TaggingService:
+    '''
+    Runs the set and get requests in a warm pool of jobs worker processes
+    (a worker thread with 1 job), each file locked while its requests run.
+    '''
+
+    def __init__(self, jobs: int, padding: int = None) -> None:
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+        self.workers = max(1, jobs)
+        self._padding = padding
+        if jobs <= 1:
+            self._executor = ThreadPoolExecutor(max_workers=1,
+                                                initializer=_warm_up)
+        else:
+            self._executor = ProcessPoolExecutor(max_workers=jobs,
+                                                 initializer=_warm_up)
+        # every worker is started (and has imported music_tag) before the
+        # first request.
+        for future in [self._executor.submit(_ready)
+                       for _ in range(self.workers)]:
+            future.result()
+        self._locks_lock = Lock()
+        # real path: [lock, requests using it].
+        self._locks = {}
+
+    def close(self) -> None:
+        self._executor.shutdown(cancel_futures=True)
+
+    def handle(self, route: str, body: dict) -> tuple:
+        '''
+        Runs the request of a route (/set, /get or /batch).
+        -----
+        Returns: a tuple (HTTP status, response). A file that couldn't be
+        tagged or read is answered with 422, and in a batch with its error
+        in its result.
+        Raises: InvalidRequest if the request is not valid.
+        '''
+        if not isinstance(body, dict):
+            raise InvalidRequest("Expected a JSON object.")
+        if route == "/batch":
+            requests = body.get("requests")
+            if not isinstance(requests, list) or not requests:
+                raise InvalidRequest("Expected a non empty list of" +
+                                     " 'requests'.")
+            operations = []
+            for i, request in enumerate(requests):
+                if not isinstance(request, dict) or\
+                        request.get("op") not in _OPERATIONS:
+                    raise InvalidRequest(f"requests[{i}]: 'op' is expected" +
+                                         " to be 'set' or 'get'.")
+                request = dict(request)
+                operation = request.pop("op")
+                try:
+                    operations.append(_validated(operation, request))
+                except InvalidRequest as e:
+                    raise InvalidRequest(f"requests[{i}]: {e}") from e
+            return 200, {"results": self.run(operations)}
+
+        operation = route[1:]
+        if operation not in _OPERATIONS:
+            raise InvalidRequest(f"Unknown route: {route}")
+        result = self.run([_validated(operation, body)])[0]
+        return (422 if "error" in result else 200), result
+
+    def run(self, operations: list) -> list:
+        '''
+        Runs the (validated) operations, a (operation, file, arguments)
+        each. The ones of the same file run in order in a single worker,
+        with the file locked.
+        -----
+        Returns: the result of each operation, in the same order.
+        '''
+        # the operations of each file (its real path, a file can be given
+        # by several paths), with their index in the results.
+        by_file = defaultdict(list)
+        for index, operation in enumerate(operations):
+            by_file[path.realpath(operation[1])].append((index, operation))
+
+        results = [None] * len(operations)
+        with self._locked(by_file):
+            futures = {}
+            for key, file_operations in by_file.items():
+                futures[key] = self._executor.submit(
+                    _run_file_operations,
+                    [operation for _, operation in file_operations],
+                    self._padding)
+            for key, file_operations in by_file.items():
+                for (index, _), result in zip(file_operations,
+                                              futures[key].result()):
+                    results[index] = result
+        return results
+
+    @contextmanager
+    def _locked(self, keys):
+        '''
+        Locks the given files (real paths) while in the context, always in
+        the same order so two requests can't wait on each other.
+        '''
+        keys = sorted(keys)
+        with self._locks_lock:
+            entries = []
+            for key in keys:
+                entry = self._locks.setdefault(key, [Lock(), 0])
+                entry[1] += 1
+                entries.append(entry)
+        for lock, _ in entries:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock, _ in reversed(entries):
+                lock.release()
+            with self._locks_lock:
+                for key, entry in zip(keys, entries):
+                    entry[1] -= 1
+                    if entry[1] == 0:
+                        del self._locks[key]
+
+
+def _validated(operation: str, request: dict) -> tuple:
+    '''
+    Returns: a tuple (operation, file, arguments), the tags to set or the
+    tags to get.
+    Raises: InvalidRequest if the request is not valid.
+    '''
+    request = dict(request)
+    if operation == "set":
+        file, tags, error = validate_row(request, str_tags, int_tags,
+                                         audio_extensions)
+        if error is not None:
+            raise InvalidRequest(error)
+        if not tags:
+            raise InvalidRequest("No tags to set.")
+        return operation, file, tags
+
+    tags = request.pop("tags", export_tags)
+    if not isinstance(tags, list) or\
+            any(tag not in export_tags for tag in tags):
+        raise InvalidRequest("'tags' is expected to be a list of: " +
+                             ", ".join(export_tags) + ".")
+    file, _, error = validate_row(request, str_tags, int_tags,
+                                  audio_extensions)
+    if error is not None:
+        raise InvalidRequest(error)
+    return operation, file, tags
+
+
+def _warm_up() -> None:
+    # music_tag (and mutagen) are imported once per worker, not on the
+    # first request.
+    import music_tag  # noqa: F401
+
+
+def _ready() -> bool:
+    return True
+
+
+def _run_file_operations(operations: list, padding: int = None) -> list:
+    '''
+    Runs the (operation, file, arguments) operations of a single file, in
+    order. Runs in the worker processes.
+    -----
+    Returns: a result dict for each operation.
+    '''
+    results = []
+    for operation, file, arguments in operations:
+        if operation == "set":
+            written, failure, _, full_rewrite = tag_file(
+                (file, arguments, False), padding)
+            result = {"file": file, "written": written,
+                      "full_rewrite": full_rewrite}
+        else:
+            result, failure = read_file_tags(file, arguments)
+        if failure is not None:
+            result = {"file": file, "error": {
+                "error_type": failure.error_type,
+                "message": failure.message, "stage": failure.stage}}
+        results.append(result)
+    return results
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+
+    # set by make_server.
+    service = None
+
+    def do_GET(self) -> None:
+        if not self._allowed_host():
+            return
+        if self.path != "/status":
+            self._respond(404, _error("InvalidRequest",
+                                      f"Unknown route: {self.path}"))
+            return
+        self._respond(200, {"status": "ok",
+                            "workers": self.service.workers})
+
+    def do_POST(self) -> None:
+        if not self._allowed_host():
+            return
+        if self.path not in _ROUTES:
+            self._respond(404, _error("InvalidRequest",
+                                      f"Unknown route: {self.path}"))
+            return
+        if self.headers.get_content_type() != "application/json":
+            self._respond(415, _error("InvalidRequest",
+                                      "Content-Type is expected to be" +
+                                      " application/json."))
+            return
+        try:
+            length = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            self._respond(411, _error("InvalidRequest",
+                                      "Content-Length is required."))
+            return
+        if length > MAX_REQUEST_SIZE:
+            self._respond(413, _error("InvalidRequest",
+                                      "The request is too big."))
+            return
+        try:
+            body = loads(self.rfile.read(length) or b"null")
+            status, response = self.service.handle(self.path, body)
+        except JSONDecodeError as e:
+            status, response = 400, _error("InvalidRequest",
+                                           f"Invalid JSON: {e.msg}.")
+        except InvalidRequest as e:
+            status, response = 400, _error("InvalidRequest", str(e))
+        except Exception as e:
+            # like a worker process that died.
+            status, response = 500, _error(type(e).__name__, str(e))
+        self._respond(status, response)
+
+    def _allowed_host(self) -> bool:
+        '''
+        Answers 403 if the Host of the request is not a loopback address or
+        localhost with the port of the server. The clients of a Unix socket
+        are not checked, a web page can't reach it.
+        -----
+        Returns: True if the request can go on.
+        '''
+        if not isinstance(self.client_address, tuple):
+            return True
+        host, _, port = self.headers.get("Host", "").rpartition(":")
+        if not port.isdigit() or int(port) != self.server.server_address[1]:
+            # no port, or the host of an IPv6 address without it.
+            host = None
+        elif host != "localhost":
+            try:
+                host = ip_address(host.strip("[]"))
+                host = host if host.is_loopback else None
+            except ValueError:
+                host = None
+        if host is None:
+            self._respond(403, _error("InvalidRequest",
+                                      "Host is expected to be localhost" +
+                                      " or a loopback address, with the" +
+                                      " port."))
+            return False
+        return True
+
+    def address_string(self) -> str:
+        # the clients of a Unix socket have no address.
+        if isinstance(self.client_address, tuple):
+            return super().address_string()
+        return "unix"
+
+    def log_message(self, format, *args) -> None:
+        # quiet, the tool calling the service has its own logs.
+        pass
+
+    def _respond(self, status: int, response: dict) -> None:
+        data = dumps(response).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def _error(error_type: str, message: str) -> dict:
+    return {"error": {"error_type": error_type, "message": message}}
+
+
+class _UnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+
+class _ThreadingHTTPServerV6(ThreadingHTTPServer):
+    address_family = AF_INET6
+
+
+def parse_address(address: str) -> tuple:
+    '''
+    Receives the address of --serve: HOST:PORT or PORT (HTTP on a loopback
+    address), anything else is the path of a Unix socket.
+    -----
+    Returns: a (host, port) tuple, or the path of the Unix socket.
+    Raises: ValueError if the host is not a loopback address.
+    '''
+    if address.isdigit():
+        return "127.0.0.1", int(address)
+    host, _, port = address.rpartition(":")
+    if not host or not port.isdigit():
+        return address
+    host = host.strip("[]")
+    try:
+        loopback = host == "localhost" or ip_address(host).is_loopback
+    except ValueError:
+        loopback = False
+    if not loopback:
+        raise ValueError("--serve only listens on localhost" +
+                         " (127.0.0.1, ::1 or localhost).")
+    return host, int(port)
+
+
+def make_server(address, service: TaggingService):
+    '''
+    Returns: the (not yet serving) HTTP server of the service, on a (host,
+    port) tuple or on the path of a Unix socket.
+    Raises: OSError if it can't listen, FileExistsError if the path of the
+    Unix socket is taken by something that is not a socket.
+    '''
+    handler = type("RequestHandler", (_RequestHandler,),
+                   {"service": service})
+    if isinstance(address, tuple):
+        if ":" in address[0]:
+            return _ThreadingHTTPServerV6(address, handler)
+        return ThreadingHTTPServer(address, handler)
+    if path.lexists(address):
+        if not _is_socket(address):
+            raise FileExistsError("not a socket")
+        # a socket left by a service that didn't stop cleanly.
+        remove(address)
+    return _UnixHTTPServer(address, handler)
+
+
+def _is_socket(socket_path: str) -> bool:
+    try:
+        return S_ISSOCK(lstat(socket_path).st_mode)
+    except OSError:
+        return False
+
+
+def serve(address: str, jobs: int, padding: int = None) -> None:
+    '''
+    Serves the tagging API on the given address until interrupted with
+    Ctrl+C. If the address is not valid, the process is terminated with 1.
+    '''
+    try:
+        address = parse_address(address)
+    except ValueError as e:
+        print(e)
+        exit(1)
+    service = TaggingService(jobs, padding)
+    try:
+        server = make_server(address, service)
+    except OSError as e:
+        service.close()
+        print(f"Can't listen on {address}: {e}")
+        exit(1)
+    where = f"http://{address[0]}:{server.server_address[1]}"\
+        if isinstance(address, tuple) else f"unix:{address}"
+    print(f"Serving on {where} ({service.workers} worker(s))," +
+          " press Ctrl+C to stop.", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Stopped serving.")
+    finally:
+        server.server_close()
+        service.close()
+        if not isinstance(address, tuple) and _is_socket(address):
+            remove(address)
@@ -0,0 +1,38 @@
+from os import scandir
+from os import path
+
+from EzAudioMeta.audio.format_sniffer import sniff_format
+
+
+def scan_audio_files(directory: str, extensions: frozenset,
+                     recursive: bool = False, detect_format: bool = False):
+    '''
+    Receives a directory and yields the path of each file whose extension
+    (case insensitive, without the dot) is in the given extensions.
+    Files are yielded as soon as they are found, so the caller can start
+    working on the first one before the whole tree is listed. The file type
+    is taken from the directory entry itself, no extra stat call is done.
+    If recursive is set, sub directories are walked too. If detect_format
+    is set, the files whose extension is not in the extensions are yielded
+    too if their format (see audio.format_sniffer, read from their first
+    bytes) is.
+    '''
+    pending = [directory]
+    while pending:
+        with scandir(pending.pop()) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    extension = path.splitext(entry.name)[1][1:].lower()
+                    if extension in extensions or detect_format and\
+                            _format(entry.path) in extensions:
+                        yield entry.path
+                elif recursive and entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+
+
+def _format(file_path: str) -> str:
+    try:
+        return sniff_format(file_path)
+    except OSError:
+        # can't be read, so it's not tagged either.
+        return None
@@ -0,0 +1,192 @@
+'''
+Instrumentation of the tagging runs: per stage timings (--timings) and
+cProfile (--profile). Neither is created when the options are not set, so
+the only cost left in the tagging code is checking for None.
+'''
+from array import array
+from cProfile import Profile
+from heapq import heappush, heappushpop
+from pstats import Stats
+from random import Random
+from threading import local, Lock
+from time import perf_counter
+import sys
+
+# from Python 3.12 cProfile is built on sys.monitoring: a single profiler
+# can be active in the process, and it sees the calls of every thread.
+_PROCESS_WIDE_PROFILE = sys.version_info >= (3, 12)
+
+# the stages in the order a file goes through them.
+STAGES = ("discover", "parse", "read_header", "load", "set", "write")
+
+
+class StageTimings:
+    '''
+    Collects the seconds each stage took for each file, and the slowest
+    files overall. The count, total and max of each stage are exact. The
+    percentiles are computed from up to samples seconds per stage, past
+    that a uniform random sample of them is kept, so the memory used doesn't
+    grow with the number of files.
+    '''
+
+    def __init__(self, slowest: int = 10, samples: int = 100_000) -> None:
+        self._seconds = {stage: array("d") for stage in STAGES}
+        self._counts = dict.fromkeys(STAGES, 0)
+        self._totals = dict.fromkeys(STAGES, 0.0)
+        self._maxima = dict.fromkeys(STAGES, 0.0)
+        self._samples = samples
+        self._random = Random(0)
+        self._slowest_amount = slowest
+        # min heap of (total seconds, file), it keeps the slowest files.
+        self._slowest = []
+
+    def add(self, stage: str, seconds: float) -> None:
+        '''
+        Adds the seconds a stage took for a file (or for finding a file).
+        '''
+        count = self._counts[stage] + 1
+        self._counts[stage] = count
+        self._totals[stage] += seconds
+        if seconds > self._maxima[stage]:
+            self._maxima[stage] = seconds
+        samples = self._seconds[stage]
+        if len(samples) < self._samples:
+            samples.append(seconds)
+            return
+        # reservoir sampling, each of the seconds added so far has the same
+        # chance of being kept.
+        index = self._random.randrange(count)
+        if index < self._samples:
+            samples[index] = seconds
+
+    def add_file(self, file: str, stage_seconds: dict) -> None:
+        '''
+        Adds the seconds each stage took for the given file.
+        '''
+        for stage, seconds in stage_seconds.items():
+            self.add(stage, seconds)
+        entry = (sum(stage_seconds.values()), file)
+        if len(self._slowest) < self._slowest_amount:
+            heappush(self._slowest, entry)
+        else:
+            heappushpop(self._slowest, entry)
+
+    def timed(self, iterable, stage: str = "discover"):
+        '''
+        Yields the items of the iterable, adding the seconds taken to get
+        each one to the given stage.
+        '''
+        iterator = iter(iterable)
+        while True:
+            start = perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.add(stage, perf_counter() - start)
+            yield item
+
+    def stats(self) -> dict:
+        '''
+        Returns: a dict of stage: (count, total, p50, p95, max), in seconds,
+        of the stages that were timed at least once.
+        '''
+        stats = {}
+        for stage in STAGES:
+            seconds = sorted(self._seconds[stage])
+            if seconds:
+                stats[stage] = (self._counts[stage], self._totals[stage],
+                                _percentile(seconds, 50),
+                                _percentile(seconds, 95), self._maxima[stage])
+        return stats
+
+    def slowest(self) -> list:
+        '''
+        Returns: a list of (total seconds, file) of the slowest files, the
+        slowest first.
+        '''
+        return sorted(self._slowest, reverse=True)
+
+    def report(self) -> None:
+        '''
+        Prints the stats of each stage and the slowest files.
+        '''
+        print(f"{'stage':<12}{'count':>8}{'total s':>11}{'p50 ms':>11}" +
+              f"{'p95 ms':>11}{'max ms':>11}")
+        for stage, (count, total, p50, p95, maximum) in self.stats().items():
+            print(f"{stage:<12}{count:>8}{total:>11.3f}{p50 * 1000:>11.3f}" +
+                  f"{p95 * 1000:>11.3f}{maximum * 1000:>11.3f}")
+        slowest = self.slowest()
+        if slowest:
+            print(f"Slowest {len(slowest)} file(s):")
+            for seconds, file in slowest:
+                print(f"  {seconds * 1000:10.3f} ms {file}")
+
+
+def _percentile(sorted_seconds: list, percent: int) -> float:
+    # nearest rank.
+    rank = max(1, -(-len(sorted_seconds) * percent // 100))
+    return sorted_seconds[rank - 1]
+
+
+class Profiler:
+    '''
+    cProfile over the threads of a run. Before Python 3.12 cProfile only
+    profiles the thread it was enabled in, so each thread running a wrapped
+    function gets its own profile, and all of them are merged when dumped.
+    From 3.12 a single profile (the one enabled) covers every thread, and
+    wrap leaves the functions as they are.
+    '''
+
+    def __init__(self) -> None:
+        self._profiles = []
+        self._local = local()
+        self._lock = Lock()
+
+    def _thread_profile(self) -> Profile:
+        profile = getattr(self._local, "profile", None)
+        if profile is None:
+            profile = self._local.profile = Profile()
+            with self._lock:
+                self._profiles.append(profile)
+        return profile
+
+    def enable(self) -> None:
+        '''
+        Starts profiling the current thread.
+        '''
+        self._thread_profile().enable()
+
+    def disable(self) -> None:
+        '''
+        Stops profiling the current thread.
+        '''
+        self._thread_profile().disable()
+
+    def wrap(self, function):
+        '''
+        Returns function wrapped so it's profiled in whatever thread it runs.
+        Only for threads, the wrapped function can't be sent to a worker
+        process.
+        '''
+        if _PROCESS_WIDE_PROFILE:
+            return function
+
+        def profiled(*args):
+            return self._thread_profile().runcall(function, *args)
+        return profiled
+
+    def dump(self, stats_file: str) -> bool:
+        '''
+        Merges the profiles of all the threads and writes them as a pstats
+        file.
+        -----
+        Returns: False if nothing was profiled (no file is written).
+        '''
+        with self._lock:
+            profiles = [profile for profile in self._profiles
+                        if profile.getstats()]
+        if not profiles:
+            return False
+        Stats(*profiles).dump_stats(stats_file)
+        return True
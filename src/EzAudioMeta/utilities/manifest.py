@@ -0,0 +1,111 @@
+'''
+Reader of the manifests of --import-manifest: a 'path' (or 'file', as
+written by --export) column plus tag columns, one row per file, as CSV (a
+.csv file) or JSON lines (any other file). The manifest is read as a stream,
+a row at a time.
+'''
+from csv import DictReader
+from collections import namedtuple
+from json import loads, JSONDecodeError
+from os import path
+
+# A row of the manifest. line is where the row is in the manifest (for CSV,
+# the line the row ends on), tags holds the tags that are set. error is None
+# if the row is valid, else what is wrong with it.
+ManifestRow = namedtuple("ManifestRow", ["line", "file", "tags", "error"])
+
+_PATH_COLUMNS = ("path", "file")
+
+
+def read_manifest(manifest_path: str, str_tags: list, int_tags: list,
+                  extensions: frozenset):
+    '''
+    Yields a ManifestRow for each row of the manifest. Each row is validated:
+    the file has to exist and have one of the given extensions, the str tags
+    are taken as they are and the int tags have to be numbers. Empty (or
+    null) values are left out, the file keeps its current value.
+    '''
+    if path.splitext(manifest_path)[1].lower() == ".csv":
+        values = _csv_values(manifest_path)
+    else:
+        values = _jsonl_values(manifest_path)
+
+    for line, row, error in values:
+        if error is None:
+            file, tags, error = validate_row(row, str_tags, int_tags,
+                                             extensions)
+        else:
+            file, tags = None, None
+        yield ManifestRow(line, file, tags, error)
+
+
+def _csv_values(manifest_path: str):
+    with open(manifest_path, newline="", encoding="utf-8") as manifest:
+        reader = DictReader(manifest)
+        for row in reader:
+            if None in row:
+                yield reader.line_num, None, "More values than columns."
+                continue
+            yield reader.line_num, row, None
+
+
+def _jsonl_values(manifest_path: str):
+    with open(manifest_path, encoding="utf-8") as manifest:
+        for line, text in enumerate(manifest, start=1):
+            if not text.strip():
+                continue
+            try:
+                row = loads(text)
+            except JSONDecodeError as e:
+                yield line, None, f"Invalid JSON: {e.msg}."
+                continue
+            if not isinstance(row, dict):
+                yield line, None, "Expected a JSON object."
+                continue
+            yield line, row, None
+
+
+def validate_row(row: dict, str_tags: list, int_tags: list,
+                 extensions: frozenset) -> tuple:
+    '''
+    Validates a single row (a dict of 'path' or 'file' and the tags), like
+    read_manifest does.
+    -----
+    Returns: a tuple (file, tags, error), error is None if the row is valid.
+    '''
+    file = None
+    tags = {}
+    for column, value in row.items():
+        if value is None or value == "":
+            continue
+        if column in _PATH_COLUMNS:
+            if not isinstance(value, str):
+                return None, None, f"'{column}' is expected to be a" +\
+                    " sequence of characters."
+            file = value
+        elif column in str_tags:
+            if not isinstance(value, str):
+                return file, None, f"'{column}' is expected to be a" +\
+                    " sequence of characters."
+            tags[column] = value
+        elif column in int_tags:
+            # JSON lines can have any value, only numbers and strings of
+            # digits are taken (int() of a list raises TypeError).
+            try:
+                if isinstance(value, bool) or\
+                        not isinstance(value, (int, str)):
+                    raise ValueError()
+                tags[column] = int(value)
+            except ValueError:
+                return file, None, f"'{column}' is expected to be a" +\
+                    " sequence of numbers."
+        else:
+            return file, None, f"Unknown column: '{column}'."
+
+    if file is None:
+        return None, None, "No 'path' set."
+    if not path.isfile(file):
+        return file, None, f"{file} doesn't exist or is not a file."
+    if path.splitext(file)[1][1:].lower() not in extensions:
+        return file, None, f"{file} is not a supported audio file."
+    return file, tags, None
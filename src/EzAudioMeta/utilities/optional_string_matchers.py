@@ -1,13 +1,81 @@
-from re import search
-from re import sub
+from functools import lru_cache
+from re import compile
 from re import error
+from re import Pattern
+
+# the same few user patterns are used for every file of a directory, so they
+# are compiled once and kept here.
+_PATTERN_CACHE_SIZE = 64
+
+# the words of the titles repeat a lot between the files of a library, each
+# word is only capitalized once.
+_WORD_CACHE_SIZE = 16384
+
+# '-', '_' and multiple white spaces, replaced by a single white space by the
+# cleanup title extractor.
+_pattern_remover = compile("(_+|-+| {2,})")
+
+# splits a word in the parts capitalized on their own, keeping the '-' and
+# '_' between them.
+_word_parts = compile("([-_])")
+
+
+@lru_cache(maxsize=_PATTERN_CACHE_SIZE)
+def _compile_pattern(pattern: str) -> Pattern:
+    return compile(pattern)
+
+
+def _capitalize_part(part: str) -> str:
+    part = part.lower()
+    for i, character in enumerate(part):
+        if character.isalpha():
+            return part[:i] + character.upper() + part[i + 1:]
+    return part
+
+
+@lru_cache(maxsize=_WORD_CACHE_SIZE)
+def _capitalize_word(word: str) -> str:
+    '''
+    Lower cases the word and upper cases the first letter of each of its
+    parts (split by '-' and '_').
+    '''
+    if "-" not in word and "_" not in word:
+        return _capitalize_part(word)
+    parts = _word_parts.split(word)
+    # the separators are at the odd indexes.
+    parts[::2] = [_capitalize_part(part) for part in parts[::2]]
+    return "".join(parts)
+
+
+@lru_cache(maxsize=_WORD_CACHE_SIZE)
+def _title_inner_word(word: str) -> str:
+    '''
+    A word that is neither the first nor the last of the title: the short
+    words (see OptionalStringMatchers._lower_case_words) are lower cased,
+    the rest capitalized.
+    '''
+    lower_word = word.lower()
+    if lower_word in OptionalStringMatchers._lower_case_words:
+        return lower_word
+    return _capitalize_word(word)
+
+
+def _title_case(track_title: str) -> str:
+    words = track_title.split(" ")
+    last = len(words) - 1
+    if last > 0:
+        words[0] = _capitalize_word(words[0])
+        words[1:last] = [_title_inner_word(word) for word in words[1:last]]
+    words[last] = _capitalize_word(words[last])
+    return " ".join(words).strip()
 
 
 class OptionalStringMatchers:
 
-    _articles = ["a", "an", "the"]
-    _coord_conjuncts = ["for", "and", "nor", "but", "or", "yet", "so"]
-    _prepositions = [
+    _articles = frozenset(["a", "an", "the"])
+    _coord_conjuncts = frozenset(["for", "and", "nor", "but", "or", "yet",
+                                  "so"])
+    _prepositions = frozenset([
                         "amid",
                         "anti",
                         "as",
@@ -36,19 +104,47 @@ class OptionalStringMatchers:
                         "upon",
                         "via",
                         "with",
-    ]
+    ])
+    # the words not capitalized in a title (unless first or last).
+    _lower_case_words = _articles | _coord_conjuncts | _prepositions
 
-    def extract_track_title_as_is(self, file_name: str, pattern: str) -> str:
+    def compile_pattern(self, pattern) -> Pattern:
+        '''
+        Receives a regex expression and returns it compiled. Compiled
+        expressions are cached, so the same expression is only parsed once.
+        An already compiled expression is returned as is.
+        -----
+        Raises an re.error if an invalid regex is received.
+        '''
+        if isinstance(pattern, Pattern):
+            return pattern
+        return _compile_pattern(pattern)
+
+    def validate_pattern(self, pattern) -> Pattern:
+        '''
+        Receives a regex expression and returns it compiled, so it is
+        validated before any file is touched. None is returned as is.
+        If the expression is not valid, the process is terminated with 1.
+        '''
+        if pattern is None:
+            return None
+        try:
+            return self.compile_pattern(pattern)
+        except error as e:
+            print("Error in regex:" + pattern + ":" + e.msg)
+            exit(1)
+
+    def extract_track_title_as_is(self, file_name: str, pattern) -> str:
         '''
         Receives the name of the track and returns the substring that
         matches the regex expression as is, no further processing is done.
         '''
-        title = search(pattern, file_name).group(0)
+        title = self.compile_pattern(pattern).search(file_name).group(0)
         title = title.strip()
         return title
 
     def extract_track_title_capitalize(self, file_name: str,
-                                       pattern: str) -> str:
+                                       pattern) -> str:
         '''
         Receives the name og the track and returns the substring that
         matches the regex expression and the it is capitalized following the
@@ -56,70 +152,66 @@ class OptionalStringMatchers:
         coordinate junctions and proposotions that are less than 5 letters
         long.
         '''
-        track_title = search(pattern, file_name).group(0)
-        list_words = track_title.split(" ")
-
-        # if first or last: capitalize, if in lists: to lower, else: capitalize
-        for i in range(len(list_words)):
-
-            if i == 0:
-                list_words[i] = self._capitalize_first(list_words[i])
-                continue
-
-            elif i == (len(list_words) - 1):
-                list_words[i] = self._capitalize_first(list_words[i])
-                continue
-
-            elif (list_words[i].lower() in self._articles or
-                  list_words[i].lower() in self._coord_conjuncts or
-                  list_words[i].lower() in self._prepositions):
-                list_words[i] = list_words[i].lower()
-                continue
-
-            list_words[i] = self._capitalize_first(list_words[i])
-
-        title = " ".join(list_words)
-        title = title.strip()
-        return title
+        track_title = self.compile_pattern(pattern).search(file_name).group(0)
+        # first and last word: capitalized, short words (articles,
+        # conjunctions and prepositions): lower cased, else: capitalized.
+        return _title_case(track_title)
 
     def _capitalize_first(self, string: str) -> str:
         '''
         Receives a string. Transforms all letters to lower, then
         converts the first letter found to upper case. If no letter is found,
-        the string is returned as is. If a "-" is present, the string is split,
-        and each word capitalized and then re-joined.
+        the string is returned as is. If a "-" or "_" is present, each part
+        between them is capitalized that way.
         '''
-        if "-" in string:
-            sub_strings = string.split("-")
-            capitalized = [self._capitalize_first(i) for i in sub_strings]
-            return "-".join(capitalized)
-
-        if "_" in string:
-            sub_strings = string.split("_")
-            capitalized = [self._capitalize_first(i) for i in sub_strings]
-            return "_".join(capitalized)
-
-        string = string.lower()
-        for i in range(len(string)):
-            if string[i].isalpha():
-                return string.replace(string[i], string[i].upper(), 1)
-        return string
+        return _capitalize_word(string)
 
     def extract_track_title_cleanup_and_capitalize(self, file_name: str,
-                                                   pattern: str) -> str:
+                                                   pattern) -> str:
         '''
         Receives a string, replaces all '-' and '_', trailing or duplicate
         white spaces for single white spaces, and trims leading and trainling
         spaces. Then applies regular title capitalization.
         '''
-        pattern_remover = "(_+|-+| {2,})"
-        clean_string = sub(pattern_remover, " ", file_name)
+        clean_string = _pattern_remover.sub(" ", file_name)
         clean_string = self.extract_track_title_capitalize(clean_string,
                                                            pattern)
         clean_string = clean_string.strip()
         return clean_string
 
-    def extract_track_number(self, file_name: str, pattern: str) -> int:
+    def extract_track_titles_as_is(self, file_names, pattern):
+        '''
+        Receives an iterable of file names and yields the track title of
+        each, like extract_track_title_as_is. The pattern is compiled once
+        for all of them.
+        '''
+        search = self.compile_pattern(pattern).search
+        for file_name in file_names:
+            yield search(file_name).group(0).strip()
+
+    def extract_track_titles_capitalize(self, file_names, pattern):
+        '''
+        Receives an iterable of file names and yields the track title of
+        each, like extract_track_title_capitalize. The pattern is compiled
+        once for all of them, and each different word is only capitalized
+        once.
+        '''
+        search = self.compile_pattern(pattern).search
+        for file_name in file_names:
+            yield _title_case(search(file_name).group(0))
+
+    def extract_track_titles_cleanup_and_capitalize(self, file_names,
+                                                    pattern):
+        '''
+        Receives an iterable of file names and yields the track title of
+        each, like extract_track_title_cleanup_and_capitalize.
+        '''
+        search = self.compile_pattern(pattern).search
+        for file_name in file_names:
+            clean_string = _pattern_remover.sub(" ", file_name)
+            yield _title_case(search(clean_string).group(0))
+
+    def extract_track_number(self, file_name: str, pattern) -> int:
         '''
         Receives the name of the file, looks for a number that matches
         the given pattern, extracts the str and parses it into an int.
@@ -131,7 +223,7 @@ class OptionalStringMatchers:
         '''
         track_number = 0
         try:
-            match = search(pattern, file_name)
+            match = self.compile_pattern(pattern).search(file_name)
         except error as e:
             print("Error in regex:" + pattern + ":" + e.msg)
             exit(1)
@@ -0,0 +1,168 @@
+'''
+Pipelined read -> transform -> write engine. The files go through three
+stages connected by bounded queues:
+
+1. discovery: the files iterable is consumed in a thread, so a slow directory
+   listing doesn't block the other stages.
+2. prepare: a light (CPU) step run on the event loop, like parsing the file
+   name. It returns the item to work on, None to drop the file, or a
+   Finished item when its result is already known (like a file name that
+   couldn't be parsed), which skips the work but keeps its place.
+3. work: the blocking step (load, set and write the tags), run in the given
+   executor by a number of concurrent workers.
+
+The results are handed back to the caller in the same order the files were
+discovered. The queues and the number of items in flight are bounded, so
+memory stays flat no matter how many files there are.
+'''
+import asyncio
+from queue import Queue, Empty
+from threading import Event, Thread
+
+# files taken from the files iterable on each trip to the discovery thread.
+_DISCOVERY_CHUNK = 64
+
+_DONE = object()
+
+
+class Finished:
+    '''
+    An item whose result is known in the prepare stage. It doesn't go to the
+    work, (item, result) is handed back in its place in the order.
+    '''
+
+    def __init__(self, item, result) -> None:
+        self.item = item
+        self.result = result
+
+
+class _Failed:
+    '''
+    Wraps an exception raised inside the pipeline, so it's raised again in
+    the caller's thread.
+    '''
+
+    def __init__(self, exception: BaseException) -> None:
+        self.exception = exception
+
+
+def run_pipeline(files, prepare, work, executor, workers: int,
+                 queue_size: int = 64):
+    '''
+    Runs the pipeline in a background thread and yields a (item, result)
+    tuple for each item prepared, in order. result is what work(item)
+    returned. If the caller stops iterating, the pipeline is stopped too.
+    -----
+    Raises: any exception raised by the stages.
+    '''
+    results = Queue(maxsize=queue_size)
+    stop = Event()
+    thread = Thread(target=_run_loop,
+                    args=(files, prepare, work, executor, max(1, workers),
+                          queue_size, results, stop),
+                    daemon=True)
+    thread.start()
+    try:
+        while True:
+            entry = results.get()
+            if entry is _DONE:
+                return
+            if isinstance(entry, _Failed):
+                raise entry.exception
+            yield entry
+    finally:
+        stop.set()
+        # unblocks the pipeline if it's waiting for room in the results.
+        while thread.is_alive():
+            try:
+                results.get(timeout=0.05)
+            except Empty:
+                pass
+        thread.join()
+
+
+def _run_loop(files, prepare, work, executor, workers, queue_size, results,
+              stop) -> None:
+    try:
+        asyncio.run(_pipeline(files, prepare, work, executor, workers,
+                              queue_size, results, stop))
+        results.put(_DONE)
+    except BaseException as e:
+        results.put(_Failed(e))
+
+
+def _next_chunk(iterator) -> list:
+    chunk = []
+    for item in iterator:
+        chunk.append(item)
+        if len(chunk) == _DISCOVERY_CHUNK:
+            break
+    return chunk
+
+
+async def _pipeline(files, prepare, work, executor, workers, queue_size,
+                    results, stop) -> None:
+    loop = asyncio.get_running_loop()
+    discovered = asyncio.Queue(queue_size)
+    prepared = asyncio.Queue(queue_size)
+    # items prepared but not handed back yet, this bounds the results
+    # waiting for a slower item that came before them.
+    in_flight = asyncio.Semaphore(queue_size + workers)
+    finished = {}
+    emit_lock = asyncio.Lock()
+    next_index = 0
+
+    async def discover() -> None:
+        iterator = iter(files)
+        while not stop.is_set():
+            chunk = await loop.run_in_executor(None, _next_chunk, iterator)
+            if not chunk:
+                break
+            for file in chunk:
+                await discovered.put(file)
+        await discovered.put(_DONE)
+
+    async def prepare_files() -> None:
+        index = 0
+        while True:
+            file = await discovered.get()
+            if file is _DONE:
+                break
+            if stop.is_set():
+                continue
+            item = prepare(file)
+            if item is None:
+                continue
+            await in_flight.acquire()
+            await prepared.put((index, item))
+            index += 1
+        for _ in range(workers):
+            await prepared.put(_DONE)
+
+    async def emit() -> None:
+        nonlocal next_index
+        async with emit_lock:
+            while next_index in finished:
+                entry = finished.pop(next_index)
+                next_index += 1
+                await loop.run_in_executor(None, results.put, entry)
+                in_flight.release()
+
+    async def work_items() -> None:
+        while True:
+            entry = await prepared.get()
+            if entry is _DONE:
+                return
+            index, item = entry
+            if stop.is_set():
+                in_flight.release()
+                continue
+            if isinstance(item, Finished):
+                finished[index] = (item.item, item.result)
+            else:
+                result = await loop.run_in_executor(executor, work, item)
+                finished[index] = (item, result)
+            await emit()
+
+    await asyncio.gather(discover(), prepare_files(),
+                         *[work_items() for _ in range(workers)])
@@ -0,0 +1,183 @@
+'''
+Live progress of a run (--progress): files done out of the total, files per
+second, MB per second read and written, the time left and the failures so
+far. On a terminal the same line is rewritten, elsewhere (a log file, a
+pipe) a line is printed every once in a while.
+
+The tagging loop only adds to a few counters, the line is built and printed
+by a thread of its own a few times per second (or every few seconds), so
+reporting costs nothing per file.
+'''
+from os import getpid
+from threading import Event, Thread
+from time import monotonic
+import sys
+
+# seconds between the updates, on a terminal and elsewhere.
+TTY_INTERVAL = 0.25
+LOG_INTERVAL = 10.0
+
+
+class ProgressReporter:
+    '''
+    Reports the progress of the files of a run to the stream (the standard
+    error by default). The total of files can be given, or counted in the
+    background (count_total), until then no percentage nor time left is
+    shown. The bytes read and written are the ones of this process and the
+    worker processes of the executor, taken from /proc/<pid>/io, they are
+    left out where it doesn't exist.
+    '''
+
+    def __init__(self, total: int = None, stream=None,
+                 interval: float = None, tty: bool = None) -> None:
+        self.total = total
+        self._stream = stream or sys.stderr
+        if tty is None:
+            tty = hasattr(self._stream, "isatty") and self._stream.isatty()
+        self._tty = tty
+        self._interval = interval or (TTY_INTERVAL if tty else LOG_INTERVAL)
+        # each counter is only added to from one thread: the files are done
+        # in the thread of the run and skipped in the one of the pipeline.
+        self._done = 0
+        self._failed = 0
+        self._skipped = 0
+        self._executor = None
+        # the bytes (read, written) of each process seen, so the ones of the
+        # workers that ended are still counted.
+        self._io = {}
+        self._io_start = (0, 0)
+        self._start = None
+        self._stop = Event()
+        self._thread = None
+
+    def count_total(self, files) -> None:
+        '''
+        Counts the files of the iterable (a second discovery of the files of
+        the run) in a thread, and sets the total once it's done.
+        '''
+        def count() -> None:
+            total = 0
+            for _ in files:
+                total += 1
+                if self._stop.is_set():
+                    return
+            self.total = total
+
+        Thread(target=count, daemon=True).start()
+
+    def start(self, executor=None) -> None:
+        '''
+        Starts reporting. The bytes read and written by the worker processes
+        of the executor (if it's a process pool) are counted too.
+        '''
+        self._executor = executor
+        self._io_start = self._io_bytes()
+        self._start = monotonic()
+        self._thread = Thread(target=self._report, daemon=True)
+        self._thread.start()
+
+    def done(self, failed: bool = False) -> None:
+        '''
+        A file was tagged (or failed).
+        '''
+        self._done += 1
+        if failed:
+            self._failed += 1
+
+    def skipped(self) -> None:
+        '''
+        A file was skipped without being opened.
+        '''
+        self._skipped += 1
+
+    def close(self) -> None:
+        '''
+        Stops reporting and prints the last line.
+        '''
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self._write(self.line())
+        if self._tty:
+            self._stream.write("\n")
+            self._stream.flush()
+
+    def line(self) -> str:
+        '''
+        Returns: the line with the progress so far.
+        '''
+        elapsed = max(monotonic() - self._start, 1e-9)
+        done = self._done + self._skipped
+        if self.total:
+            line = f"{done}/{self.total} files" +\
+                f" ({min(done / self.total, 1):.1%})"
+        else:
+            line = f"{done} files"
+        rate = done / elapsed
+        line += f", {rate:.1f} files/s"
+        read, written = self._io_bytes()
+        if read or written:
+            read_rate = (read - self._io_start[0]) / elapsed / 1e6
+            written_rate = (written - self._io_start[1]) / elapsed / 1e6
+            line += f", read {read_rate:.1f} MB/s, written" +\
+                f" {written_rate:.1f} MB/s"
+        if self.total and rate > 0:
+            line += f", ETA {_duration(max(self.total - done, 0) / rate)}"
+        return line + f", {self._failed} error(s)"
+
+    def _report(self) -> None:
+        while not self._stop.wait(self._interval):
+            self._write(self.line())
+
+    def _write(self, line: str) -> None:
+        if self._tty:
+            # back to the start of the line, and clear it.
+            self._stream.write("\r\x1b[K" + line)
+        else:
+            self._stream.write(line + "\n")
+        self._stream.flush()
+
+    def _io_bytes(self) -> tuple:
+        '''
+        Returns: a tuple (read, written) with the bytes read and written by
+        this process and the workers, (0, 0) if they can't be known.
+        '''
+        # the processes of a ProcessPoolExecutor, there is no public way to
+        # get them.
+        pids = [getpid()]
+        try:
+            pids += list(getattr(self._executor, "_processes", None) or ())
+        except RuntimeError:
+            # a worker was started (or ended) meanwhile, the next update
+            # counts it.
+            pass
+        for pid in pids:
+            io = _process_io(pid)
+            if io is not None:
+                self._io[pid] = io
+        return (sum(io[0] for io in self._io.values()),
+                sum(io[1] for io in self._io.values()))
+
+
+def _process_io(pid: int) -> tuple:
+    '''
+    Returns: a tuple (read, written) with the bytes the process read and
+    wrote (rchar and wchar), None if they can't be read.
+    '''
+    try:
+        with open(f"/proc/{pid}/io") as io_file:
+            fields = dict(line.split(":", 1) for line in io_file)
+        return int(fields["rchar"]), int(fields["wchar"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _duration(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02}s"
+    return f"{seconds}s"
@@ -0,0 +1,195 @@
+from hashlib import sha1
+from json import dumps
+from os import stat
+from threading import Lock
+import sqlite3
+
+
+def tags_digest(tags_to_set: dict) -> str:
+    '''
+    Returns a digest of the given tags, the same tags always give the same
+    digest no matter the order they were set in.
+    '''
+    return sha1(dumps(tags_to_set, sort_keys=True,
+                      default=str).encode("utf-8")).hexdigest()
+
+
+class StateIndex:
+    '''
+    On disk index of the files tagged by previous runs. For each file its
+    size, modification time (in nanoseconds) and the digest of the tags that
+    were applied are stored, so a file that was not modified since then and
+    is going to get the same tags can be skipped with a single stat call.
+    The digests of the audio payload of the files (see audio.audio_hash) are
+    stored too, with the size and modification time they were taken at, so
+    a file that didn't change is not hashed again and the files with the
+    same audio are found without reading them.
+    The index can be used from several threads, the accesses are serialized.
+    '''
+
+    # records are committed in batches, not one by one.
+    _COMMIT_EVERY = 1000
+
+    def __init__(self, index_path: str) -> None:
+        self._connection = sqlite3.connect(index_path,
+                                           check_same_thread=False)
+        self._lock = Lock()
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " tags_digest TEXT NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS audio_digests ("
+            " path TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " audio_digest TEXT NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS audio_digests_by_digest"
+            " ON audio_digests (audio_digest)"
+        )
+        self._pending = 0
+
+    def is_up_to_date(self, file: str, digest: str) -> bool:
+        '''
+        Returns True if the file was tagged with the same tags (digest) by a
+        previous run and it was not modified since.
+        '''
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT size, mtime_ns, tags_digest FROM files"
+                " WHERE path = ?", (file,)).fetchone()
+        if row is None or row[2] != digest:
+            return False
+        try:
+            file_stat = stat(file)
+        except OSError:
+            return False
+        return row[0] == file_stat.st_size and\
+            row[1] == file_stat.st_mtime_ns
+
+    def record(self, file: str, digest: str) -> None:
+        '''
+        Stores the actual size and modification time of a file that was
+        just tagged with the given tags (digest).
+        '''
+        file_stat = stat(file)
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                (file, file_stat.st_size, file_stat.st_mtime_ns, digest))
+            self._pending += 1
+            if self._pending >= self._COMMIT_EVERY:
+                self._connection.commit()
+                self._pending = 0
+
+    def stored_audio_digest(self, file: str) -> tuple:
+        '''
+        Returns: a tuple (size, mtime_ns, audio_digest) with the digest of
+        the audio of the file stored by a previous run, and the size and
+        modification time it had then. None if it was never hashed.
+        '''
+        with self._lock:
+            return self._connection.execute(
+                "SELECT size, mtime_ns, audio_digest FROM audio_digests"
+                " WHERE path = ?", (file,)).fetchone()
+
+    def unchanged_audio_digest(self, file: str) -> str:
+        '''
+        Returns: the stored digest of the audio of the file if it was not
+        modified since it was hashed, else None.
+        '''
+        row = self.stored_audio_digest(file)
+        if row is None:
+            return None
+        try:
+            file_stat = stat(file)
+        except OSError:
+            return None
+        if row[0] != file_stat.st_size or row[1] != file_stat.st_mtime_ns:
+            return None
+        return row[2]
+
+    def record_audio_digest(self, file: str, size: int, mtime_ns: int,
+                            digest: str) -> None:
+        '''
+        Stores the digest of the audio of a file, with the size and
+        modification time it had when it was hashed. A file whose audio
+        didn't change keeps its place in the order the files were seen (see
+        same_audio), one whose audio changed is seen again.
+        '''
+        with self._lock:
+            updated = self._connection.execute(
+                "UPDATE audio_digests SET size = ?, mtime_ns = ?"
+                " WHERE path = ? AND audio_digest = ?",
+                (size, mtime_ns, file, digest)).rowcount
+            if not updated:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO audio_digests"
+                    " VALUES (?, ?, ?, ?)", (file, size, mtime_ns, digest))
+            self._pending += 1
+            if self._pending >= self._COMMIT_EVERY:
+                self._connection.commit()
+                self._pending = 0
+
+    def same_audio(self, file: str, digest: str) -> str:
+        '''
+        Returns: the first file recorded with the given digest of its audio,
+        None if there is none or it's the given file itself.
+        '''
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT path FROM audio_digests WHERE audio_digest = ?"
+                " ORDER BY rowid LIMIT 1", (digest,)).fetchone()
+        if row is None or row[0] == file:
+            return None
+        return row[0]
+
+    def compact(self) -> int:
+        '''
+        Removes the entries (and audio digests) of files that no longer
+        exist or that were modified since they were recorded, then shrinks
+        the index file.
+        -----
+        Returns: the number of entries removed.
+        '''
+        removed = 0
+        for table in ("files", "audio_digests"):
+            stale = []
+            for file, size, mtime_ns in self._connection.execute(
+                    f"SELECT path, size, mtime_ns FROM {table}"):
+                try:
+                    file_stat = stat(file)
+                except OSError:
+                    stale.append((file,))
+                    continue
+                if file_stat.st_size != size or\
+                        file_stat.st_mtime_ns != mtime_ns:
+                    stale.append((file,))
+
+            self._connection.executemany(
+                f"DELETE FROM {table} WHERE path = ?", stale)
+            removed += len(stale)
+        self._connection.commit()
+        self._connection.execute("VACUUM")
+        return removed
+
+    def commit(self) -> None:
+        '''
+        Commits the pending records now (they are committed in batches
+        otherwise).
+        '''
+        with self._lock:
+            self._connection.commit()
+            self._pending = 0
+
+    def close(self) -> None:
+        '''
+        Commits the pending records and closes the index.
+        '''
+        self._connection.commit()
+        self._connection.close()
@@ -0,0 +1,51 @@
+'''
+Writers of the tags exported by --export, one row per file, as JSON lines or
+CSV. Rows are written as they come and flushed every few rows, so a big
+export can be followed (or piped) while it runs.
+'''
+from csv import writer
+from json import dumps
+
+EXPORT_FORMATS = ("jsonl", "csv")
+
+
+class TagExportWriter:
+    '''
+    Writes a row per file to the given text stream. A row is a dict with
+    the 'file' and every one of the columns, tags that are not set are
+    written as null (JSON) or empty (CSV).
+    '''
+
+    # rows written between flushes of the stream.
+    _FLUSH_EVERY = 100
+
+    def __init__(self, stream, export_format: str, columns: list) -> None:
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {export_format}")
+        self._stream = stream
+        self._columns = ["file"] + list(columns)
+        self._csv = None
+        if export_format == "csv":
+            self._csv = writer(stream)
+            self._csv.writerow(self._columns)
+        self._pending = 0
+
+    def write(self, row: dict) -> None:
+        '''
+        Writes the row of a file.
+        '''
+        if self._csv is not None:
+            self._csv.writerow(["" if row.get(column) is None
+                                else row[column]
+                                for column in self._columns])
+        else:
+            self._stream.write(dumps({column: row.get(column)
+                                      for column in self._columns},
+                                     ensure_ascii=False) + "\n")
+        self._pending += 1
+        if self._pending >= self._FLUSH_EVERY:
+            self.flush()
+
+    def flush(self) -> None:
+        self._stream.flush()
+        self._pending = 0
@@ -0,0 +1,350 @@
+'''
+Watches a directory for audio files that are added or modified (--watch).
+On Linux inotify is used (through ctypes, nothing to install), elsewhere,
+or when it's not available, the directories are polled.
+'''
+from os import path, read, scandir, stat, close
+from struct import calcsize, unpack_from
+from time import monotonic, sleep
+import select
+import sys
+
+from EzAudioMeta.utilities.file_discovery import scan_audio_files
+
+# inotify events (see inotify(7)).
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_Q_OVERFLOW = 0x00004000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_WATCH_MASK = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+# wd, mask, cookie, len, then len bytes of name.
+_EVENT_HEADER = "iIII"
+_EVENT_HEADER_SIZE = calcsize(_EVENT_HEADER)
+
+
+def _mtime(directory: str) -> int:
+    '''
+    Returns: the modification time of a directory, None if it's gone.
+    '''
+    try:
+        return stat(directory).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _signature(file: str) -> tuple:
+    '''
+    Returns: the (size, modification time) of a file, None if it's gone.
+    '''
+    try:
+        file_stat = stat(file)
+    except OSError:
+        return None
+    return file_stat.st_size, file_stat.st_mtime_ns
+
+
+class DirectoryWatcher:
+    '''
+    Finds the audio files of a directory that are added or modified, the
+    ones already there count as added when it starts. A file is only
+    returned once it has settled: its size and modification time didn't
+    change for settle seconds, so a file that is still being copied is not
+    returned half written. The files returned are acknowledged, so what
+    the caller does to them (like writing their tags) is not taken as a
+    change.
+
+    When polling, a stat per directory is done every poll_interval seconds
+    and only the directories whose modification time changed (a file was
+    added, removed or renamed in them) are listed again. A file modified in
+    place doesn't change its directory, so every directory is listed and
+    every file stat'ed again each rescan_interval seconds.
+    '''
+
+    def __init__(self, directory: str, extensions: frozenset,
+                 recursive: bool = False, settle: float = 2.0,
+                 polling: bool = False, poll_interval: float = 1.0,
+                 rescan_interval: float = 60.0) -> None:
+        self._directory = directory
+        self._extensions = extensions
+        self._recursive = recursive
+        self._settle = settle
+        self._poll_interval = poll_interval
+        self._rescan_interval = rescan_interval
+        self._next_rescan = monotonic() + rescan_interval
+        # directory: (mtime_ns, sub directories) when it was last listed,
+        # when polling.
+        self._listed = {}
+        # path: (size, mtime_ns) of the files acknowledged.
+        self._known = {}
+        # path: ((size, mtime_ns), monotonic time it last changed).
+        self._pending = {}
+        self._inotify = None if polling else _Inotify.open()
+        if self._inotify is not None:
+            try:
+                self._watch_directory(directory)
+            except OSError:
+                # out of watches (fs.inotify.max_user_watches) or a file
+                # system without inotify.
+                self._inotify.close()
+                self._inotify = None
+        if self._inotify is None:
+            self._changed(self._listed_files())
+        else:
+            self._changed(scan_audio_files(directory, extensions, recursive))
+
+    @property
+    def method(self) -> str:
+        '''
+        How the changes are found: 'inotify' or 'polling'.
+        '''
+        return "polling" if self._inotify is None else "inotify"
+
+    def batches(self):
+        '''
+        Yields lists of the files that settled, until interrupted. Each
+        batch is acknowledged when the next one is asked for.
+        '''
+        while True:
+            files = self.poll()
+            if files:
+                yield files
+                self.acknowledge(files)
+
+    def poll(self, timeout: float = None) -> list:
+        '''
+        Waits up to timeout seconds (or until there is a settled file, if
+        None) for files to settle.
+        -----
+        Returns: the settled files, sorted, empty if there was none.
+        '''
+        deadline = None if timeout is None else monotonic() + timeout
+        while True:
+            settled = self._settled()
+            if settled:
+                return settled
+            wait = self._next_wait()
+            if deadline is not None:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    return []
+                wait = remaining if wait is None else min(wait, remaining)
+            self._wait(wait)
+
+    def acknowledge(self, files: list) -> None:
+        '''
+        Records the actual state of the given files, they are only
+        returned again once they are modified after this.
+        '''
+        for file in files:
+            signature = _signature(file)
+            if signature is None:
+                self._known.pop(file, None)
+            else:
+                self._known[file] = signature
+            self._pending.pop(file, None)
+
+    def close(self) -> None:
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def _wait(self, timeout: float) -> None:
+        if self._inotify is None:
+            sleep(timeout)
+            if monotonic() >= self._next_rescan:
+                # the files modified in place (and the changes within the
+                # resolution of the modification time of a directory) are
+                # only found by listing everything again.
+                self._listed.clear()
+                self._next_rescan = monotonic() + self._rescan_interval
+            self._changed(self._listed_files())
+        else:
+            self._changed(self._read_events(timeout))
+
+    def _next_wait(self) -> float:
+        '''
+        Returns: the seconds until the next pending file could settle (or
+        the next poll), None to wait for the next event.
+        '''
+        if self._inotify is None:
+            return self._poll_interval
+        if not self._pending:
+            return None
+        now = monotonic()
+        return max(0.0, min(since + self._settle - now
+                            for _, since in self._pending.values()))
+
+    def _changed(self, files) -> None:
+        now = monotonic()
+        for file in files:
+            signature = _signature(file)
+            if signature is None:
+                self._known.pop(file, None)
+                self._pending.pop(file, None)
+            elif signature == self._known.get(file):
+                # not modified since it was acknowledged.
+                self._pending.pop(file, None)
+            elif file not in self._pending or\
+                    self._pending[file][0] != signature:
+                self._pending[file] = (signature, now)
+
+    def _settled(self) -> list:
+        now = monotonic()
+        settled = []
+        for file, (signature, since) in list(self._pending.items()):
+            if now - since < self._settle:
+                continue
+            current = _signature(file)
+            if current is None:
+                del self._pending[file]
+            elif current != signature:
+                # still being written.
+                self._pending[file] = (current, now)
+            else:
+                settled.append(file)
+                del self._pending[file]
+        return sorted(settled)
+
+    def _listed_files(self) -> list:
+        '''
+        Lists the directories that changed since they were last listed.
+        -----
+        Returns: the audio files in them.
+        '''
+        files = []
+        listed = {}
+        pending = [self._directory]
+        while pending:
+            directory = pending.pop()
+            mtime = _mtime(directory)
+            if mtime is None:
+                continue
+            if directory in self._listed and\
+                    self._listed[directory][0] == mtime:
+                sub_directories = self._listed[directory][1]
+            else:
+                sub_directories = []
+                try:
+                    with scandir(directory) as entries:
+                        for entry in entries:
+                            if entry.is_file():
+                                if self._is_audio_file(entry.name):
+                                    files.append(entry.path)
+                            elif self._recursive and\
+                                    entry.is_dir(follow_symlinks=False):
+                                sub_directories.append(entry.path)
+                except OSError:
+                    # it's gone already.
+                    continue
+            listed[directory] = (mtime, sub_directories)
+            pending.extend(sub_directories)
+        # the directories removed are left out.
+        self._listed = listed
+        return files
+
+    def _is_audio_file(self, file: str) -> bool:
+        return path.splitext(file)[1][1:].lower() in self._extensions
+
+    def _watch_directory(self, directory: str) -> None:
+        self._inotify.add_watch(directory)
+        if not self._recursive:
+            return
+        with scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    self._watch_directory(entry.path)
+
+    def _read_events(self, timeout: float) -> list:
+        files = []
+        for directory, name, mask in self._inotify.read(timeout):
+            if mask & _IN_Q_OVERFLOW:
+                # events were lost, everything is checked again.
+                return list(scan_audio_files(self._directory,
+                                             self._extensions,
+                                             self._recursive))
+            event_path = path.join(directory, name)
+            if mask & _IN_ISDIR:
+                if self._recursive and mask & (_IN_CREATE | _IN_MOVED_TO):
+                    # a whole album moved in, its files are already there.
+                    try:
+                        self._watch_directory(event_path)
+                        files.extend(scan_audio_files(event_path,
+                                                      self._extensions, True))
+                    except OSError:
+                        # it's gone already.
+                        continue
+            elif self._is_audio_file(event_path):
+                files.append(event_path)
+        return files
+
+
+class _Inotify:
+    '''
+    A minimal inotify instance, through the C library.
+    '''
+
+    def __init__(self, libc, fd: int) -> None:
+        self._libc = libc
+        self._fd = fd
+        # watch descriptor: directory.
+        self._directories = {}
+
+    @classmethod
+    def open(cls):
+        '''
+        Returns: a new instance, None if inotify is not available.
+        '''
+        if not sys.platform.startswith("linux"):
+            return None
+        import ctypes
+        import ctypes.util
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            init = libc.inotify_init1
+        except (OSError, AttributeError):
+            return None
+        fd = init(_IN_NONBLOCK | _IN_CLOEXEC)
+        if fd < 0:
+            return None
+        return cls(libc, fd)
+
+    def add_watch(self, directory: str) -> None:
+        import ctypes
+        encoded = directory.encode(sys.getfilesystemencoding(),
+                                   "surrogateescape")
+        wd = self._libc.inotify_add_watch(self._fd, encoded, _WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"Can't watch {directory}")
+        self._directories[wd] = directory
+
+    def read(self, timeout: float = None) -> list:
+        '''
+        Waits up to timeout seconds (forever if None) for events.
+        -----
+        Returns: a list of (directory, name, mask) of the events.
+        '''
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = read(self._fd, 65536)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + _EVENT_HEADER_SIZE <= len(data):
+            wd, mask, _, length = unpack_from(_EVENT_HEADER, data, offset)
+            offset += _EVENT_HEADER_SIZE
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            events.append((self._directories.get(wd, ""),
+                           name.decode(sys.getfilesystemencoding(),
+                                       "surrogateescape"), mask))
+        return events
+
+    def close(self) -> None:
+        close(self._fd)
@@ -0,0 +1,63 @@
+'''
+Benchmark of the header only tag reader against a full music_tag load. The
+same tagged files are read a number of times with each backend, reading
+every tag the header reader knows. Run it from the src directory:
+
+    python -m benchmarks.bench_header_reader
+'''
+from os import path
+from shutil import copyfile, rmtree
+from tempfile import mkdtemp
+from timeit import timeit
+
+from EzAudioMeta.audio.base_audio import BaseAudio
+from EzAudioMeta.audio.header_reader import TAG_NAMES
+
+READS = 500
+TEST_FILE = path.join(path.dirname(path.dirname(path.abspath(__file__))),
+                      "tests", "test_files", "01_audio_test_file_3.mp3")
+TAGS = {
+    "album": "Fragments of Light",
+    "artist": "Siddhartha Corsus",
+    "comment": "benchmark",
+    "genre": "electroswing",
+    "tracknumber": 1,
+    "totaltracks": 12,
+    "tracktitle": "Let Go of Time (and Time Will Let Go of You)",
+    "year": 2019,
+}
+
+
+def read_all_tags(audio_file: str, header_only: bool) -> None:
+    ba_audio = BaseAudio()
+    ba_audio.load_track(audio_file, header_only=header_only)
+    for tag_name in TAG_NAMES:
+        ba_audio.get_tag(tag_name)
+
+
+def main() -> None:
+    directory = mkdtemp()
+    try:
+        audio_file = path.join(directory, "audio_file.mp3")
+        copyfile(TEST_FILE, audio_file)
+        ba_audio = BaseAudio()
+        ba_audio.load_track(audio_file)
+        ba_audio.set_tags(**TAGS)
+        ba_audio.write_tags()
+
+        results = {}
+        for label, header_only in [("music_tag", False),
+                                   ("header reader", True)]:
+            seconds = timeit(lambda: read_all_tags(audio_file, header_only),
+                             number=READS)
+            results[label] = seconds
+            print(f"{label:<15} {seconds:8.3f} s"
+                  f" {seconds / READS * 1000:8.3f} ms/file")
+        speedup = results["music_tag"] / results["header reader"]
+        print(f"speedup: {speedup:.1f}x")
+    finally:
+        rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+'''
+Micro-benchmark of the OptionalStringMatchers extractors. Each extractor is
+run over 100k generated file names: with the previous extractors (kept here
+as legacy_*, a raw pattern passed to re.search/re.sub on every call), then
+with the regex expression as a str (compiled once, from the cache) and with
+the expression compiled up front (as the CLI does). The results of all are
+checked to be the same. Run it from the src directory:
+
+    python -m benchmarks.bench_optional_string_matchers
+'''
+from re import search, sub
+from timeit import timeit
+
+from EzAudioMeta.utilities.optional_string_matchers import\
+    OptionalStringMatchers
+
+NAMES = 100_000
+TITLE_PATTERN = "(?<=\\d\\d\\s).+(?=\\.flac)"
+NUMBER_PATTERN = "\\d+(?=.+\\.flac)"
+
+_articles = ["a", "an", "the"]
+_coord_conjuncts = ["for", "and", "nor", "but", "or", "yet", "so"]
+_prepositions = ["amid", "anti", "as", "at", "but", "by", "down", "for",
+                 "from", "in", "into", "like", "near", "of", "off", "on",
+                 "onto", "over", "past", "per", "plus", "save", "than", "to",
+                 "up", "upon", "via", "with"]
+
+
+def legacy_capitalize_first(string: str) -> str:
+    if "-" in string:
+        return "-".join(legacy_capitalize_first(sub_string)
+                        for sub_string in string.split("-"))
+    if "_" in string:
+        return "_".join(legacy_capitalize_first(sub_string)
+                        for sub_string in string.split("_"))
+    string = string.lower()
+    for i in range(len(string)):
+        if string[i].isalpha():
+            return string.replace(string[i], string[i].upper(), 1)
+    return string
+
+
+def legacy_capitalize(file_name: str, pattern) -> str:
+    '''
+    The title capitalization before the patterns were compiled and cached,
+    name by name.
+    '''
+    list_words = search(pattern, file_name).group(0).split(" ")
+    for i in range(len(list_words)):
+        if i == 0 or i == (len(list_words) - 1):
+            list_words[i] = legacy_capitalize_first(list_words[i])
+        elif (list_words[i].lower() in _articles or
+              list_words[i].lower() in _coord_conjuncts or
+              list_words[i].lower() in _prepositions):
+            list_words[i] = list_words[i].lower()
+        else:
+            list_words[i] = legacy_capitalize_first(list_words[i])
+    return " ".join(list_words).strip()
+
+
+def file_names(amount: int) -> list:
+    return [f"{i % 100:02} the_ballad-of  track number {i}.flac"
+            for i in range(amount)]
+
+
+def legacy_title_as_is(file_name: str, pattern: str) -> str:
+    return search(pattern, file_name).group(0).strip()
+
+
+def legacy_title_cleanup_and_capitalize(file_name: str,
+                                        pattern: str) -> str:
+    # the remover was a str too, passed to re.sub on every call.
+    pattern_remover = "(_+|-+| {2,})"
+    clean_string = sub(pattern_remover, " ", file_name)
+    return legacy_capitalize(clean_string, pattern).strip()
+
+
+def legacy_track_number(file_name: str, pattern: str) -> int:
+    match = search(pattern, file_name)
+    return int(match.group(0)) if match else 0
+
+
+def legacy_matchers(names: list) -> list:
+    '''
+    The extractors before the patterns were compiled and cached.
+    '''
+    return [(legacy_title_as_is(name, TITLE_PATTERN),
+             legacy_title_cleanup_and_capitalize(name, TITLE_PATTERN),
+             legacy_track_number(name, NUMBER_PATTERN))
+            for name in names]
+
+
+def compiled_matchers(names: list) -> list:
+    osm = OptionalStringMatchers()
+    title_pattern = osm.compile_pattern(TITLE_PATTERN)
+    number_pattern = osm.compile_pattern(NUMBER_PATTERN)
+    return [(osm.extract_track_title_as_is(name, title_pattern),
+             osm.extract_track_title_cleanup_and_capitalize(name,
+                                                            title_pattern),
+             osm.extract_track_number(name, number_pattern))
+            for name in names]
+
+
+def str_matchers(names: list) -> list:
+    osm = OptionalStringMatchers()
+    return [(osm.extract_track_title_as_is(name, TITLE_PATTERN),
+             osm.extract_track_title_cleanup_and_capitalize(name,
+                                                            TITLE_PATTERN),
+             osm.extract_track_number(name, NUMBER_PATTERN))
+            for name in names]
+
+
+def main() -> None:
+    names = file_names(NAMES)
+    expected = legacy_matchers(names)
+    legacy_seconds = timeit(lambda: legacy_matchers(names), number=1)
+    print(f"{'previous matchers':<30} {legacy_seconds:8.3f} s"
+          f" {legacy_seconds / NAMES * 1_000_000:8.2f} us/file name")
+    for label, function in [("matchers, str patterns", str_matchers),
+                            ("matchers, compiled patterns",
+                             compiled_matchers)]:
+        if function(names) != expected:
+            print(f"{label}: the results are not the same.")
+            exit(1)
+        seconds = timeit(lambda: function(names), number=1)
+        print(f"{label:<30} {seconds:8.3f} s"
+              f" {seconds / NAMES * 1_000_000:8.2f} us/file name"
+              f" ({legacy_seconds / seconds:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+'''
+Benchmark of the batch title extraction over a million generated file
+names: the previous title capitalization (legacy_capitalize of
+bench_optional_string_matchers, list lookups and a recursive capitalizer,
+called name by name) against
+OptionalStringMatchers.extract_track_titles_capitalize. The titles of both
+are checked to be the same. Run it from the src directory:
+
+    python -m benchmarks.bench_title_batch
+    python -m benchmarks.bench_title_batch --names 100000
+'''
+from random import Random
+from time import perf_counter
+
+import click
+
+from benchmarks.bench_optional_string_matchers import legacy_capitalize
+from EzAudioMeta.utilities.optional_string_matchers import\
+    OptionalStringMatchers
+
+TITLE_PATTERN = "(?<=\\d\\d\\s).+(?=\\.flac)"
+SHORT_WORDS = ["a", "an", "the", "for", "and", "or", "of", "in", "on", "to",
+               "with", "from", "by", "as", "at", "into", "over", "upon"]
+
+
+def file_names(amount: int, vocabulary: int = 5000) -> list:
+    '''
+    File names of 2 to 8 words, from a vocabulary of generated words and
+    the short words of the titles, in mixed case and with some '-' and '_'.
+    '''
+    random = Random(0)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = ["".join(random.choice(letters)
+                     for _ in range(random.randint(3, 9)))
+             for _ in range(vocabulary)]
+    words += [f"{random.choice(words)}-{random.choice(words)}"
+              for _ in range(vocabulary // 10)]
+    words += SHORT_WORDS * (vocabulary // 50)
+    names = []
+    for i in range(amount):
+        title = " ".join(random.choice(words).upper() if random.random() < 0.1
+                         else random.choice(words)
+                         for _ in range(random.randint(2, 8)))
+        names.append(f"{i % 100:02} {title}.flac")
+    return names
+
+
+@click.command()
+@click.option("--names", type=int, default=1_000_000,
+              help="Number of file names.")
+def main(names) -> None:
+    osm = OptionalStringMatchers()
+    names_list = file_names(names)
+
+    start = perf_counter()
+    legacy_titles = [legacy_capitalize(name, TITLE_PATTERN)
+                     for name in names_list]
+    legacy_seconds = perf_counter() - start
+
+    start = perf_counter()
+    titles = list(osm.extract_track_titles_capitalize(names_list,
+                                                      TITLE_PATTERN))
+    batch_seconds = perf_counter() - start
+
+    if titles != legacy_titles:
+        print("The titles are not the same.")
+        exit(1)
+    for label, seconds in [("name by name (previous)", legacy_seconds),
+                           ("batch", batch_seconds)]:
+        print(f"{label:<25} {seconds:8.3f} s"
+              f" {seconds / names * 1_000_000:8.2f} us/file name")
+    print(f"speedup: {legacy_seconds / batch_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+'''
+Synthetic audio files for the benchmarks. A file of each extension supported
+by the CLI (api.valid_extensions) is generated from scratch: the headers are
+valid (they are loaded by mutagen/music_tag) and the audio data is silence,
+so no real audio files are needed. The files are built at several sizes and
+then tagged with one of the tag loads.
+'''
+from os import path
+from struct import pack
+
+from EzAudioMeta.audio.base_audio import BaseAudio
+
+# size name: bytes of audio data.
+SIZES = {
+    "small": 64 * 1024,
+    "medium": 1024 * 1024,
+    "large": 8 * 1024 * 1024,
+}
+
+# tag load name: tags set to the file.
+TAG_LOADS = {
+    "none": {},
+    "basic": {
+        "album": "Fragments of Light",
+        "artist": "Siddhartha Corsus",
+        "tracknumber": 1,
+        "tracktitle": "Let Go of Time",
+        "year": 2019,
+    },
+    "full": {
+        "album": "Rumbeando en el Noveno Infierno",
+        "albumartist": "Los Luciferinos",
+        "artist": "Lilith y Los Luciferinos",
+        "comment": "benchmark " * 50,
+        "compilation": 1,
+        "composer": "Johan Switcheroo",
+        "discnumber": 1,
+        "genre": "Techno-Cumbia Norteña Progresiva",
+        "isrc": "USRC17607839",
+        "lyrics": "la la la, la la\n" * 256,
+        "totaldiscs": 2,
+        "totaltracks": 38,
+        "tracknumber": 5,
+        "tracktitle": "El Perreo de Lilith",
+        "year": 1984,
+    },
+}
+
+# extensions music_tag can't load: mutagen reads their audio but they have
+# no tags, so load_track raises (AACError). Their files are written without
+# tags, and the suite doesn't time loading or tagging them.
+UNTAGGABLE = frozenset(["aac"])
+
+_OGG_CRC_TABLE = []
+for _byte in range(256):
+    _crc = _byte << 24
+    for _ in range(8):
+        _crc = ((_crc << 1) ^ 0x04C11DB7) if _crc & 0x80000000 else _crc << 1
+    _OGG_CRC_TABLE.append(_crc & 0xFFFFFFFF)
+
+# biggest packet that fits in a single Ogg page.
+_OGG_PACKET_SIZE = 255 * 254
+
+
+def _ogg_crc(data: bytes) -> int:
+    crc = 0
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFFFFFF) ^ _OGG_CRC_TABLE[(crc >> 24) ^ byte]
+    return crc
+
+
+def _ogg_page(packet: bytes, sequence: int, granule: int,
+              header_type: int = 0, serial: int = 1) -> bytes:
+    segments = [255] * (len(packet) // 255) + [len(packet) % 255]
+    page = b"OggS" + pack("<BBqII", 0, header_type, granule, serial,
+                          sequence) + bytes(4) + bytes([len(segments)]) + \
+        bytes(segments) + packet
+    return page[:22] + pack("<I", _ogg_crc(page)) + page[26:]
+
+
+def _ogg_audio_pages(payload: bytes, first_sequence: int,
+                     samples_per_byte: int) -> bytes:
+    pages = []
+    packets = [payload[i:i + _OGG_PACKET_SIZE]
+               for i in range(0, len(payload), _OGG_PACKET_SIZE)] or [b""]
+    for i, packet in enumerate(packets):
+        last = i == len(packets) - 1
+        granule = (i * _OGG_PACKET_SIZE + len(packet)) * samples_per_byte
+        pages.append(_ogg_page(packet, first_sequence + i, granule,
+                               4 if last else 0))
+    return b"".join(pages)
+
+
+def ogg_vorbis(payload: bytes) -> bytes:
+    ident = b"\x01vorbis" + pack("<IBIiiiBB", 0, 2, 44100, 0, 128000, 0,
+                                 0xB8, 1)
+    comment = b"\x03vorbis" + pack("<I", 4) + b"test" + pack("<I", 0) + \
+        b"\x01"
+    setup = b"\x05vorbis" + bytes(32)
+    return _ogg_page(ident, 0, 0, 2) + _ogg_page(comment + setup, 1, 0) + \
+        _ogg_audio_pages(payload, 2, 1)
+
+
+def ogg_opus(payload: bytes) -> bytes:
+    head = b"OpusHead" + pack("<BBHIhB", 1, 2, 312, 48000, 0, 0)
+    tags = b"OpusTags" + pack("<I", 4) + b"test" + pack("<I", 0)
+    return _ogg_page(head, 0, 0, 2) + _ogg_page(tags, 1, 0) + \
+        _ogg_audio_pages(payload, 2, 1)
+
+
+def flac(payload: bytes) -> bytes:
+    # 44100 Hz, 2 channels, 16 bits, 44100 samples.
+    stream_info = pack(">HH", 4096, 4096) + bytes(6)
+    stream_info += ((44100 << 44) | (1 << 41) | (15 << 36) |
+                    44100).to_bytes(8, "big") + bytes(16)
+    return b"fLaC" + bytes([0x80]) + len(stream_info).to_bytes(3, "big") + \
+        stream_info + payload
+
+
+def _atom(kind: bytes, data: bytes) -> bytes:
+    return pack(">I", 8 + len(data)) + kind + data
+
+
+def m4a(payload: bytes) -> bytes:
+    ftyp = _atom(b"ftyp", b"M4A " + pack(">I", 0) + b"M4A mp42isom")
+    mvhd = _atom(b"mvhd", pack(">B3xIIII", 0, 0, 0, 1000, 1000) + bytes(80))
+    mdhd = _atom(b"mdhd", pack(">B3xIIIIHH", 0, 0, 0, 44100, 44100, 0, 0))
+    hdlr = _atom(b"hdlr", pack(">B3xI4s12x", 0, 0, b"soun") + b"\x00")
+    mp4a = _atom(b"mp4a", bytes(6) + pack(">H", 1) + bytes(8) +
+                 pack(">HHHHI", 2, 16, 0, 0, 44100 << 16) +
+                 _atom(b"free", b""))
+    stsd = _atom(b"stsd", pack(">II", 0, 1) + mp4a)
+
+    def moov(chunk_offset: int) -> bytes:
+        stco = _atom(b"stco", pack(">III", 0, 1, chunk_offset))
+        stbl = _atom(b"stbl", stsd + stco)
+        mdia = _atom(b"mdia", mdhd + hdlr + _atom(b"minf", stbl))
+        return _atom(b"moov", mvhd + _atom(b"trak", mdia))
+
+    # the chunk offset points past the mdat header, after the moov atom.
+    chunk_offset = len(ftyp) + len(moov(0)) + 8
+    return ftyp + moov(chunk_offset) + _atom(b"mdat", payload)
+
+
+def _riff_chunk(kind: bytes, data: bytes) -> bytes:
+    return kind + pack("<I", len(data)) + data + b"\x00" * (len(data) % 2)
+
+
+def wav(payload: bytes) -> bytes:
+    fmt = pack("<HHIIHH", 1, 2, 44100, 44100 * 4, 4, 16)
+    body = b"WAVE" + _riff_chunk(b"fmt ", fmt) + \
+        _riff_chunk(b"data", payload)
+    return b"RIFF" + pack("<I", len(body)) + body
+
+
+def _iff_chunk(kind: bytes, data: bytes) -> bytes:
+    return kind + pack(">I", len(data)) + data + b"\x00" * (len(data) % 2)
+
+
+def _ieee_extended(value: int) -> bytes:
+    exponent = 16383 + value.bit_length() - 1
+    return pack(">HQ", exponent, value << (64 - value.bit_length()))
+
+
+def aiff(payload: bytes) -> bytes:
+    comm = pack(">hIh", 2, len(payload) // 4, 16) + _ieee_extended(44100)
+    ssnd = pack(">II", 0, 0) + payload
+    body = b"AIFF" + _iff_chunk(b"COMM", comm) + _iff_chunk(b"SSND", ssnd)
+    return b"FORM" + pack(">I", len(body)) + body
+
+
+def dsf(payload: bytes) -> bytes:
+    block = 4096
+    payload = payload[:len(payload) - len(payload) % (block * 2)] or \
+        bytes(block * 2)
+    fmt = pack("<4sQIIIIIIQII", b"fmt ", 52, 1, 0, 2, 2, 2822400, 1,
+               len(payload) // 2 * 8, block, 0)
+    data = pack("<4sQ", b"data", 12 + len(payload)) + payload
+    dsd = pack("<4sQQQ", b"DSD ", 28, 28 + len(fmt) + len(data), 0)
+    return dsd + fmt + data
+
+
+def wv(payload: bytes) -> bytes:
+    samples = len(payload) // 4
+    block = pack("<4sIHBBIIIII", b"wvpk", 24 + len(payload), 0x410, 0, 0,
+                 samples, 0, samples, 0x1 | (9 << 23), 0)
+    return block + payload
+
+
+def mp3(payload: bytes) -> bytes:
+    # MPEG-1 layer III, 128 kbps, 44100 Hz, stereo: 417 byte frames.
+    frame = bytes([0xFF, 0xFB, 0x90, 0x00]) + bytes(413)
+    return frame * max(1, len(payload) // len(frame))
+
+
+def aac(payload: bytes) -> bytes:
+    # ADTS frames of 200 bytes of data.
+    length = 7 + 200
+    frame = bytes([0xFF, 0xF1, 0x50, 0x80 | (length >> 11),
+                   (length >> 3) & 0xFF, ((length & 7) << 5) | 0x1F,
+                   0xFC]) + bytes(200)
+    return frame * max(1, len(payload) // len(frame))
+
+
+GENERATORS = {
+    "aac": aac,
+    "aiff": aiff,
+    "dsf": dsf,
+    "flac": flac,
+    "m4a": m4a,
+    "mp3": mp3,
+    "ogg": ogg_vorbis,
+    "opus": ogg_opus,
+    "wav": wav,
+    "wv": wv,
+}
+
+
+def write_fixture(directory: str, extension: str, size: str = "small",
+                  tag_load: str = "none", name: str = None) -> str:
+    '''
+    Writes a synthetic file of the given extension and size to the
+    directory, tagged with the given tag load.
+    -----
+    Returns: the path of the file.
+    '''
+    name = name or f"{extension}_{size}_{tag_load}"
+    file_path = path.join(directory, f"{name}.{extension}")
+    with open(file_path, "wb") as audio_file:
+        audio_file.write(GENERATORS[extension](bytes(SIZES[size])))
+
+    tags = TAG_LOADS[tag_load]
+    if tags and extension not in UNTAGGABLE:
+        ba_audio = BaseAudio()
+        ba_audio.load_track(file_path)
+        ba_audio.set_tags(**tags)
+        ba_audio.write_tags()
+    return file_path
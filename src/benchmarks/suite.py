@@ -0,0 +1,283 @@
+'''
+Benchmark suite over synthetic files (see benchmarks.fixtures) of every
+extension supported by the CLI, at several sizes and tag loads (the
+UNTAGGABLE ones, that can't be loaded, are skipped). It times
+BaseAudio.load_track (full and header only), set_tags and write_tags, the
+OptionalStringMatchers extractors (one name at a time and in batch) and end
+to end cli runs, and writes the results as JSON. Given the JSON of a
+previous run as a baseline, the median times are compared and the process
+terminates with 1 if any benchmark got slower than the threshold. Run it
+from the src directory:
+
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite --output new.json --baseline results.json
+'''
+from json import dump, load
+from os import makedirs, path, cpu_count
+from platform import platform, python_version
+from shutil import rmtree
+from statistics import mean, median
+from tempfile import mkdtemp
+from time import perf_counter, strftime
+from importlib import metadata
+
+import click
+from click.testing import CliRunner
+
+from EzAudioMeta.api import valid_extensions
+from EzAudioMeta.audio.base_audio import BaseAudio
+from EzAudioMeta.main import cli
+from EzAudioMeta.utilities.optional_string_matchers import\
+    OptionalStringMatchers
+from benchmarks.fixtures import SIZES, TAG_LOADS, UNTAGGABLE, write_fixture
+
+TITLE_PATTERN = "(?<=\\d\\d\\s).+(?=\\.flac)"
+NUMBER_PATTERN = "\\d+(?=.+\\.flac)"
+# tags set by the set_tags and write_tags benchmarks, the year changes on
+# each repeat so the file is always written.
+NEW_TAGS = {
+    "album": "Sonidos del Inframundo",
+    "artist": "Los Luciferinos",
+    "genre": "Cumbia",
+    "tracktitle": "Lilith Reprise",
+}
+CLI_FILES_PER_EXTENSION = 10
+
+
+def timings(function, repeat: int, setup=None) -> list:
+    '''
+    Runs function repeat times (after setup, which is not timed, if given)
+    and returns the seconds each run took.
+    '''
+    seconds = []
+    for i in range(repeat):
+        argument = setup(i) if setup else i
+        start = perf_counter()
+        function(argument)
+        seconds.append(perf_counter() - start)
+    return seconds
+
+
+def result(benchmark: str, seconds: list, **labels) -> dict:
+    return dict(benchmark=benchmark, **labels, repeat=len(seconds),
+                min=min(seconds), median=median(seconds),
+                mean=mean(seconds))
+
+
+def error_result(benchmark: str, error: Exception, **labels) -> dict:
+    return dict(benchmark=benchmark, **labels,
+                error=f"{type(error).__name__}: {error}")
+
+
+def audio_benchmarks(directory: str, sizes: list, repeat: int):
+    '''
+    Yields the results of the load_track, set_tags and write_tags benchmarks
+    of each extension (but the UNTAGGABLE ones, load_track raises on them),
+    size and tag load.
+    '''
+    for extension in valid_extensions:
+        if extension in UNTAGGABLE:
+            continue
+        for size in sizes:
+            for tag_load in TAG_LOADS:
+                labels = dict(extension=extension, size=size, tags=tag_load)
+                audio_file = write_fixture(directory, extension, size,
+                                           tag_load)
+                yield from _audio_file_benchmarks(audio_file, repeat,
+                                                  labels)
+
+
+def _audio_file_benchmarks(audio_file: str, repeat: int, labels: dict):
+    for benchmark, header_only in [("load_track", False),
+                                   ("load_track_header_only", True)]:
+        try:
+            seconds = timings(
+                lambda _: BaseAudio().load_track(audio_file, header_only),
+                repeat)
+        except Exception as e:
+            yield error_result(benchmark, e, **labels)
+            # the other benchmarks need the file loaded too.
+            return
+        yield result(benchmark, seconds, **labels)
+
+    def loaded(i):
+        ba_audio = BaseAudio()
+        ba_audio.load_track(audio_file)
+        return ba_audio, dict(NEW_TAGS, year=2000 + i)
+
+    def set_tags(audio_and_tags):
+        ba_audio, tags = audio_and_tags
+        ba_audio.set_tags(**tags)
+
+    def tags_set(i):
+        ba_audio, tags = loaded(i)
+        ba_audio.set_tags(**tags)
+        return ba_audio
+
+    for benchmark, function, setup in [
+            ("set_tags", set_tags, loaded),
+            ("write_tags", lambda ba_audio: ba_audio.write_tags(), tags_set)]:
+        try:
+            yield result(benchmark, timings(function, repeat, setup),
+                         **labels)
+        except Exception as e:
+            yield error_result(benchmark, e, **labels)
+
+
+def extractor_benchmarks(repeat: int, names: int = 10_000):
+    '''
+    Yields the results of each OptionalStringMatchers extractor over the
+    given number of generated file names.
+    '''
+    osm = OptionalStringMatchers()
+    title_pattern = osm.compile_pattern(TITLE_PATTERN)
+    number_pattern = osm.compile_pattern(NUMBER_PATTERN)
+    file_names = [f"{i % 100:02} the_ballad-of  track number {i}.flac"
+                  for i in range(names)]
+    for extractor, pattern in [
+            (osm.extract_track_title_capitalize, title_pattern),
+            (osm.extract_track_title_as_is, title_pattern),
+            (osm.extract_track_title_cleanup_and_capitalize, title_pattern),
+            (osm.extract_track_number, number_pattern)]:
+        def run(_):
+            for name in file_names:
+                extractor(name, pattern)
+        yield result(extractor.__name__, timings(run, repeat), names=names)
+
+    def run_batch(_):
+        for _ in osm.extract_track_titles_capitalize(file_names,
+                                                     title_pattern):
+            pass
+    yield result("extract_track_titles_capitalize",
+                 timings(run_batch, repeat), names=names)
+
+
+def cli_benchmarks(directory: str, repeat: int):
+    '''
+    Yields the results of tagging a directory with the cli, with 1 job and
+    with a job per CPU core. The artist changes on each repeat, so all the
+    files are written.
+    '''
+    files_directory = path.join(directory, "cli")
+    makedirs(files_directory)
+    extensions = [extension for extension in valid_extensions
+                  if extension not in UNTAGGABLE]
+    for extension in extensions:
+        for i in range(CLI_FILES_PER_EXTENSION):
+            write_fixture(files_directory, extension, "small", "basic",
+                          name=f"{i:02} track {extension}")
+    runner = CliRunner()
+
+    for jobs in sorted({1, cpu_count() or 1}):
+        def run(i):
+            outcome = runner.invoke(cli, [
+                "--files-directory", files_directory,
+                "--artist", f"Artist {jobs} {i}",
+                "--parse-track-number", "\\d+(?= track)",
+                "--jobs", str(jobs)])
+            if outcome.exit_code != 0:
+                raise RuntimeError(outcome.output)
+        yield result("cli", timings(run, repeat), jobs=jobs,
+                     files=len(extensions) * CLI_FILES_PER_EXTENSION)
+
+
+def run_suite(sizes: list, repeat: int) -> dict:
+    directory = mkdtemp()
+    try:
+        results = []
+        for benchmarks in [audio_benchmarks(directory, sizes, repeat),
+                           extractor_benchmarks(repeat),
+                           cli_benchmarks(directory, repeat)]:
+            for entry in benchmarks:
+                print(format_result(entry))
+                results.append(entry)
+    finally:
+        rmtree(directory)
+
+    try:
+        version = metadata.version("EzAudioMeta")
+    except metadata.PackageNotFoundError:
+        version = "unknown"
+    return {"version": version, "python": python_version(),
+            "platform": platform(), "date": strftime("%Y-%m-%dT%H:%M:%S"),
+            "results": results}
+
+
+def result_key(entry: dict) -> tuple:
+    '''
+    The labels that identify the same benchmark between runs.
+    '''
+    return tuple(sorted((key, value) for key, value in entry.items()
+                        if key not in ("repeat", "min", "median", "mean",
+                                       "error")))
+
+
+def format_result(entry: dict) -> str:
+    labels = " ".join(f"{key}={value}" for key, value in entry.items()
+                      if key not in ("benchmark", "repeat", "min", "median",
+                                     "mean", "error"))
+    if "error" in entry:
+        return f"{entry['benchmark']:<42} {labels:<38} {entry['error']}"
+    return f"{entry['benchmark']:<42} {labels:<38}" +\
+        f" {entry['median'] * 1000:10.3f} ms"
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list:
+    '''
+    Compares the median times of the benchmarks found in both runs.
+    -----
+    Returns: a list of (entry, ratio) of the benchmarks that are slower than
+    the baseline by more than threshold (0.1 is 10%).
+    '''
+    baseline_medians = {result_key(entry): entry["median"]
+                        for entry in baseline["results"]
+                        if "median" in entry}
+    regressions = []
+    for entry in current["results"]:
+        base = baseline_medians.get(result_key(entry))
+        if base is None or "median" not in entry or base == 0:
+            continue
+        ratio = entry["median"] / base
+        if ratio > 1 + threshold:
+            regressions.append((entry, ratio))
+    return regressions
+
+
+@click.command()
+@click.option("--output", default="benchmark_results.json",
+              help="Path of the JSON file the results are written to.")
+@click.option("--baseline", default=None,
+              help="JSON results of a previous run to compare against.")
+@click.option("--threshold", type=float, default=0.1,
+              help="How much slower than the baseline a benchmark can be" +
+              " before it's reported (0.1 is 10%).")
+@click.option("--sizes", default=",".join(SIZES),
+              help="Comma separated sizes of the files benchmarked.")
+@click.option("--repeat", type=int, default=5,
+              help="Times each benchmark is run.")
+def main(output, baseline, threshold, sizes, repeat) -> None:
+    sizes = [size.strip() for size in sizes.split(",")]
+    for size in sizes:
+        if size not in SIZES:
+            print(f"Unknown size: {size}, expected one of: " +
+                  ", ".join(SIZES))
+            exit(1)
+
+    results = run_suite(sizes, repeat)
+    with open(output, "w") as output_file:
+        dump(results, output_file, indent=2)
+    print(f"Results written to {output}")
+
+    if baseline:
+        with open(baseline) as baseline_file:
+            regressions = compare(load(baseline_file), results, threshold)
+        for entry, ratio in regressions:
+            print(f"slower {ratio:.2f}x: {format_result(entry)}")
+        if regressions:
+            exit(1)
+        print(f"No benchmark is slower than {baseline} by more than" +
+              f" {threshold:.0%}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+'''
+Audio files shared by the tests.
+
+The mp3 of test_files can't be relied on to have no tags: test_cli retags it
+in place (and resets it to its own tags), so the tests that need a file
+without tags get one generated from scratch (see benchmarks.fixtures).
+'''
+from benchmarks.fixtures import write_fixture
+
+
+def untagged_mp3(directory: str, name: str) -> str:
+    '''
+    Writes an mp3 file without tags to the directory, named name.mp3.
+    -----
+    Returns: the path of the file.
+    '''
+    return write_fixture(directory, "mp3", name=name)
@@ -0,0 +1,167 @@
+import unittest
+from os import path
+from pathlib import Path
+from shutil import copyfile, rmtree
+from tempfile import mkdtemp
+
+from EzAudioMeta.api import (InvalidPatternError, InvalidTagError, Parsers,
+                             TaggingError, read_tags, tag_files)
+from EzAudioMeta.audio import base_audio
+from EzAudioMeta.audio.artwork import artwork_data
+
+
+class TestApi(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.path_to_test_files = \
+            path.join(str(Path(__file__).parent.absolute()), "test_files")
+        self.audio_directory = mkdtemp()
+        self.audio_files = []
+        for i in range(1, 5):
+            audio_file = path.join(self.audio_directory,
+                                   f"0{i}_api_file.mp3")
+            copyfile(path.join(self.path_to_test_files,
+                               "01_audio_test_file_3.mp3"), audio_file)
+            self.audio_files.append(audio_file)
+        self.broken_file = path.join(self.audio_directory, "05_api_file.mp3")
+        with open(self.broken_file, "w") as text_file:
+            text_file.write("not an mp3")
+
+    def tearDown(self) -> None:
+        rmtree(self.audio_directory)
+
+    def test_tag_files(self) -> None:
+        '''
+        1. Tag 4 files with an artist and the track number parsed from their
+           names, with 1 and 2 jobs.
+        2. A result per file expected, in order, written the first time and
+           skipped the second.
+        3. The tags are read back with read_tags.
+        '''
+        parsers = Parsers(track_number="\\d+(?=_api)")
+        for jobs, written in [(1, True), (2, False)]:
+            results = list(tag_files(iter(self.audio_files),
+                                     {"artist": "Los Luciferinos",
+                                      "album": None},
+                                     parsers, jobs=jobs))
+            self.assertEqual([result.file for result in results],
+                             self.audio_files)
+            self.assertEqual([result.written for result in results],
+                             [written] * 4)
+            self.assertEqual([result.failure for result in results],
+                             [None] * 4)
+            self.assertEqual(results[2].tags, {"artist": "Los Luciferinos",
+                                               "tracknumber": 3})
+
+        results = list(read_tags(self.audio_files,
+                                 ["artist", "tracknumber"], jobs=2))
+        self.assertEqual([(result.file, result.tags) for result in results],
+                         [(audio_file, {"artist": "Los Luciferinos",
+                                        "tracknumber": i})
+                          for i, audio_file in enumerate(self.audio_files,
+                                                         start=1)])
+
+    def test_invalid_arguments(self) -> None:
+        '''
+        1. Call tag_files with an unknown tag, a tag of the wrong type, no
+           tags, an invalid regex and an artwork that is not an image.
+        2. The typed exception expected right away, no file touched.
+        3. read_tags with an unknown tag raises too.
+        '''
+        for tags, parsers, exception in [
+                ({"mood": "happy"}, None, InvalidTagError),
+                ({"year": "1999"}, None, InvalidTagError),
+                ({"artist": None}, None, InvalidTagError),
+                ({"artwork": b"not an image"}, None, InvalidTagError),
+                ({}, Parsers(title_as_is="(?<=\\d"), InvalidPatternError)]:
+            with self.assertRaises(exception):
+                tag_files([self.broken_file], tags, parsers)
+        with self.assertRaises(ValueError):
+            tag_files([self.broken_file], {"tracknumber": "one"})
+        with self.assertRaises(InvalidTagError):
+            read_tags(self.audio_files, ["mood"])
+
+    def test_failures(self) -> None:
+        '''
+        1. Tag the files and one that is not an actual mp3.
+        2. TaggingError expected with the failure of the broken file.
+        3. With keep_going, the failure is a result and the rest of the
+           files are tagged.
+        '''
+        files = [self.broken_file] + self.audio_files
+        with self.assertRaises(TaggingError) as context:
+            list(tag_files(files, {"genre": "Cumbia"}))
+        self.assertEqual(context.exception.failure.file, self.broken_file)
+        self.assertEqual(context.exception.failure.stage, "load")
+
+        results = list(tag_files(files, {"genre": "Cumbia villera"},
+                                 jobs=2, keep_going=True))
+        self.assertEqual(results[0].failure.stage, "load")
+        self.assertEqual(results[0].written, False)
+        self.assertEqual([result.written for result in results[1:]],
+                         [True] * 4)
+
+        results = list(read_tags(files, ["genre"], keep_going=True))
+        self.assertEqual(results[0].tags, None)
+        self.assertEqual(results[0].failure.file, self.broken_file)
+        self.assertEqual([result.tags for result in results[1:]],
+                         [{"genre": "Cumbia villera"}] * 4)
+
+    def test_track_number_not_a_number(self) -> None:
+        '''
+        1. Parse the track number with a regex that matches letters.
+        2. A parse failure expected for each file, the process is not
+           terminated.
+        '''
+        results = list(tag_files(self.audio_files[:2], {},
+                                 Parsers(track_number="[a-z]+(?=\\.mp3)"),
+                                 keep_going=True))
+        self.assertEqual([(result.failure.stage, result.failure.error_type)
+                          for result in results], [("parse", "ValueError")]
+                         * 2)
+        self.assertEqual([result.tags for result in results], [None] * 2)
+
+    def test_order_with_parse_failures(self) -> None:
+        '''
+        1. Tag the broken file, then a file whose name can't be parsed and
+           the rest of the files, with 2 jobs.
+        2. The results (failures included) come in the same order as the
+           paths.
+        3. Without keep_going, the failure raised is the broken file's.
+        '''
+        unparsed_file = path.join(self.audio_directory, "xx_api_file.mp3")
+        copyfile(self.audio_files[0], unparsed_file)
+        files = [self.broken_file, unparsed_file] + self.audio_files
+        parsers = Parsers(track_number="\\w\\w(?=_api)")
+        results = list(tag_files(files, {"artist": "Lilith"}, parsers,
+                                 jobs=2, keep_going=True))
+        self.assertEqual([result.file for result in results], files)
+        self.assertEqual([result.failure and result.failure.stage
+                          for result in results],
+                         ["load", "parse"] + [None] * 4)
+
+        with self.assertRaises(TaggingError) as context:
+            list(tag_files(files, {"artist": "Lilith"}, parsers, jobs=2))
+        self.assertEqual(context.exception.failure.file, self.broken_file)
+
+    def test_artwork_bytes(self) -> None:
+        '''
+        1. Tag the files with the bytes of an image as the artwork, with 2
+           jobs.
+        2. The image should be set to all the files.
+        '''
+        with open(path.join(self.path_to_test_files,
+                            "test_file_picture.jpg"), "rb") as image:
+            data = image.read()
+        results = list(tag_files(self.audio_files, {"artwork": data},
+                                 jobs=2))
+        self.assertEqual([result.written for result in results], [True] * 4)
+
+        audio = base_audio.BaseAudio()
+        for audio_file in self.audio_files:
+            audio.load_track(audio_file)
+            self.assertEqual(artwork_data(audio.get_tag("artwork")), data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+import unittest
+from importlib.util import find_spec
+from pathlib import Path
+from shutil import copyfile, rmtree
+from struct import pack
+from tempfile import mkdtemp
+from os import path
+
+from click.testing import CliRunner
+
+from EzAudioMeta.audio import base_audio
+from EzAudioMeta.audio.artwork import artwork_data, image_info
+from EzAudioMeta.main import cli
+
+PILLOW_INSTALLED = find_spec("PIL") is not None
+
+
+class TestArtwork(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.path_to_test_files = \
+            path.join(str(Path(__file__).parent.absolute()), "test_files")
+        self.picture = path.join(self.path_to_test_files,
+                                 "test_file_picture.jpg")
+        with open(self.picture, "rb") as picture:
+            self.picture_data = picture.read()
+        self.audio_directory = mkdtemp()
+        self.audio_files = []
+        for i in range(1, 4):
+            audio_file = path.join(self.audio_directory,
+                                   f"0{i}_cover_file.mp3")
+            copyfile(path.join(self.path_to_test_files,
+                               "01_audio_test_file_3.mp3"), audio_file)
+            self.audio_files.append(audio_file)
+
+    def tearDown(self) -> None:
+        rmtree(self.audio_directory)
+
+    def assert_artwork(self, audio_file: str, data: bytes) -> None:
+        audio = base_audio.BaseAudio()
+        audio.load_track(audio_file)
+        self.assertEqual(artwork_data(audio.get_tag("artwork")), data)
+
+    def test_image_info(self) -> None:
+        '''
+        1. Read the header of the JPEG test picture and of a PNG header.
+        2. Their format, size and depth are expected.
+        3. Anything else raises ValueError.
+        '''
+        self.assertEqual(image_info(self.picture_data),
+                         ("jpeg", 1920, 1872, 24))
+        png_header = b"\x89PNG\r\n\x1a\n" + pack(">I", 13) + b"IHDR" +\
+            pack(">IIBBBBB", 300, 200, 8, 6, 0, 0, 0)
+        self.assertEqual(image_info(png_header), ("png", 300, 200, 32))
+        with self.assertRaises(ValueError):
+            image_info(b"GIF89a not supported")
+        with self.assertRaises(ValueError):
+            image_info(self.picture_data[:20])
+
+    def test_set_artwork(self) -> None:
+        '''
+        1. Set the bytes of the picture as the artwork of a file.
+        2. The file has the picture after it's written.
+        3. Setting the same picture again doesn't write the file.
+        4. A str artwork raises TypeError.
+        '''
+        audio = base_audio.BaseAudio()
+        audio.load_track(self.audio_files[0])
+        audio.set_tag("artwork", self.picture_data)
+        self.assertTrue(audio.write_tags())
+        self.assert_artwork(self.audio_files[0], self.picture_data)
+
+        audio.load_track(self.audio_files[0], header_only=True)
+        audio.set_tag("artwork", self.picture_data)
+        self.assertFalse(audio.write_tags())
+        with self.assertRaises(TypeError):
+            audio.set_tag("artwork", self.picture)
+
+    def test_run_cli_artwork(self) -> None:
+        '''
+        1. Plan the artwork of a directory with 2 jobs, the picture is
+           described.
+        2. Set it with a state file, all the files get the picture.
+        3. Set it again, no file is opened.
+        '''
+        state_file = path.join(self.audio_directory, "state.db")
+        runner = CliRunner()
+        arguments = ["--files-directory", self.audio_directory,
+                     "--artwork", self.picture, "--jobs", "2",
+                     "--state-file", state_file]
+        result = runner.invoke(cli, arguments + ["--dry-run"])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("  artwork: None -> <jpeg 1920x1872," +
+                      f" {len(self.picture_data)} bytes>", result.output)
+        self.assertIn("3 file(s) would be written", result.output)
+
+        result = runner.invoke(cli, arguments)
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("3 file(s) written", result.output)
+        for audio_file in self.audio_files:
+            self.assert_artwork(audio_file, self.picture_data)
+
+        result = runner.invoke(cli, arguments)
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("3 file(s) not opened", result.output)
+
+    def test_run_cli_artwork_from_file(self) -> None:
+        '''
+        1. Set the artwork of a file from a text file, with 'artwork=path'.
+        2. The file has the picture.
+        '''
+        from_file = path.join(self.audio_directory, "tags.txt")
+        with open(from_file, "w") as text_file:
+            text_file.write(f"file={self.audio_files[0]}\n" +
+                            f"artwork={self.picture}\n")
+        runner = CliRunner()
+        result = runner.invoke(cli, ["--from-file", from_file])
+        self.assertEqual(result.exit_code, 0)
+        self.assert_artwork(self.audio_files[0], self.picture_data)
+
+    def test_run_cli_artwork_not_an_image(self) -> None:
+        '''
+        1. Set a text file as the artwork.
+        2. Error code 1 expected before any file is touched.
+        '''
+        not_an_image = path.join(self.audio_directory, "cover.jpg")
+        with open(not_an_image, "w") as text_file:
+            text_file.write("not a picture")
+        runner = CliRunner()
+        result = runner.invoke(cli, ["--files-directory",
+                                     self.audio_directory,
+                                     "--artwork", not_an_image])
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn("expected to be a JPEG or PNG file", result.output)
+        self.assert_artwork(self.audio_files[0], None)
+
+    @unittest.skipIf(PILLOW_INSTALLED, "Pillow is installed")
+    def test_run_cli_artwork_max_size_without_pillow(self) -> None:
+        '''
+        1. Scale the artwork down without Pillow.
+        2. Error code 1 expected, asking for Pillow.
+        '''
+        runner = CliRunner()
+        result = runner.invoke(cli, ["--file", self.audio_files[0],
+                                     "--artwork", self.picture,
+                                     "--artwork-max-size", "500"])
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn("Pillow is needed", result.output)
+
+    @unittest.skipUnless(PILLOW_INSTALLED, "Pillow is not installed")
+    def test_run_cli_artwork_max_size(self) -> None:
+        '''
+        1. Set the artwork scaled down to 500 pixels.
+        2. The file has a 500x487 JPEG.
+        '''
+        runner = CliRunner()
+        result = runner.invoke(cli, ["--file", self.audio_files[0],
+                                     "--artwork", self.picture,
+                                     "--artwork-max-size", "500"])
+        self.assertEqual(result.exit_code, 0)
+        audio = base_audio.BaseAudio()
+        audio.load_track(self.audio_files[0])
+        fmt, width, height, _ = image_info(
+            artwork_data(audio.get_tag("artwork")))
+        self.assertEqual((fmt, max(width, height)), ("jpeg", 500))
+
+
+if __name__ == '__main__':
+    unittest.main()
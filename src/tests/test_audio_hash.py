@@ -0,0 +1,194 @@
+import unittest
+from json import loads
+from os import path
+from pathlib import Path
+from shutil import copyfile, rmtree
+from tempfile import mkdtemp
+
+from click.testing import CliRunner
+
+from benchmarks.fixtures import GENERATORS, UNTAGGABLE, write_fixture
+from EzAudioMeta.api import (TaggingError, hash_audio, hash_results,
+                             worker_pool)
+from EzAudioMeta.audio import base_audio
+from EzAudioMeta.audio.audio_hash import audio_digest
+from EzAudioMeta.main import cli
+
+
+class TestAudioHash(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.path_to_test_files = \
+            path.join(str(Path(__file__).parent.absolute()), "test_files")
+        self.directory = mkdtemp()
+
+    def tearDown(self) -> None:
+        rmtree(self.directory)
+
+    def copy_mp3(self, name: str) -> str:
+        file_path = path.join(self.directory, name)
+        copyfile(path.join(self.path_to_test_files,
+                           "01_audio_test_file_3.mp3"), file_path)
+        return file_path
+
+    def set_tags(self, file_path: str, **tags) -> None:
+        audio = base_audio.BaseAudio()
+        audio.load_track(file_path)
+        audio.set_tags(**tags)
+        audio.write_tags()
+
+    def test_tags_dont_change_digest(self) -> None:
+        '''
+        1. Write a file of each format without tags and one with a lot of
+           tags (the same audio).
+        2. Both should have the same digest.
+        3. An mp3 file with ID3v1 and APEv2 tags appended has the digest of
+           the file without them.
+        '''
+        for extension in sorted(set(GENERATORS) - UNTAGGABLE):
+            untagged = write_fixture(self.directory, extension, "small",
+                                     "none")
+            tagged = write_fixture(self.directory, extension, "small",
+                                   "full")
+            self.assertEqual(audio_digest(untagged), audio_digest(tagged),
+                             extension)
+
+        mp3_file = self.copy_mp3("song.mp3")
+        digest = audio_digest(mp3_file)
+        self.set_tags(mp3_file, artist="Lilith", lyrics="la la la\n" * 500)
+        self.assertEqual(audio_digest(mp3_file), digest)
+        ape_item = b"\x06\x00\x00\x00\x00\x00\x00\x00Artist\x00Lilith"
+        ape_footer = b"APETAGEX" + (2000).to_bytes(4, "little") +\
+            (32 + len(ape_item)).to_bytes(4, "little") +\
+            (1).to_bytes(4, "little") + bytes(4) + bytes(8)
+        with open(mp3_file, "ab") as audio_file:
+            audio_file.write(ape_item + ape_footer)
+            audio_file.write(b"TAG" + b"Cancion".ljust(125, b"\x00"))
+        self.assertEqual(audio_digest(mp3_file), digest)
+
+    def test_audio_changes_digest(self) -> None:
+        '''
+        1. Change a byte of the audio of a wav file.
+        2. Its digest should change.
+        3. A file that is not audio raises ValueError.
+        '''
+        wav_file = write_fixture(self.directory, "wav", "small", "basic")
+        digest = audio_digest(wav_file)
+        with open(wav_file, "r+b") as audio_file:
+            audio_file.seek(1000)
+            audio_file.write(b"\x01")
+        self.assertNotEqual(audio_digest(wav_file), digest)
+
+        with self.assertRaisesRegex(ValueError, "not a supported audio"):
+            audio_digest(path.join(self.path_to_test_files,
+                                   "test_file_picture.jpg"))
+
+    def test_hash_audio(self) -> None:
+        '''
+        1. Hash 2 copies of an mp3 file with different tags and a file that
+           is not an actual mp3, with 2 jobs.
+        2. Both copies have the same digest, in order.
+        3. The broken file raises TaggingError, unless keep_going is set.
+        '''
+        files = [self.copy_mp3("01.mp3"), self.copy_mp3("02.mp3")]
+        self.set_tags(files[1], artist="Los Luciferinos")
+        broken_file = path.join(self.directory, "03.mp3")
+        with open(broken_file, "w") as text_file:
+            text_file.write("not an mp3")
+
+        results = list(hash_audio(files, jobs=2))
+        self.assertEqual([result.file for result in results], files)
+        self.assertEqual(results[0].audio_digest, results[1].audio_digest)
+
+        with self.assertRaises(TaggingError) as context:
+            list(hash_audio(files + [broken_file]))
+        self.assertEqual(context.exception.failure.stage, "hash")
+        results = list(hash_audio(files + [broken_file], keep_going=True))
+        self.assertIsNone(results[2].audio_digest)
+        self.assertEqual(results[2].failure.file, broken_file)
+
+    def test_hash_results_order(self) -> None:
+        '''
+        1. Hash 6 copies of an mp3 file with 2 workers, every other one
+           already known.
+        2. The files come in the same order as given, the known ones with
+           their digest and no file_stat, the rest hashed.
+        '''
+        files = [self.copy_mp3(f"0{i}.mp3") for i in range(1, 7)]
+        known = files[::2]
+        executor, workers = worker_pool(2)
+        try:
+            results = list(hash_results(
+                files, executor, workers,
+                lambda a_file: "known" if a_file in known else None))
+        finally:
+            executor.shutdown()
+        self.assertEqual([a_file for a_file, _ in results], files)
+        for a_file, (digest, failure, file_stat) in results:
+            self.assertIsNone(failure)
+            if a_file in known:
+                self.assertEqual((digest, file_stat), ("known", None))
+            else:
+                self.assertEqual(digest, audio_digest(a_file))
+                self.assertIsNotNone(file_stat)
+
+    def test_run_cli_hash_audio(self) -> None:
+        '''
+        1. Hash a directory with 2 copies of an mp3 file and a wav file,
+           with a state file.
+        2. All hashed, the copy seen second is the duplicate of the first.
+        3. Hashed again, nothing is read: all unchanged, the same
+           duplicate.
+        4. Retag the first copy and change the audio of the wav file, their
+           status should say so, the first copy is still the one seen
+           first.
+        '''
+        copies = [self.copy_mp3("01 copy.mp3"), self.copy_mp3("02 copy.mp3")]
+        wav_file = write_fixture(self.directory, "wav", name="03 other")
+        state_file = path.join(self.directory, "state.db")
+        output = path.join(self.directory, "hashes.jsonl")
+        runner = CliRunner()
+
+        def run() -> dict:
+            result = runner.invoke(cli, ["--files-directory", self.directory,
+                                         "--hash-audio", "--jobs", "2",
+                                         "--state-file", state_file,
+                                         "--export-output", output])
+            self.assertEqual(result.exit_code, 0, result.output)
+            with open(output) as output_file:
+                return {row["file"]: row for row in map(loads, output_file)}
+
+        rows = run()
+        self.assertEqual([rows[a_file]["status"]
+                          for a_file in copies + [wav_file]],
+                         ["hashed"] * 3)
+        self.assertEqual(rows[copies[0]]["audio_digest"],
+                         rows[copies[1]]["audio_digest"])
+        # the order of the directory listing, the rows keep it.
+        copies = [a_file for a_file in rows if a_file in copies]
+        duplicates = {a_file: row["duplicate_of"]
+                      for a_file, row in rows.items()}
+        self.assertEqual(duplicates, {copies[0]: None,
+                                      copies[1]: copies[0],
+                                      wav_file: None})
+
+        rows = run()
+        self.assertEqual([row["status"] for row in rows.values()],
+                         ["unchanged"] * 3)
+        self.assertEqual({a_file: row["duplicate_of"]
+                          for a_file, row in rows.items()}, duplicates)
+
+        self.set_tags(copies[0], genre="Cumbia")
+        with open(wav_file, "r+b") as audio_file:
+            audio_file.seek(1000)
+            audio_file.write(b"\x01")
+        rows = run()
+        self.assertEqual([rows[a_file]["status"]
+                          for a_file in copies + [wav_file]],
+                         ["tags_changed", "unchanged", "audio_changed"])
+        self.assertEqual({a_file: row["duplicate_of"]
+                          for a_file, row in rows.items()}, duplicates)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+from shutil import rmtree
+from tempfile import mkdtemp
+from os import path, stat
+
+from click.testing import CliRunner
+
+from EzAudioMeta.audio import base_audio
+from EzAudioMeta.main import cli
+from tests.audio_files import untagged_mp3
+
+
+class TestDryRun(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.audio_directory = mkdtemp()
+        self.audio_files = []
+        for i in range(1, 4):
+            audio_file = untagged_mp3(self.audio_directory,
+                                      f"0{i}_planned_file")
+            self.audio_files.append(audio_file)
+        # the last file already has the tags.
+        audio = base_audio.BaseAudio()
+        audio.load_track(self.audio_files[2])
+        audio.set_tags(artist="Los Luciferinos", tracknumber=3)
+        audio.write_tags()
+
+    def tearDown(self) -> None:
+        rmtree(self.audio_directory)
+
+    def test_tag_changes(self) -> None:
+        '''
+        1. Ask for the changes of a tag already set and of a new tag.
+        2. Only the new tag is expected, with its current value (None).
+        3. Nothing is set, the file is not fully loaded.
+        '''
+        audio = base_audio.BaseAudio()
+        audio.load_track(self.audio_files[2], header_only=True)
+        self.assertEqual(audio.tag_changes(artist="Los Luciferinos",
+                                           year=1984),
+                         {"year": (None, 1984)})
+        self.assertFalse(audio.is_loaded)
+        self.assertFalse(audio.write_tags())
+
+    def test_run_cli_dry_run(self) -> None:
+        '''
+        1. Plan the artist and the parsed track number of a directory with
+           2 jobs and a state file.
+        2. The changes of each file are printed, the file already up to date
+           is not.
+        3. No file is written, nor recorded in the state file.
+        '''
+        mtimes = [stat(audio_file).st_mtime_ns
+                  for audio_file in self.audio_files]
+        state_file = path.join(self.audio_directory, "state.db")
+        runner = CliRunner()
+        arguments = ["--files-directory", self.audio_directory,
+                     "--artist", "Los Luciferinos",
+                     "--parse-track-number", "\\d+(?=_planned)",
+                     "--state-file", state_file, "--jobs", "2"]
+        result = runner.invoke(cli, arguments + ["--dry-run"])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("Dry run, no file is written.", result.output)
+        for i, audio_file in enumerate(self.audio_files[:2], start=1):
+            self.assertIn(f"{audio_file}\n" +
+                          "  artist: None -> 'Los Luciferinos'\n" +
+                          f"  tracknumber: None -> {i}\n", result.output)
+        self.assertNotIn(self.audio_files[2], result.output)
+        self.assertIn("2 file(s) would be written, 1 file(s) would be" +
+                      " skipped", result.output)
+        self.assertEqual([stat(audio_file).st_mtime_ns
+                          for audio_file in self.audio_files], mtimes)
+
+        # the real run after the plan, nothing was recorded by the plan.
+        result = runner.invoke(cli, arguments)
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("2 file(s) written, 1 file(s) skipped", result.output)
+        self.assertIn("0 file(s) not opened", result.output)
+
+    def test_run_cli_dry_run_bad_regex(self) -> None:
+        '''
+        1. Plan with a title regex that doesn't match the names.
+        2. Error code 1 expected, the file reported before anything else.
+        '''
+        runner = CliRunner()
+        result = runner.invoke(cli, ["--file", self.audio_files[0],
+                                     "--parse-title-as-is", "(?<=_x).+",
+                                     "--dry-run"])
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn("Error while parsing the name of file:" +
+                      f"{self.audio_files[0]}", result.output)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+from os import path, makedirs
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from EzAudioMeta.utilities.file_discovery import scan_audio_files
+
+
+class TestFileDiscovery(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.extensions = frozenset(["flac", "mp3"])
+        self.directory = mkdtemp()
+        makedirs(path.join(self.directory, "disc 2", "bonus"))
+        makedirs(path.join(self.directory, "not a file.mp3"))
+        for name in ["01 track.mp3", "02 track.FLAC", "cover.jpg", "mp3",
+                     path.join("disc 2", "01 track.Mp3"),
+                     path.join("disc 2", "bonus", "01 bonus.flac")]:
+            with open(path.join(self.directory, name), "w") as audio_file:
+                audio_file.write("not really audio")
+
+    def tearDown(self) -> None:
+        rmtree(self.directory)
+
+    def test_scan_audio_files(self) -> None:
+        '''
+        1. Given a directory with audio files, other files and directories.
+        2. Only the audio files of the top directory are expected, the
+        extension is matched case insensitive.
+        '''
+        found = sorted(scan_audio_files(self.directory, self.extensions))
+        expected = [path.join(self.directory, "01 track.mp3"),
+                    path.join(self.directory, "02 track.FLAC")]
+        self.assertEqual(found, expected)
+
+    def test_scan_audio_files_recursive(self) -> None:
+        '''
+        1. Given a directory with audio files in sub directories.
+        2. With recursive set, the audio files in all the sub directories
+        are expected too.
+        '''
+        found = sorted(scan_audio_files(self.directory, self.extensions,
+                                        recursive=True))
+        expected = sorted([
+            path.join(self.directory, "01 track.mp3"),
+            path.join(self.directory, "02 track.FLAC"),
+            path.join(self.directory, "disc 2", "01 track.Mp3"),
+            path.join(self.directory, "disc 2", "bonus", "01 bonus.flac"),
+        ])
+        self.assertEqual(found, expected)
+
+    def test_scan_audio_files_is_lazy(self) -> None:
+        '''
+        1. Given a directory with audio files.
+        2. The first file is available before the directory is fully
+        listed.
+        '''
+        found = scan_audio_files(self.directory, self.extensions)
+        self.assertTrue(next(found).startswith(self.directory))
@@ -0,0 +1,211 @@
+import unittest
+from os import path, stat, utime
+from pathlib import Path
+from shutil import copyfile, rmtree
+from tempfile import mkdtemp
+from unittest.mock import patch
+
+from click.testing import CliRunner
+
+from benchmarks.fixtures import SIZES, mp3
+from EzAudioMeta.api import audio_extensions
+from EzAudioMeta.audio import base_audio, format_sniffer
+from EzAudioMeta.audio.format_sniffer import sniff_format
+from EzAudioMeta.audio.header_reader import read_tags
+from EzAudioMeta.main import cli
+from EzAudioMeta.utilities.file_discovery import scan_audio_files
+
+# an ID3v2.4 tag with 20 bytes of frames (all padding).
+ID3_TAG = b"ID3\x04\x00\x00\x00\x00\x00\x14" + bytes(20)
+
+
+def ogg_page(packet: bytes) -> bytes:
+    '''
+    The first page of an Ogg stream, with the given packet.
+    '''
+    return b"OggS" + bytes(22) + bytes([1, len(packet)]) + packet
+
+
+HEADERS = [
+    ("mp3", b"\xff\xfb\x90\x64" + bytes(100)),
+    ("mp3", ID3_TAG + b"\xff\xfb\x90\x64"),
+    ("flac", b"fLaC\x80\x00\x00\x22" + bytes(34)),
+    ("flac", ID3_TAG + b"fLaC\x80\x00\x00\x22"),
+    ("ogg", ogg_page(b"\x01vorbis" + bytes(23))),
+    ("opus", ogg_page(b"OpusHead" + bytes(11))),
+    ("wav", b"RIFF\x24\x00\x00\x00WAVEfmt "),
+    ("aiff", b"FORM\x00\x00\x00\x2eAIFFCOMM"),
+    ("dsf", b"DSD \x1c" + bytes(27)),
+    ("wv", b"wvpk\x20\x00\x00\x00" + bytes(24)),
+    ("m4a", b"\x00\x00\x00\x20ftypM4A " + bytes(20)),
+    ("aac", b"\xff\xf1\x50\x80\x02\x1f\xfc"),
+    ("aac", ID3_TAG + b"\xff\xf1\x50\x80\x02\x1f\xfc"),
+    (None, ogg_page(b"Speex   " + bytes(72))),
+    (None, b"RIFF\x24\x00\x00\x00AVI LIST"),
+    (None, b"just some text"),
+    (None, b""),
+]
+
+
+class TestFormatSniffer(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.path_to_test_files = \
+            path.join(str(Path(__file__).parent.absolute()), "test_files")
+        self.directory = mkdtemp()
+
+    def tearDown(self) -> None:
+        rmtree(self.directory)
+
+    def write(self, name: str, data: bytes) -> str:
+        file_path = path.join(self.directory, name)
+        with open(file_path, "wb") as a_file:
+            a_file.write(data)
+        return file_path
+
+    def copy_mp3(self, name: str) -> str:
+        file_path = path.join(self.directory, name)
+        copyfile(path.join(self.path_to_test_files,
+                           "01_audio_test_file_3.mp3"), file_path)
+        return file_path
+
+    def test_sniff_format(self) -> None:
+        '''
+        1. Write the first bytes of each format (and of files that are not
+           a supported format) to files without an audio extension.
+        2. The format of each should be detected from its bytes.
+        '''
+        for i, (audio_format, header) in enumerate(HEADERS):
+            file_path = self.write(f"{i:02}.bin", header)
+            self.assertEqual(sniff_format(file_path), audio_format,
+                             f"{header[:12]}")
+        self.assertEqual(sniff_format(self.copy_mp3("song.flac")), "mp3")
+        self.assertIsNone(sniff_format(path.join(self.path_to_test_files,
+                                                 "test_file_picture.jpg")))
+        file_path = self.copy_mp3("song")
+        with open(file_path, "rb") as audio_file:
+            self.assertEqual(sniff_format(file_path, audio_file.fileno()),
+                             "mp3")
+            self.assertEqual(audio_file.tell(), 0)
+
+    def test_without_pread(self) -> None:
+        '''
+        1. Detect the formats without os.pread (like on Windows), through
+           an open file read from the middle.
+        2. The same formats expected, and the offset of the file is left
+           where it was.
+        '''
+        with patch.object(format_sniffer, "pread", None):
+            for i, (audio_format, header) in enumerate(HEADERS):
+                file_path = self.write(f"{i:02}.bin", header)
+                with open(file_path, "rb") as audio_file:
+                    audio_file.read(2)
+                    self.assertEqual(
+                        format_sniffer._sniff(audio_file.fileno()),
+                        audio_format, f"{header[:12]}")
+                    self.assertEqual(audio_file.tell(), min(2, len(header)))
+
+    def test_cache(self) -> None:
+        '''
+        1. Detect the format of a file, then overwrite it with another
+           format keeping its modification time.
+        2. The cached format is returned.
+        3. Once its modification time changes, the new format is detected.
+        '''
+        file_path = self.write("audio", HEADERS[6][1])
+        self.assertEqual(sniff_format(file_path), "wav")
+        file_stat = stat(file_path)
+        self.write("audio", HEADERS[2][1])
+        utime(file_path, ns=(file_stat.st_atime_ns, file_stat.st_mtime_ns))
+        self.assertEqual(sniff_format(file_path), "wav")
+        utime(file_path, ns=(file_stat.st_atime_ns,
+                             file_stat.st_mtime_ns + 1_000_000_000))
+        self.assertEqual(sniff_format(file_path), "flac")
+
+    def test_misnamed_files(self) -> None:
+        '''
+        1. Tag an mp3 file named as a flac file, and one without an
+           extension.
+        2. Both are loaded as mp3 files, by music_tag and by the header
+           reader.
+        3. An image named as an mp3 file is rejected.
+        '''
+        for name in ["song.flac", "song"]:
+            file_path = self.copy_mp3(name)
+            audio = base_audio.BaseAudio()
+            audio.load_track(file_path)
+            audio.set_tags(artist="Los Luciferinos", tracknumber=3)
+            self.assertTrue(audio.write_tags())
+            self.assertEqual(read_tags(file_path)["artist"],
+                             "Los Luciferinos")
+            audio.load_track(file_path, header_only=True)
+            self.assertEqual(audio.get_tag("tracknumber"), 3)
+
+        image = path.join(self.directory, "image.mp3")
+        copyfile(path.join(self.path_to_test_files, "test_file_picture.jpg"),
+                 image)
+        with self.assertRaisesRegex(NotImplementedError,
+                                    "is not a supported audio file"):
+            base_audio.BaseAudio().load_track(image)
+
+    def test_padded_mp3(self) -> None:
+        '''
+        1. Write mp3 files with 200 and 600 zero bytes before the first
+           frame, their format can't be told from their first bytes.
+        2. They are still loaded (by music_tag.load_file) and tagged, with
+           and without the header reader.
+        '''
+        for padding in (200, 600):
+            file_path = self.write(f"padded_{padding}.mp3",
+                                   bytes(padding) +
+                                   mp3(bytes(SIZES["small"])))
+            self.assertIsNone(sniff_format(file_path))
+            audio = base_audio.BaseAudio()
+            audio.load_track(file_path, header_only=True)
+            self.assertIsNone(audio.get_tag("artist"))
+            audio.set_tags(artist="Los Luciferinos")
+            self.assertTrue(audio.write_tags())
+            audio.load_track(file_path)
+            self.assertEqual(audio.get_tag("artist"), "Los Luciferinos")
+
+    def test_scan_detect_format(self) -> None:
+        '''
+        1. Scan a directory with an mp3 file, an mp3 file without
+           extension, a text file and an image.
+        2. Only the mp3 file is found by its extension, both mp3 files
+           with detect_format.
+        '''
+        mp3_file = self.copy_mp3("01 song.mp3")
+        misnamed_file = self.copy_mp3("02 song")
+        self.write("notes.txt", b"just some text")
+        copyfile(path.join(self.path_to_test_files, "test_file_picture.jpg"),
+                 path.join(self.directory, "cover.jpg"))
+        self.assertEqual(list(scan_audio_files(self.directory,
+                                               audio_extensions)),
+                         [mp3_file])
+        self.assertEqual(sorted(scan_audio_files(self.directory,
+                                                 audio_extensions,
+                                                 detect_format=True)),
+                         [mp3_file, misnamed_file])
+
+    def test_run_cli_detect_format(self) -> None:
+        '''
+        1. Tag a directory with --detect-format.
+        2. The file without an extension is tagged too, the image is not.
+        '''
+        mp3_file = self.copy_mp3("01_song.mp3")
+        misnamed_file = self.copy_mp3("02_song")
+        copyfile(path.join(self.path_to_test_files, "test_file_picture.jpg"),
+                 path.join(self.directory, "cover.jpg"))
+        runner = CliRunner()
+        result = runner.invoke(cli, ["--files-directory", self.directory,
+                                     "--artist", "Lilith",
+                                     "--detect-format", "--jobs", "1"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("2 file(s) written", result.output)
+        for file_path in [mp3_file, misnamed_file]:
+            self.assertEqual(read_tags(file_path)["artist"], "Lilith")
+
+
+if __name__ == '__main__':
+    unittest.main()
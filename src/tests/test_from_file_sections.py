@@ -0,0 +1,188 @@
+import unittest
+from json import loads
+from os import mkdir, path, stat
+from pathlib import Path
+from shutil import copyfile, rmtree
+from tempfile import mkdtemp
+
+from click.testing import CliRunner
+
+from EzAudioMeta.audio.header_reader import read_tags
+from EzAudioMeta.main import cli, parse_from_file_sections
+
+
+class TestFromFileSections(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.path_to_test_files = \
+            path.join(str(Path(__file__).parent.absolute()), "test_files")
+        self.directory = mkdtemp()
+        self.infierno = path.join(self.directory, "infierno")
+        self.cielo = path.join(self.directory, "cielo")
+        self.audio_files = {}
+        for directory in [self.infierno, self.cielo]:
+            mkdir(directory)
+            self.audio_files[directory] = []
+            for i in range(1, 3):
+                audio_file = path.join(directory, f"0{i} Cancion {i}.mp3")
+                copyfile(path.join(self.path_to_test_files,
+                                   "01_audio_test_file_3.mp3"), audio_file)
+                self.audio_files[directory].append(audio_file)
+        self.from_file = path.join(self.directory, "jobs.txt")
+
+    def tearDown(self) -> None:
+        rmtree(self.directory)
+
+    def write_from_file(self, *lines) -> None:
+        with open(self.from_file, "w") as text_file:
+            text_file.write("\n".join(lines) + "\n")
+
+    def run_cli(self, *args):
+        runner = CliRunner()
+        return runner.invoke(cli, ["--from-file", self.from_file,
+                                   "--jobs", "2"] + list(args))
+
+    def test_parse_sections(self) -> None:
+        '''
+        1. Parse a text file with defaults and 2 sections.
+        2. Each section has the defaults, and its own options on top.
+        3. A text file without sections is a single section named None.
+        '''
+        self.write_from_file("genre=Cumbia", "year=2001", "",
+                             "[infierno]",
+                             f"files-directory={self.infierno}",
+                             "album=Infierno",
+                             "[cielo]",
+                             f"file={self.cielo}",
+                             "year=2002")
+        sections = parse_from_file_sections({"genre": None, "year": None,
+                                             "album": None},
+                                            None, None, self.from_file,
+                                            None, None, None, "\\d+")
+        self.assertEqual([section.name for section in sections],
+                         ["infierno", "cielo"])
+        self.assertEqual(sections[0].tags, {"genre": "Cumbia", "year": 2001,
+                                            "album": "Infierno"})
+        self.assertEqual(sections[1].tags, {"genre": "Cumbia", "year": 2002,
+                                            "album": None})
+        self.assertEqual((sections[0].files_directory, sections[0].file),
+                         (self.infierno, None))
+        self.assertEqual((sections[1].files_directory, sections[1].file),
+                         (None, self.cielo))
+        self.assertEqual([section.parse_track_number for section in sections],
+                         ["\\d+"] * 2)
+
+        self.write_from_file("genre=Cumbia", f"file={self.cielo}")
+        sections = parse_from_file_sections({"genre": None}, None, None,
+                                            self.from_file, None, None, None,
+                                            None)
+        self.assertEqual(len(sections), 1)
+        self.assertIsNone(sections[0].name)
+        self.assertEqual(sections[0].tags, {"genre": "Cumbia"})
+
+    def test_run_cli_sections(self) -> None:
+        '''
+        1. Tag 2 directories, each with its own album and parse patterns,
+           and the genre of the defaults.
+        2. Every file should have the tags of its section.
+        '''
+        self.write_from_file("genre=Cumbia",
+                             "[infierno]",
+                             f"files-directory={self.infierno}",
+                             "album=Infierno",
+                             "parse-track-number=\\d+(?= Cancion)",
+                             "[cielo]",
+                             f"files-directory={self.cielo}",
+                             "album=Cielo",
+                             "parse-title-as-is=(?<=\\d\\d ).+(?=\\.mp3)")
+        result = self.run_cli()
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn(f"[infierno] {self.infierno}", result.output)
+        self.assertIn(f"[cielo] {self.cielo}", result.output)
+
+        for i, audio_file in enumerate(self.audio_files[self.infierno],
+                                       start=1):
+            tags = read_tags(audio_file)
+            self.assertEqual((tags["genre"], tags["album"],
+                              tags["tracknumber"]), ("Cumbia", "Infierno", i))
+        for i, audio_file in enumerate(self.audio_files[self.cielo], start=1):
+            tags = read_tags(audio_file)
+            self.assertEqual((tags["genre"], tags["album"],
+                              tags["tracktitle"]),
+                             ("Cumbia", "Cielo", f"Cancion {i}"))
+
+    def test_invalid_sections(self) -> None:
+        '''
+        1. Run a text file with a valid section, one with a missing
+           directory and one with an invalid regex.
+        2. Both invalid sections are reported, exit code 1 expected and no
+           file is tagged.
+        3. An option set twice in a section, or a section defined twice,
+           is an error too.
+        '''
+        mtimes = [stat(audio_file).st_mtime_ns
+                  for audio_file in self.audio_files[self.infierno]]
+        missing = path.join(self.directory, "purgatorio")
+        self.write_from_file("[infierno]",
+                             f"files-directory={self.infierno}",
+                             "album=Infierno",
+                             "[purgatorio]",
+                             f"files-directory={missing}",
+                             "album=Purgatorio",
+                             "[cielo]",
+                             f"files-directory={self.cielo}",
+                             "parse-title-as-is=(?<=\\d")
+        result = self.run_cli()
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn(f"[purgatorio] {missing} doesn't exist", result.output)
+        self.assertIn("[cielo] Error in regex:", result.output)
+        self.assertIn("2 invalid section(s)", result.output)
+        self.assertEqual([stat(audio_file).st_mtime_ns
+                          for audio_file in self.audio_files[self.infierno]],
+                         mtimes)
+
+        for lines, message in [
+                (["[infierno]", "album=Infierno", "album=Cielo"],
+                 ":3: 'album' is already set in [infierno]."),
+                (["[infierno]", "album=Infierno", "[infierno]"],
+                 ":3: the section [infierno] is already defined.")]:
+            self.write_from_file(*lines)
+            result = self.run_cli()
+            self.assertEqual(result.exit_code, 1)
+            self.assertIn(message, result.output)
+
+    def test_keep_going_sections(self) -> None:
+        '''
+        1. Tag 2 sections with --keep-going, the first one has a file that
+           is not an actual mp3.
+        2. The rest of the files of both sections are tagged, exit code 1
+           expected and the failure is in the report.
+        3. Sections can't be used with --watch.
+        '''
+        broken_file = path.join(self.infierno, "00 Rota.mp3")
+        with open(broken_file, "w") as text_file:
+            text_file.write("not an mp3")
+        report = path.join(self.directory, "failures.jsonl")
+        self.write_from_file("artist=Los Luciferinos",
+                             "[infierno]",
+                             f"files-directory={self.infierno}",
+                             "[cielo]",
+                             f"files-directory={self.cielo}")
+        result = self.run_cli("--keep-going", "--failure-report", report)
+        self.assertEqual(result.exit_code, 1, result.output)
+        for audio_file in self.audio_files[self.infierno] +\
+                self.audio_files[self.cielo]:
+            self.assertEqual(read_tags(audio_file)["artist"],
+                             "Los Luciferinos")
+        with open(report) as report_file:
+            failures = [loads(line) for line in report_file]
+        self.assertEqual([failure["file"] for failure in failures],
+                         [broken_file])
+
+        result = self.run_cli("--watch", "--files-directory", self.infierno)
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn("can't be used with", result.output)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import unittest
+from pathlib import Path
+from shutil import copyfile, rmtree
+from tempfile import mkdtemp
+from os import path
+
+import music_tag
+
+from EzAudioMeta.audio import base_audio
+from EzAudioMeta.audio.header_reader import read_tags, TAG_NAMES
+from tests.audio_files import untagged_mp3
+
+
+class TestHeaderReader(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.audio_directory = mkdtemp()
+        self.mp3_file = untagged_mp3(self.audio_directory, "audio_file")
+        self.flac_file = path.join(self.audio_directory, "audio_file.flac")
+        with open(self.flac_file, "wb") as flac_file:
+            flac_file.write(self.flac_bytes())
+        self.tags = {
+            "album": "Rumbeando en el Noveno Infierno",
+            "albumartist": "Los Luciferinos",
+            "artist": "Lilith y Los Luciferinos",
+            "comment": "hai domo",
+            "compilation": 1,
+            "composer": "Johan Switcheroo",
+            "discnumber": 1,
+            "genre": "Techno-Cumbia Norteña Progresiva",
+            "isrc": "The hell is this",
+            "lyrics": "OwO",
+            "totaldiscs": 2,
+            "totaltracks": 38,
+            "tracknumber": 5,
+            "tracktitle": "El Perreo de Lilith",
+            "year": 1984,
+        }
+
+    def tearDown(self) -> None:
+        rmtree(self.audio_directory)
+
+    def test_read_tags_same_as_music_tag(self) -> None:
+        '''
+        1. Given an mp3 and a flac file with all the tags set.
+        2. The header reader should return the same values as music_tag.
+        '''
+        for audio_file in (self.mp3_file, self.flac_file):
+            self.write_tags(audio_file, **self.tags)
+            self.assertEqual(read_tags(audio_file),
+                             self.music_tag_values(audio_file))
+
+    def test_read_tags_not_set(self) -> None:
+        '''
+        1. Given files without tags.
+        2. All the tags should be None, as in music_tag.
+        '''
+        for audio_file in (self.mp3_file, self.flac_file):
+            self.assertEqual(read_tags(audio_file),
+                             dict.fromkeys(TAG_NAMES))
+
+    def test_read_tags_unsupported_format(self) -> None:
+        '''
+        1. Given a format the header reader doesn't parse.
+        2. None is expected, so the caller falls back to music_tag.
+        '''
+        wav_file = path.join(self.audio_directory, "audio_file.wav")
+        with open(wav_file, "wb") as wav:
+            wav.write(b"RIFF" + (4).to_bytes(4, "little") + b"WAVE")
+        self.assertIsNone(read_tags(wav_file))
+
+    def test_read_tags_not_an_mp3(self) -> None:
+        '''
+        1. Given an image renamed as an .mp3 file.
+        2. None is expected, so music_tag reports the file as invalid.
+        '''
+        not_mp3_file = path.join(self.audio_directory, "not_audio.mp3")
+        copyfile(path.join(str(Path(__file__).parent.absolute()),
+                           "test_files", "test_file_picture.jpg"),
+                 not_mp3_file)
+        self.assertIsNone(read_tags(not_mp3_file))
+
+    def test_load_track_header_only(self) -> None:
+        '''
+        1. Load a tagged file reading only the header.
+        2. Tags are read without loading the file with music_tag.
+        3. Setting a tag loads the file, and it's written as usual.
+        '''
+        self.write_tags(self.mp3_file, **self.tags)
+        ba_audio = base_audio.BaseAudio()
+        ba_audio.load_track(self.mp3_file, header_only=True)
+        self.assertEqual(ba_audio.get_tag("title"), self.tags["tracktitle"])
+        ba_audio.set_tag("year", 1984)
+        self.assertIsNone(ba_audio._current_file)
+        self.assertFalse(ba_audio.write_tags())
+
+        ba_audio.set_tag("year", 1985)
+        self.assertIsNotNone(ba_audio._current_file)
+        self.assertTrue(ba_audio.write_tags())
+        self.assertEqual(read_tags(self.mp3_file)["year"], 1985)
+
+    def write_tags(self, audio_file, **tags) -> None:
+        ba_audio = base_audio.BaseAudio()
+        ba_audio.load_track(audio_file)
+        ba_audio.set_tags(**tags)
+        ba_audio.write_tags()
+
+    def music_tag_values(self, audio_file) -> dict:
+        loaded = music_tag.load_file(audio_file)
+        return {tag: loaded[tag].first for tag in TAG_NAMES}
+
+    def flac_bytes(self) -> bytes:
+        '''
+        A FLAC stream with just the STREAMINFO block: 44100 Hz, 2 channels,
+        16 bits, 44100 samples.
+        '''
+        stream_info = (4096).to_bytes(2, "big") * 2 + bytes(6)
+        stream_info += ((44100 << 44) | (1 << 41) | (15 << 36) |
+                        44100).to_bytes(8, "big") + bytes(16)
+        return b"fLaC" + bytes([0x80]) + \
+            len(stream_info).to_bytes(3, "big") + stream_info
@@ -0,0 +1,133 @@
+import unittest
+from json import dumps
+from shutil import rmtree
+from tempfile import mkdtemp
+from os import path
+
+from click.testing import CliRunner
+
+from EzAudioMeta.audio import base_audio
+from EzAudioMeta.main import cli
+from tests.audio_files import untagged_mp3
+
+
+class TestImportManifest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.audio_directory = mkdtemp()
+        self.audio_files = []
+        for i in range(1, 5):
+            audio_file = untagged_mp3(self.audio_directory,
+                                      f"0{i}_manifest_file")
+            self.audio_files.append(audio_file)
+
+    def tearDown(self) -> None:
+        rmtree(self.audio_directory)
+
+    def test_import_csv_manifest(self) -> None:
+        '''
+        1. Import a CSV manifest with a title and track number per file,
+           plus an artist for all the files, with 2 jobs.
+        2. Each file should have its own tags and the artist.
+        3. Empty values are not set.
+        '''
+        manifest = path.join(self.audio_directory, "manifest.csv")
+        with open(manifest, "w", newline="", encoding="utf-8") as csv_file:
+            csv_file.write("path,tracktitle,tracknumber,year\n")
+            for i, audio_file in enumerate(self.audio_files, start=1):
+                year = "" if i == 4 else 1980 + i
+                csv_file.write(f"{audio_file},\"Track {i}, Vol. 1\",{i}," +
+                               f"{year}\n")
+
+        runner = CliRunner()
+        result = runner.invoke(cli, ["--import-manifest", manifest,
+                                     "--artist", "Los Luciferinos",
+                                     "--jobs", "2"])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("4 file(s) written", result.output)
+
+        audio = base_audio.BaseAudio()
+        for i, audio_file in enumerate(self.audio_files, start=1):
+            audio.load_track(audio_file)
+            self.assertEqual(audio.get_tag("tracktitle"), f"Track {i}, Vol. 1")
+            self.assertEqual(audio.get_tag("tracknumber"), i)
+            self.assertEqual(audio.get_tag("artist"), "Los Luciferinos")
+            self.assertEqual(audio.get_tag("year"),
+                             None if i == 4 else 1980 + i)
+
+    def test_import_invalid_rows(self) -> None:
+        '''
+        1. Import a JSON lines manifest with invalid rows (lists and objects
+           as values too).
+        2. Error code 1 expected, each invalid row reported with its line.
+        3. No file should have been tagged, not even the valid rows.
+        '''
+        manifest = path.join(self.audio_directory, "manifest.jsonl")
+        rows = [
+            dumps({"path": self.audio_files[0], "artist": "Lilith"}),
+            dumps({"path": self.audio_files[1], "year": "last year"}),
+            "",
+            dumps({"path": self.audio_files[2], "mood": "happy"}),
+            "{not json",
+            dumps({"path": path.join(self.audio_directory, "nope.mp3")}),
+            dumps({"artist": "Lilith"}),
+            dumps({"path": self.audio_files[0], "tracknumber": [1, 2]}),
+            dumps({"path": self.audio_files[0], "year": {"from": 1999}}),
+            dumps({"path": [self.audio_files[0]], "artist": "Lilith"}),
+        ]
+        with open(manifest, "w", encoding="utf-8") as jsonl_file:
+            jsonl_file.write("\n".join(rows) + "\n")
+
+        runner = CliRunner()
+        result = runner.invoke(cli, ["--import-manifest", manifest])
+        self.assertEqual(result.exit_code, 1)
+        missing_file = path.join(self.audio_directory, "nope.mp3")
+        for line, error in [(2, "'year' is expected to be a sequence of"),
+                            (4, "Unknown column: 'mood'"),
+                            (5, "Invalid JSON"),
+                            (6, f"{missing_file} doesn't exist"),
+                            (7, "No 'path' set"),
+                            (8, "'tracknumber' is expected to be a sequence"),
+                            (9, "'year' is expected to be a sequence of"),
+                            (10, "'path' is expected to be a sequence of")]:
+            self.assertIn(f"{manifest}:{line}: {error}", result.output)
+        self.assertNotIn(f"{manifest}:1:", result.output)
+        self.assertIn("8 invalid row(s)", result.output)
+
+        audio = base_audio.BaseAudio()
+        audio.load_track(self.audio_files[0])
+        self.assertIsNone(audio.get_tag("artist"))
+
+    def test_import_exported_tags(self) -> None:
+        '''
+        1. Tag a directory and export its tags as JSON lines.
+        2. Import the export into copies of the untagged files.
+        3. The copies should get the same tags.
+        '''
+        runner = CliRunner()
+        result = runner.invoke(cli, ["--files-directory",
+                                     self.audio_directory,
+                                     "--album", "Noveno Infierno",
+                                     "--parse-track-number",
+                                     "\\d+(?=_manifest)"])
+        self.assertEqual(result.exit_code, 0)
+        exported = path.join(self.audio_directory, "exported.jsonl")
+        result = runner.invoke(cli, ["--files-directory",
+                                     self.audio_directory,
+                                     "--export", "jsonl",
+                                     "--export-output", exported])
+        self.assertEqual(result.exit_code, 0)
+        for i in range(1, 5):
+            untagged_mp3(self.audio_directory, f"0{i}_manifest_file")
+
+        result = runner.invoke(cli, ["--import-manifest", exported])
+        self.assertEqual(result.exit_code, 0)
+        audio = base_audio.BaseAudio()
+        for i, audio_file in enumerate(self.audio_files, start=1):
+            audio.load_track(audio_file)
+            self.assertEqual(audio.get_tag("album"), "Noveno Infierno")
+            self.assertEqual(audio.get_tag("tracknumber"), i)
+
+
+if __name__ == '__main__':
+    unittest.main()
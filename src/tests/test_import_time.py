@@ -0,0 +1,104 @@
+import unittest
+from os import environ, path
+from pathlib import Path
+from shutil import copyfile, rmtree
+from subprocess import run
+from tempfile import mkdtemp
+import sys
+
+SRC_DIRECTORY = str(Path(__file__).parent.parent.absolute())
+# modules that take long to import, they are only imported when a file is
+# actually loaded (or the option that needs them is set).
+HEAVY_MODULES = ["music_tag", "mutagen", "asyncio", "sqlite3",
+                 "multiprocessing", "concurrent.futures", "cProfile"]
+# milliseconds the import of EzAudioMeta.main can take (the best of a few
+# runs), can be changed for slow machines.
+IMPORT_TIME_LIMIT_MS = float(environ.get("EZAUDIO_IMPORT_TIME_LIMIT_MS",
+                                         150))
+IMPORT_TIME_RUNS = 5
+
+
+def run_python(*arguments) -> str:
+    env = dict(environ)
+    env["PYTHONPATH"] = SRC_DIRECTORY + (path.pathsep + env["PYTHONPATH"]
+                                         if env.get("PYTHONPATH") else "")
+    result = run([sys.executable, *arguments], capture_output=True,
+                 text=True, env=env, cwd=SRC_DIRECTORY)
+    if result.returncode != 0:
+        raise AssertionError(result.stderr)
+    return result.stdout + result.stderr
+
+
+class TestImportTime(unittest.TestCase):
+
+    def loaded_heavy_modules(self, code: str) -> list:
+        output = run_python("-c", code + "\nimport sys\nprint(','.join(" +
+                            f"m for m in {HEAVY_MODULES!r}" +
+                            " if m in sys.modules))")
+        return [module for module in output.splitlines()[-1].split(",")
+                if module]
+
+    def test_import_is_lazy(self) -> None:
+        '''
+        1. Import the CLI in a new interpreter.
+        2. None of the heavy modules should have been imported.
+        '''
+        self.assertEqual(self.loaded_heavy_modules("import EzAudioMeta.main"),
+                         [])
+
+    def test_help_is_lazy(self) -> None:
+        '''
+        1. Show the help, and fail the validation (no tags), in a new
+           interpreter.
+        2. None of the heavy modules should have been imported.
+        '''
+        for arguments in (["--help"], ["--file", __file__]):
+            code = "from EzAudioMeta.main import cli\n" +\
+                "try:\n" +\
+                f"    cli({arguments!r})\n" +\
+                "except SystemExit:\n" +\
+                "    pass"
+            self.assertEqual(self.loaded_heavy_modules(code), [])
+
+    def test_tagging_without_state_file(self) -> None:
+        '''
+        1. Tag a copy of an mp3 file without --state-file, in a new
+           interpreter.
+        2. sqlite3 should not have been imported.
+        '''
+        directory = mkdtemp()
+        try:
+            audio_file = path.join(directory, "01_lazy_file.mp3")
+            copyfile(path.join(SRC_DIRECTORY, "tests", "test_files",
+                               "01_audio_test_file_3.mp3"), audio_file)
+            arguments = ["--file", audio_file, "--artist", "Lilith"]
+            code = "from EzAudioMeta.main import cli\n" +\
+                "try:\n" +\
+                f"    cli({arguments!r})\n" +\
+                "except SystemExit:\n" +\
+                "    pass"
+            self.assertNotIn("sqlite3", self.loaded_heavy_modules(code))
+        finally:
+            rmtree(directory)
+
+    def test_import_time(self) -> None:
+        '''
+        1. Import the CLI with -X importtime a few times.
+        2. The best time should be under the limit.
+        '''
+        times = []
+        for _ in range(IMPORT_TIME_RUNS):
+            output = run_python("-X", "importtime", "-c",
+                                "import EzAudioMeta.main")
+            for line in output.splitlines():
+                # import time: self [us] | cumulative | imported package
+                fields = line.split("|")
+                if len(fields) == 3 and \
+                        fields[2].strip() == "EzAudioMeta.main":
+                    times.append(int(fields[1]) / 1000)
+        self.assertEqual(len(times), IMPORT_TIME_RUNS)
+        self.assertLess(min(times), IMPORT_TIME_LIMIT_MS)
+
+
+if __name__ == '__main__':
+    unittest.main()
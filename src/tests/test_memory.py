@@ -0,0 +1,106 @@
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from os import link, path
+from pathlib import Path
+from shutil import copyfile, rmtree
+from tempfile import mkdtemp
+import tracemalloc
+
+from EzAudioMeta.audio import base_audio
+from EzAudioMeta.main import parse_from_file, tag_files, audio_extensions
+from EzAudioMeta.utilities.file_discovery import scan_audio_files
+
+# the peak memory of tagging FEW_FILES and MANY_FILES files should be about
+# the same, only the bytes in SLACK are allowed on top of the ratio.
+FEW_FILES = 200
+MANY_FILES = 4000
+PEAK_RATIO = 1.5
+SLACK = 128 * 1024
+
+
+def traced_peak(function, *arguments) -> int:
+    '''
+    Returns: the peak of the memory allocated (tracemalloc) while running
+    the function, its output is discarded.
+    '''
+    tracemalloc.start()
+    try:
+        with redirect_stdout(StringIO()):
+            function(*arguments)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+class TestMemory(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = mkdtemp()
+        # a single tagged file, every other file is a hard link to it, so
+        # thousands of files take no space.
+        self.tagged_file = path.join(self.directory, "tagged.mp3")
+        copyfile(path.join(str(Path(__file__).parent.absolute()),
+                           "test_files", "01_audio_test_file_3.mp3"),
+                 self.tagged_file)
+        audio = base_audio.BaseAudio()
+        audio.load_track(self.tagged_file)
+        audio.set_tags(artist="Los Luciferinos", genre="Cumbia")
+        audio.write_tags()
+
+    def tearDown(self) -> None:
+        rmtree(self.directory)
+
+    def linked_directory(self, amount: int) -> str:
+        directory = path.join(self.directory, str(amount))
+        Path(directory).mkdir()
+        for i in range(amount):
+            link(self.tagged_file, path.join(directory, f"{i:07}.mp3"))
+        return directory
+
+    def tag_directory(self, directory: str) -> None:
+        tag_files(scan_audio_files(directory, audio_extensions),
+                  {"artist": "Los Luciferinos", "genre": "Cumbia"},
+                  (None, None, None, None), 1)
+
+    def test_tagging_memory_is_flat(self) -> None:
+        '''
+        1. Tag a directory of a few files and one of many files, from the
+           discovery to the tags check of each file.
+        2. The peak memory of both should be about the same.
+        '''
+        few_files = self.linked_directory(FEW_FILES)
+        many_files = self.linked_directory(MANY_FILES)
+        # the modules imported on the first run are not measured.
+        traced_peak(self.tag_directory, few_files)
+
+        few_peak = traced_peak(self.tag_directory, few_files)
+        many_peak = traced_peak(self.tag_directory, many_files)
+        self.assertLess(many_peak, few_peak * PEAK_RATIO + SLACK,
+                        f"{FEW_FILES} files: {few_peak} bytes," +
+                        f" {MANY_FILES} files: {many_peak} bytes")
+
+    def test_parse_from_file_memory_is_flat(self) -> None:
+        '''
+        1. Parse a text file of options with many lines.
+        2. The peak memory should be a small part of the size of the file.
+        3. The options are read.
+        '''
+        from_file = path.join(self.directory, "options.txt")
+        with open(from_file, "w") as text_file:
+            text_file.write(f"file={self.tagged_file}\n")
+            for i in range(100_000):
+                text_file.write(f"# note {i}: nothing to see here\n")
+            text_file.write("artist=Los Luciferinos\n")
+
+        tags = {"artist": None}
+        result = []
+        peak = traced_peak(lambda: result.append(parse_from_file(
+            tags, None, None, from_file, None, None, None, None)))
+        self.assertLess(peak, path.getsize(from_file) / 10)
+        self.assertEqual(result[0][0], {"artist": "Los Luciferinos"})
+        self.assertEqual(result[0][1], self.tagged_file)
+
+
+if __name__ == '__main__':
+    unittest.main()
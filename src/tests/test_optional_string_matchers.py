@@ -133,3 +133,61 @@ class TestOptionalStringMatchers(unittest.TestCase):
         pattern = "\\d+(?=.*\\.mp3)"
         track_number = osm.extract_track_number(file_name, pattern)
         self.assertEqual(track_number, expected)
+
+    def test_extract_track_titles_batch(self) -> None:
+        '''
+        1. Given a list of audio file names (mixed case, '-', '_', short
+           words, a single word and non ASCII letters).
+        2. And a single Regex expression.
+        3. Each batch extractor should yield the same titles as the
+           extractor of a single file name, in the same order.
+        '''
+        osm = OptionalStringMatchers()
+        file_names = [
+            "03 Of lILLIes AND remains.flac",
+            "07 the ballad OF she-WOLF_of hollywood.flac",
+            "01 my-name_is  tony--mon__tana.flac",
+            "02 intro.flac",
+            "04 ÉL Y ella-ΟΔΟΣ of 1984.flac",
+            "05 (the) 2nd   of  a kind ..flac",
+        ]
+        pattern = osm.compile_pattern("(?<=\\d\\d\\s).+(?=\\.flac)")
+        for batch, single in [
+                (osm.extract_track_titles_as_is,
+                 osm.extract_track_title_as_is),
+                (osm.extract_track_titles_capitalize,
+                 osm.extract_track_title_capitalize),
+                (osm.extract_track_titles_cleanup_and_capitalize,
+                 osm.extract_track_title_cleanup_and_capitalize)]:
+            self.assertEqual(list(batch(iter(file_names), pattern)),
+                             [single(file_name, pattern)
+                              for file_name in file_names])
+        self.assertEqual(list(osm.extract_track_titles_capitalize(
+                             file_names[:2], pattern)),
+                         ["Of Lillies and Remains",
+                          "The Ballad of She-Wolf_Of Hollywood"])
+
+    def test_compile_pattern_is_cached(self) -> None:
+        '''
+        1. Given the same Regex expression twice.
+        2. The same compiled expression should be returned both times.
+        3. An already compiled expression is returned as is.
+        '''
+        osm = OptionalStringMatchers()
+        pattern = "\\d+(?=.*\\.mp3)"
+        compiled = osm.compile_pattern(pattern)
+        self.assertIs(compiled, osm.compile_pattern(pattern))
+        self.assertIs(compiled, osm.compile_pattern(compiled))
+        self.assertEqual(osm.extract_track_number("07 title.mp3", compiled),
+                         7)
+
+    def test_validate_pattern_invalid_regex(self) -> None:
+        '''
+        1. Given an invalid Regex expression.
+        2. The process should be terminated with 1.
+        '''
+        osm = OptionalStringMatchers()
+        with self.assertRaises(SystemExit) as exit_context:
+            osm.validate_pattern("(?<=\\d")
+        self.assertEqual(exit_context.exception.code, 1)
+        self.assertIsNone(osm.validate_pattern(None))
@@ -0,0 +1,79 @@
+import unittest
+from shutil import rmtree
+from tempfile import mkdtemp
+from os import path
+
+from click.testing import CliRunner
+
+from EzAudioMeta.audio import base_audio
+from EzAudioMeta.main import cli
+from tests.audio_files import untagged_mp3
+
+
+class TestPadding(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.audio_directory = mkdtemp()
+        self.audio_files = []
+        for i in range(1, 3):
+            audio_file = untagged_mp3(self.audio_directory,
+                                      f"0{i}_padded_file")
+            self.audio_files.append(audio_file)
+
+    def tearDown(self) -> None:
+        rmtree(self.audio_directory)
+
+    def write_lyrics(self, lyrics: str, padding: int) -> bool:
+        audio = base_audio.BaseAudio()
+        audio.load_track(self.audio_files[0])
+        audio.set_tag("lyrics", lyrics)
+        audio.write_tags(padding)
+        return audio.full_rewrite
+
+    def test_write_tags_padding(self) -> None:
+        '''
+        1. Write the lyrics of an untagged file reserving 8 KiB of padding.
+        2. The file is fully rewritten (it had no room for tags).
+        3. Longer lyrics that fit in the padding are written in place, the
+           file keeps its size.
+        4. Lyrics longer than the padding rewrite the file again.
+        '''
+        self.assertTrue(self.write_lyrics("la " * 100, 8192))
+        size = path.getsize(self.audio_files[0])
+        self.assertFalse(self.write_lyrics("la " * 1000, 8192))
+        self.assertEqual(path.getsize(self.audio_files[0]), size)
+        self.assertTrue(self.write_lyrics("la " * 5000, 8192))
+
+        audio = base_audio.BaseAudio()
+        audio.load_track(self.audio_files[0])
+        self.assertEqual(audio.get_tag("lyrics"), "la " * 5000)
+
+    def test_run_cli_padding_report(self) -> None:
+        '''
+        1. Tag a directory with --padding and --rewrite-report.
+        2. Both files are fully rewritten and reported.
+        3. Tag them again with a longer comment, both are updated in place
+           and the report is empty.
+        '''
+        rewrite_report = path.join(self.audio_directory, "rewritten.txt")
+        runner = CliRunner()
+        arguments = ["--files-directory", self.audio_directory,
+                     "--padding", "8192", "--rewrite-report", rewrite_report]
+        result = runner.invoke(cli, arguments + ["--comment", "short"])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("0 file(s) updated in place, 2 file(s) fully" +
+                      " rewritten", result.output)
+        with open(rewrite_report) as report:
+            self.assertEqual(sorted(report.read().splitlines()),
+                             self.audio_files)
+
+        result = runner.invoke(cli, arguments + ["--comment", "long " * 500])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("2 file(s) updated in place, 0 file(s) fully" +
+                      " rewritten", result.output)
+        with open(rewrite_report) as report:
+            self.assertEqual(report.read(), "")
+
+
+if __name__ == '__main__':
+    unittest.main()
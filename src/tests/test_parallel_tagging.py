@@ -0,0 +1,141 @@
+import unittest
+from pathlib import Path
+from shutil import copyfile, rmtree
+from tempfile import mkdtemp
+from os import path
+from json import loads
+from contextlib import redirect_stdout
+from io import StringIO
+
+from click.testing import CliRunner
+
+from EzAudioMeta.audio import base_audio
+from EzAudioMeta.api import Parsers, compile_parsers
+from EzAudioMeta.main import cli, tag_files
+
+
+class TestParallelTagging(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.path_to_test_files = \
+            path.join(str(Path(__file__).parent.absolute()), "test_files")
+        self.audio_directory = mkdtemp()
+        self.audio_files = []
+        for i in range(1, 5):
+            audio_file = path.join(self.audio_directory,
+                                   f"0{i}_parallel_file.mp3")
+            copyfile(path.join(self.path_to_test_files,
+                               "01_audio_test_file_3.mp3"), audio_file)
+            self.audio_files.append(audio_file)
+
+    def tearDown(self) -> None:
+        rmtree(self.audio_directory)
+
+    def test_run_cli_jobs(self) -> None:
+        '''
+        When tagging a directory with multiple worker processes:
+        1. Pass a directory with 4 valid audio files.
+        2. Set the artist and parse the track number with 2 jobs.
+        3. All files should have been tagged.
+        '''
+        runner = CliRunner()
+        result = runner.invoke(cli, ["--files-directory",
+                                     self.audio_directory,
+                                     "--artist", "Los Luciferinos",
+                                     "--parse-track-number",
+                                     "\\d+(?=_parallel)",
+                                     "--jobs", "2"])
+        self.assertEqual(result.exit_code, 0)
+
+        audio = base_audio.BaseAudio()
+        for i, audio_file in enumerate(self.audio_files, start=1):
+            audio.load_track(audio_file)
+            self.assertEqual(audio.get_tag("artist"), "Los Luciferinos")
+            self.assertEqual(audio.get_tag("tracknumber"), i)
+
+    def test_run_cli_jobs_error_is_reported(self) -> None:
+        '''
+        When one of the files of the directory is not an audio file:
+        1. Pass a directory with an image renamed as an .mp3 file.
+        2. Set the artist with 2 jobs.
+        3. Error code 1 expected, the failing file should be reported.
+        '''
+        invalid_file = path.join(self.audio_directory, "00_not_audio.mp3")
+        copyfile(path.join(self.path_to_test_files, "test_file_picture.jpg"),
+                 invalid_file)
+
+        runner = CliRunner()
+        result = runner.invoke(cli, ["--files-directory",
+                                     self.audio_directory,
+                                     "--artist", "Los Luciferinos",
+                                     "--jobs", "2"])
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn(invalid_file, result.output)
+
+    def test_parse_failures_keep_their_place(self) -> None:
+        '''
+        When a file fails to load and a later one fails to parse its name:
+        1. Tag them (and the valid files around them) with 2 jobs.
+        2. The first failure reported is the one of the earlier file.
+        3. With keep_going, the failures are summarized in the same order
+           as the files.
+        '''
+        invalid_file = path.join(self.audio_directory, "05_not_audio.mp3")
+        copyfile(path.join(self.path_to_test_files, "test_file_picture.jpg"),
+                 invalid_file)
+        unparsed_file = path.join(self.audio_directory,
+                                  "xx_parallel_file.mp3")
+        copyfile(self.audio_files[0], unparsed_file)
+        files = self.audio_files[:2] + [invalid_file] +\
+            self.audio_files[2:] + [unparsed_file]
+        parsers = compile_parsers(Parsers(track_number="\\w\\w(?=_parallel)"))
+
+        for keep_going in (False, True):
+            output = StringIO()
+            with redirect_stdout(output), self.assertRaises(SystemExit):
+                tag_files(iter(files), {"artist": "Lilith"}, parsers, 2,
+                          keep_going=keep_going)
+            output = output.getvalue()
+            self.assertIn(invalid_file, output)
+            if keep_going:
+                self.assertLess(output.index(invalid_file),
+                                output.index(unparsed_file))
+            else:
+                self.assertNotIn(unparsed_file, output)
+
+    def test_run_cli_keep_going(self) -> None:
+        '''
+        When one of the files of the directory is not an audio file, with
+        --keep-going:
+        1. Pass a directory with an image renamed as an .mp3 file.
+        2. Set the artist with 2 jobs.
+        3. The rest of the files should be tagged.
+        4. Error code 1 expected, the failure is summarized and written to
+        the failure report.
+        '''
+        invalid_file = path.join(self.audio_directory, "00_not_audio.mp3")
+        copyfile(path.join(self.path_to_test_files, "test_file_picture.jpg"),
+                 invalid_file)
+        failure_report = path.join(self.audio_directory, "failures.jsonl")
+
+        runner = CliRunner()
+        result = runner.invoke(cli, ["--files-directory",
+                                     self.audio_directory,
+                                     "--artist", "Los Luciferinos",
+                                     "--jobs", "2", "--keep-going",
+                                     "--failure-report", failure_report])
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn("4 file(s) written", result.output)
+        self.assertIn("1 file(s) failed:", result.output)
+        self.assertIn(f"  {invalid_file} [load]", result.output)
+
+        audio = base_audio.BaseAudio()
+        for audio_file in self.audio_files:
+            audio.load_track(audio_file)
+            self.assertEqual(audio.get_tag("artist"), "Los Luciferinos")
+
+        with open(failure_report) as report:
+            failures = [loads(line) for line in report]
+        self.assertEqual(len(failures), 1)
+        self.assertEqual(failures[0]["file"], invalid_file)
+        self.assertEqual(failures[0]["stage"], "load")
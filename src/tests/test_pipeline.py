@@ -0,0 +1,104 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from time import sleep
+
+from EzAudioMeta.utilities.pipeline import Finished, run_pipeline
+
+
+def slow_square(number: int) -> int:
+    # the first items take the longest, so they finish last.
+    sleep(0.001 * (20 - number % 20))
+    return number * number
+
+
+class TestPipeline(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.executor = ThreadPoolExecutor(max_workers=4)
+
+    def tearDown(self) -> None:
+        self.executor.shutdown()
+
+    def test_results_in_order(self) -> None:
+        '''
+        1. Run items that finish out of order in 4 workers.
+        2. The results should come back in the order the items were given.
+        '''
+        results = list(run_pipeline(range(200), lambda number: number,
+                                    slow_square, self.executor, 4,
+                                    queue_size=8))
+        self.assertEqual(results,
+                         [(number, number * number) for number in range(200)])
+
+    def test_prepare_drops_items(self) -> None:
+        '''
+        1. Prepare returns None for the odd numbers.
+        2. Only the even numbers should be worked on.
+        '''
+        worked = []
+
+        def work(number):
+            worked.append(number)
+            return number
+
+        results = list(run_pipeline(
+            range(10), lambda number: None if number % 2 else number, work,
+            self.executor, 2))
+        self.assertEqual([number for number, _ in results], [0, 2, 4, 6, 8])
+        self.assertEqual(sorted(worked), [0, 2, 4, 6, 8])
+
+    def test_finished_items_keep_their_place(self) -> None:
+        '''
+        1. Prepare finishes the multiples of 3 itself, the rest are slow.
+        2. Those are not worked on, and come back in their place.
+        '''
+        worked = []
+
+        def work(number):
+            worked.append(number)
+            return slow_square(number)
+
+        results = list(run_pipeline(
+            range(30), lambda number: Finished(number, -number)
+            if number % 3 == 0 else number, work, self.executor, 4,
+            queue_size=4))
+        self.assertEqual(results, [(number, -number if number % 3 == 0
+                                    else number * number)
+                                   for number in range(30)])
+        self.assertEqual(sorted(worked),
+                         [number for number in range(30) if number % 3])
+
+    def test_error_is_raised(self) -> None:
+        '''
+        1. Prepare raises an error on one of the items.
+        2. The error should be raised to the caller.
+        '''
+        def prepare(number):
+            if number == 5:
+                raise ValueError("no fives")
+            return number
+
+        with self.assertRaises(ValueError):
+            list(run_pipeline(range(10), prepare, slow_square,
+                              self.executor, 2))
+
+    def test_stop_early(self) -> None:
+        '''
+        1. Stop iterating after the first result of a long run.
+        2. The pipeline should stop without working on the rest.
+        '''
+        worked = []
+
+        def work(number):
+            worked.append(number)
+            return number
+
+        results = run_pipeline(range(100000), lambda number: number, work,
+                               self.executor, 2, queue_size=4)
+        self.assertEqual(next(results), (0, 0))
+        results.close()
+        self.assertLess(len(worked), 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+from io import StringIO
+from os import path
+from pathlib import Path
+from shutil import copyfile, rmtree
+from tempfile import mkdtemp
+from time import sleep
+
+from click.testing import CliRunner
+
+from EzAudioMeta.main import cli
+from EzAudioMeta.utilities.progress import ProgressReporter
+
+
+class TerminalStream(StringIO):
+
+    def isatty(self) -> bool:
+        return True
+
+
+class TestProgress(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.path_to_test_files = \
+            path.join(str(Path(__file__).parent.absolute()), "test_files")
+        self.directory = mkdtemp()
+
+    def tearDown(self) -> None:
+        rmtree(self.directory)
+
+    def test_log_lines(self) -> None:
+        '''
+        1. Report 4 files (one failed, one skipped) to a stream that is not
+           a terminal, with a short interval.
+        2. A line per update expected, the last one with all the files and
+           the error.
+        '''
+        stream = StringIO()
+        progress = ProgressReporter(total=4, stream=stream, interval=0.01)
+        progress.start()
+        progress.done()
+        progress.done(failed=True)
+        progress.skipped()
+        sleep(0.1)
+        progress.done()
+        progress.close()
+        lines = stream.getvalue().splitlines()
+        self.assertGreater(len(lines), 2)
+        self.assertIn("3/4 files (75.0%)", lines[0])
+        self.assertIn("files/s", lines[0])
+        self.assertIn("ETA", lines[0])
+        self.assertTrue(lines[-1].startswith("4/4 files (100.0%)"))
+        self.assertTrue(lines[-1].endswith(", 1 error(s)"))
+        self.assertNotIn("\r", stream.getvalue())
+
+    def test_terminal(self) -> None:
+        '''
+        1. Report to a terminal, the total is counted in the background.
+        2. The same line is rewritten, and ended when it's closed.
+        '''
+        stream = TerminalStream()
+        progress = ProgressReporter(stream=stream, interval=0.01)
+        progress.count_total(iter(range(5)))
+        progress.start()
+        progress.done()
+        sleep(0.1)
+        progress.close()
+        self.assertEqual(progress.total, 5)
+        output = stream.getvalue()
+        self.assertTrue(output.startswith("\r\x1b[K"))
+        self.assertEqual(output.count("\n"), 1)
+        last_line = output.split("\r\x1b[K")[-1]
+        self.assertTrue(last_line.startswith("1/5 files (20.0%)"))
+        self.assertTrue(last_line.endswith(", 0 error(s)\n"))
+
+    def test_run_cli_progress(self) -> None:
+        '''
+        1. Tag a directory with 2 mp3 files and a broken one, with
+           --progress and --keep-going.
+        2. The progress should count the 3 files and the error.
+        3. Tag it again with a state file, the files skipped are counted.
+        '''
+        for i in range(1, 3):
+            copyfile(path.join(self.path_to_test_files,
+                               "01_audio_test_file_3.mp3"),
+                     path.join(self.directory, f"0{i} song.mp3"))
+        with open(path.join(self.directory, "03 broken.mp3"), "w") as broken:
+            broken.write("not an mp3")
+        runner = CliRunner()
+        result = runner.invoke(cli, ["--files-directory", self.directory,
+                                     "--artist", "Lilith", "--jobs", "2",
+                                     "--keep-going", "--progress"])
+        self.assertEqual(result.exit_code, 1, result.output)
+        self.assertIn("3/3 files (100.0%)", result.output)
+        self.assertIn(", 1 error(s)", result.output)
+
+        state_file = path.join(self.directory, "state.db")
+        for _ in range(2):
+            result = runner.invoke(cli, ["--files-directory", self.directory,
+                                         "--artist", "Lilith", "--jobs", "1",
+                                         "--state-file", state_file,
+                                         "--keep-going", "--progress"])
+        self.assertIn("2 file(s) not opened", result.output)
+        self.assertIn("3/3 files (100.0%)", result.output)
+
+
+if __name__ == '__main__':
+    unittest.main()
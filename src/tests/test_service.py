@@ -0,0 +1,352 @@
+import unittest
+from http.client import HTTPConnection
+from json import dumps, loads
+from os import environ, path, read, symlink
+from pathlib import Path
+from shutil import copyfile, rmtree
+from signal import SIGINT
+from socket import socket, AF_UNIX, SOCK_STREAM
+from subprocess import Popen, PIPE, STDOUT
+from tempfile import mkdtemp
+from threading import Thread
+from time import monotonic
+import select
+import sys
+
+from EzAudioMeta.audio import base_audio
+from EzAudioMeta.service import TaggingService, make_server, parse_address
+
+SRC_DIRECTORY = str(Path(__file__).parent.parent.absolute())
+
+
+class UnixHTTPConnection(HTTPConnection):
+
+    def __init__(self, socket_path: str) -> None:
+        super().__init__("localhost")
+        self.socket_path = socket_path
+
+    def connect(self) -> None:
+        self.sock = socket(AF_UNIX, SOCK_STREAM)
+        self.sock.connect(self.socket_path)
+
+
+def request(connection: HTTPConnection, route: str, body=None) -> tuple:
+    '''
+    Returns: a tuple (status, response) of a POST of the body as JSON (a
+    GET if there is no body).
+    '''
+    if body is None:
+        connection.request("GET", route)
+    else:
+        data = body if isinstance(body, bytes) else dumps(body).encode()
+        connection.request("POST", route, data,
+                           {"Content-Type": "application/json"})
+    response = connection.getresponse()
+    return response.status, loads(response.read())
+
+
+class TestService(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.service = TaggingService(jobs=2)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.service.close()
+
+    def setUp(self) -> None:
+        self.audio_directory = mkdtemp()
+        self.audio_files = []
+        for i in range(1, 3):
+            audio_file = path.join(self.audio_directory,
+                                   f"0{i}_served_file.mp3")
+            copyfile(path.join(SRC_DIRECTORY, "tests", "test_files",
+                               "01_audio_test_file_3.mp3"), audio_file)
+            self.audio_files.append(audio_file)
+        self.servers = []
+
+    def tearDown(self) -> None:
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+        rmtree(self.audio_directory)
+
+    def start_server(self, address):
+        server = make_server(address, self.service)
+        Thread(target=server.serve_forever, daemon=True).start()
+        self.servers.append(server)
+        return server
+
+    def connection(self) -> HTTPConnection:
+        server = self.start_server(("127.0.0.1", 0))
+        return HTTPConnection(*server.server_address)
+
+    def test_set_and_get(self) -> None:
+        '''
+        1. Set the artist and the track number of a file.
+        2. Get them back.
+        3. Set them again, the file is not written.
+        '''
+        connection = self.connection()
+        tags = {"artist": "Los Luciferinos", "tracknumber": 7}
+        status, response = request(connection, "/set",
+                                   dict(tags, file=self.audio_files[0]))
+        self.assertEqual(status, 200)
+        self.assertEqual(response["written"], True)
+
+        status, response = request(connection, "/get",
+                                   {"file": self.audio_files[0],
+                                    "tags": ["artist", "tracknumber"]})
+        self.assertEqual(status, 200)
+        self.assertEqual(response, dict(tags, file=self.audio_files[0]))
+
+        status, response = request(connection, "/set",
+                                   dict(tags, file=self.audio_files[0]))
+        self.assertEqual((status, response["written"]), (200, False))
+        self.assertEqual(request(connection, "/status"),
+                         (200, {"status": "ok", "workers": 2}))
+
+    def test_batch(self) -> None:
+        '''
+        1. Send a batch that sets 2 files, gets one of them, and sets a
+           file that is not an actual mp3.
+        2. The results are in the same order, the broken file has its
+           error and the rest are done.
+        '''
+        broken_file = path.join(self.audio_directory, "03_broken.mp3")
+        with open(broken_file, "w") as text_file:
+            text_file.write("not an mp3")
+        connection = self.connection()
+        status, response = request(connection, "/batch", {"requests": [
+            {"op": "set", "file": self.audio_files[0], "album": "Infierno"},
+            {"op": "set", "file": self.audio_files[1], "album": "Cielo"},
+            {"op": "get", "file": self.audio_files[0], "tags": ["album"]},
+            {"op": "set", "file": broken_file, "album": "Limbo"},
+        ]})
+        self.assertEqual(status, 200)
+        results = response["results"]
+        self.assertEqual([result.get("written") for result in results[:2]],
+                         [True, True])
+        self.assertEqual(results[2], {"file": self.audio_files[0],
+                                      "album": "Infierno"})
+        self.assertEqual(results[3]["file"], broken_file)
+        self.assertEqual(results[3]["error"]["stage"], "load")
+
+        audio = base_audio.BaseAudio()
+        audio.load_track(self.audio_files[1])
+        self.assertEqual(audio.get_tag("album"), "Cielo")
+
+    def test_invalid_requests(self) -> None:
+        '''
+        1. Send requests with an unknown tag, a tag of the wrong type (a
+           list or an object too), a file that is not a string, a missing
+           file, invalid JSON, a bad batch and an unknown route.
+        2. 400 (404 for the route) expected with what is wrong.
+        '''
+        connection = self.connection()
+        missing_file = path.join(self.audio_directory, "nope.mp3")
+        for route, body, status, message in [
+                ("/set", {"file": self.audio_files[0], "mood": "happy"},
+                 400, "Unknown column: 'mood'."),
+                ("/set", {"file": self.audio_files[0], "year": "1984 AD"},
+                 400, "'year' is expected to be a sequence of numbers."),
+                ("/set", {"file": self.audio_files[0], "tracknumber": [7]},
+                 400, "'tracknumber' is expected to be a sequence of"),
+                ("/set", {"file": self.audio_files[0], "year": {"y": 1}},
+                 400, "'year' is expected to be a sequence of numbers."),
+                ("/get", {"file": [self.audio_files[0]]}, 400,
+                 "'file' is expected to be a sequence of characters."),
+                ("/set", {"file": self.audio_files[0]}, 400,
+                 "No tags to set."),
+                ("/get", {"file": missing_file}, 400,
+                 f"{missing_file} doesn't exist or is not a file."),
+                ("/get", {"file": self.audio_files[0], "tags": ["mood"]},
+                 400, "'tags' is expected to be a list of"),
+                ("/set", b"{not json", 400, "Invalid JSON"),
+                ("/batch", {"requests": [{"op": "delete"}]}, 400,
+                 "requests[0]: 'op' is expected to be 'set' or 'get'."),
+                ("/delete", {}, 404, "Unknown route: /delete")]:
+            response_status, response = request(connection, route, body)
+            self.assertEqual(response_status, status, response)
+            self.assertIn(message, response["error"]["message"])
+
+    def test_cross_site_requests(self) -> None:
+        '''
+        1. Send a set as text/plain (like a form of a web page), and with
+           the Host of another site (like after DNS rebinding).
+        2. 415 and 403 expected, the file is left as it was.
+        3. localhost with the port is accepted, and any Host on a Unix
+           socket.
+        '''
+        server = self.start_server(("127.0.0.1", 0))
+        port = server.server_address[1]
+        body = dumps({"file": self.audio_files[0], "artist": "pwned"})
+        for headers, status in [
+                ({"Content-Type": "text/plain"}, 415),
+                ({"Content-Type": "application/json",
+                  "Host": f"evil.example:{port}"}, 403),
+                ({"Content-Type": "application/json",
+                  "Host": "127.0.0.1"}, 403)]:
+            connection = HTTPConnection(*server.server_address)
+            connection.request("POST", "/set", body, headers)
+            response = connection.getresponse()
+            self.assertEqual(response.status, status)
+            self.assertIn("expected to be", loads(response.read())["error"]
+                          ["message"])
+        connection = HTTPConnection(*server.server_address)
+        connection.request("GET", "/status",
+                           headers={"Host": f"evil.example:{port}"})
+        self.assertEqual(connection.getresponse().status, 403)
+        audio = base_audio.BaseAudio()
+        audio.load_track(self.audio_files[0])
+        self.assertNotEqual(audio.get_tag("artist"), "pwned")
+
+        connection = HTTPConnection(*server.server_address)
+        connection.request("POST", "/set", body,
+                           {"Content-Type": "application/json",
+                            "Host": f"localhost:{port}"})
+        self.assertEqual(connection.getresponse().status, 200)
+        socket_path = path.join(self.audio_directory, "ezaudio.sock")
+        self.start_server(socket_path)
+        connection = UnixHTTPConnection(socket_path)
+        connection.request("POST", "/get", body,
+                           {"Content-Type": "application/json",
+                            "Host": "evil.example"})
+        self.assertEqual(connection.getresponse().status, 200)
+
+    def test_concurrent_requests_same_file(self) -> None:
+        '''
+        1. Set a different comment to the same file (by its path and by a
+           link to it) from several clients at the same time.
+        2. Every request succeeds, and the file ends with one of the
+           comments.
+        '''
+        link = path.join(self.audio_directory, "link.mp3")
+        symlink(self.audio_files[0], link)
+        server = self.start_server(("127.0.0.1", 0))
+        responses = []
+
+        def set_comment(i: int) -> None:
+            connection = HTTPConnection(*server.server_address)
+            responses.append(request(connection, "/set", {
+                "file": link if i % 2 else self.audio_files[0],
+                "comment": f"comment {i} " * 100}))
+
+        clients = [Thread(target=set_comment, args=(i,)) for i in range(8)]
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        self.assertEqual([status for status, _ in responses], [200] * 8)
+
+        audio = base_audio.BaseAudio()
+        audio.load_track(self.audio_files[0])
+        self.assertIn(audio.get_tag("comment"),
+                      [f"comment {i} " * 100 for i in range(8)])
+
+    def test_unix_socket(self) -> None:
+        '''
+        1. Serve on a Unix socket.
+        2. Set and get a tag through it.
+        '''
+        socket_path = path.join(self.audio_directory, "ezaudio.sock")
+        self.start_server(socket_path)
+        connection = UnixHTTPConnection(socket_path)
+        status, _ = request(connection, "/set",
+                            {"file": self.audio_files[1], "genre": "Cumbia"})
+        self.assertEqual(status, 200)
+        self.assertEqual(request(connection, "/get",
+                                 {"file": self.audio_files[1],
+                                  "tags": ["genre"]}),
+                         (200, {"file": self.audio_files[1],
+                                "genre": "Cumbia"}))
+
+    def test_unix_socket_path_taken(self) -> None:
+        '''
+        1. Serve on the path of a regular file.
+        2. FileExistsError expected, and the file is left as it was.
+        '''
+        notes = path.join(self.audio_directory, "notes.txt")
+        with open(notes, "w") as text_file:
+            text_file.write("not a socket")
+        with self.assertRaisesRegex(FileExistsError, "not a socket"):
+            make_server(notes, self.service)
+        with open(notes) as text_file:
+            self.assertEqual(text_file.read(), "not a socket")
+
+    def test_parse_address(self) -> None:
+        '''
+        1. Parse ports, loopback addresses and socket paths.
+        2. Addresses that are not loopback raise ValueError.
+        '''
+        self.assertEqual(parse_address("8765"), ("127.0.0.1", 8765))
+        self.assertEqual(parse_address("localhost:80"), ("localhost", 80))
+        self.assertEqual(parse_address("[::1]:9000"), ("::1", 9000))
+        self.assertEqual(parse_address("/run/ezaudio.sock"),
+                         "/run/ezaudio.sock")
+        for address in ["0.0.0.0:8765", "192.168.1.2:80", "example.com:80"]:
+            with self.assertRaises(ValueError):
+                parse_address(address)
+
+
+class TestRunCliServe(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = mkdtemp()
+        self.output = ""
+
+    def tearDown(self) -> None:
+        rmtree(self.directory)
+
+    def wait_for_output(self, process: Popen, text: str,
+                        timeout: float = 20) -> None:
+        deadline = monotonic() + timeout
+        while text not in self.output:
+            remaining = deadline - monotonic()
+            self.assertGreater(remaining, 0, self.output)
+            readable, _, _ = select.select([process.stdout], [], [],
+                                           remaining)
+            if readable:
+                data = read(process.stdout.fileno(), 4096)
+                self.assertTrue(data, self.output)
+                self.output += data.decode()
+
+    def test_run_cli_serve(self) -> None:
+        '''
+        1. Serve on a Unix socket with the cli.
+        2. Set a tag through it.
+        3. Ctrl+C stops it, exit code 0 expected and the socket removed.
+        '''
+        audio_file = path.join(self.directory, "01_served_file.mp3")
+        copyfile(path.join(SRC_DIRECTORY, "tests", "test_files",
+                           "01_audio_test_file_3.mp3"), audio_file)
+        socket_path = path.join(self.directory, "ezaudio.sock")
+        env = dict(environ, PYTHONPATH=SRC_DIRECTORY)
+        process = Popen([sys.executable, "-u", "-m", "EzAudioMeta.main",
+                         "--serve", socket_path, "--jobs", "1"],
+                        stdout=PIPE, stderr=STDOUT, env=env,
+                        cwd=SRC_DIRECTORY)
+        try:
+            self.wait_for_output(process, f"Serving on unix:{socket_path}")
+            status, response = request(UnixHTTPConnection(socket_path),
+                                       "/set", {"file": audio_file,
+                                                "artist": "Lilith"})
+            self.assertEqual(status, 200, response)
+            process.send_signal(SIGINT)
+            self.wait_for_output(process, "Stopped serving.")
+            process.wait(20)
+        finally:
+            if process.poll() is None:
+                process.kill()
+            process.stdout.close()
+        self.assertEqual(process.returncode, 0)
+        self.assertFalse(path.exists(socket_path))
+
+        audio = base_audio.BaseAudio()
+        audio.load_track(audio_file)
+        self.assertEqual(audio.get_tag("artist"), "Lilith")
+
+
+if __name__ == '__main__':
+    unittest.main()
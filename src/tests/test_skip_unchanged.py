@@ -0,0 +1,65 @@
+import unittest
+from pathlib import Path
+from shutil import copyfile, rmtree
+from tempfile import mkdtemp
+from os import path, stat
+
+from click.testing import CliRunner
+
+from EzAudioMeta.audio import base_audio
+from EzAudioMeta.main import cli
+
+
+class TestSkipUnchanged(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.audio_directory = mkdtemp()
+        self.audio_file = path.join(self.audio_directory,
+                                    "01_audio_test_file_3.mp3")
+        copyfile(path.join(str(Path(__file__).parent.absolute()),
+                           "test_files", "01_audio_test_file_3.mp3"),
+                 self.audio_file)
+
+    def tearDown(self) -> None:
+        rmtree(self.audio_directory)
+
+    def test_write_tags_unchanged(self) -> None:
+        '''
+        When setting tags that already have the same value:
+        1. Set and write the album and year.
+        2. Load the file again and set the same values.
+        3. write_tags should skip the save, the file should be untouched.
+        '''
+        ba_audio = base_audio.BaseAudio()
+        ba_audio.load_track(self.audio_file)
+        ba_audio.set_tags(album="Fragments of Light", year=2019)
+        self.assertTrue(ba_audio.write_tags())
+        modified = stat(self.audio_file).st_mtime_ns
+
+        ba_audio = base_audio.BaseAudio()
+        ba_audio.load_track(self.audio_file)
+        ba_audio.set_tags(album="Fragments of Light", year=2019,
+                          albumartist="")
+        self.assertFalse(ba_audio.write_tags())
+        self.assertEqual(stat(self.audio_file).st_mtime_ns, modified)
+
+        ba_audio.set_tag("year", 2020)
+        self.assertTrue(ba_audio.write_tags())
+
+    def test_run_cli_reports_written_and_skipped(self) -> None:
+        '''
+        When running the CLI twice with the same tags:
+        1. The first run should write the file.
+        2. The second run should skip it.
+        '''
+        runner = CliRunner()
+        arguments = ["--file", self.audio_file, "--artist", "Lucifer"]
+        result = runner.invoke(cli, arguments)
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(result.output, "1 file(s) written, 0 file(s)" +
+                         " skipped (tags already up to date).\n")
+
+        result = runner.invoke(cli, arguments)
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(result.output, "0 file(s) written, 1 file(s)" +
+                         " skipped (tags already up to date).\n")
@@ -0,0 +1,93 @@
+import unittest
+from pathlib import Path
+from shutil import copyfile, rmtree
+from tempfile import mkdtemp
+from os import path, remove, utime
+
+from click.testing import CliRunner
+
+from EzAudioMeta.main import cli
+from EzAudioMeta.utilities.state_index import StateIndex, tags_digest
+
+
+class TestStateIndex(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.audio_directory = mkdtemp()
+        self.audio_file = path.join(self.audio_directory,
+                                    "01_audio_test_file_3.mp3")
+        copyfile(path.join(str(Path(__file__).parent.absolute()),
+                           "test_files", "01_audio_test_file_3.mp3"),
+                 self.audio_file)
+        self.state_file = path.join(self.audio_directory, "state.db")
+
+    def tearDown(self) -> None:
+        rmtree(self.audio_directory)
+
+    def test_tags_digest(self) -> None:
+        '''
+        1. Given the same tags in a different order.
+        2. The digest should be the same, and change if a value changes.
+        '''
+        self.assertEqual(tags_digest({"album": "a", "year": 1}),
+                         tags_digest({"year": 1, "album": "a"}))
+        self.assertNotEqual(tags_digest({"album": "a", "year": 1}),
+                            tags_digest({"album": "a", "year": 2}))
+
+    def test_is_up_to_date(self) -> None:
+        '''
+        1. Record a file with a tags digest.
+        2. It should be up to date for the same digest only.
+        3. Once the file is modified it's no longer up to date.
+        '''
+        digest = tags_digest({"artist": "Lucifer"})
+        state_index = StateIndex(self.state_file)
+        self.assertFalse(state_index.is_up_to_date(self.audio_file, digest))
+        state_index.record(self.audio_file, digest)
+        self.assertTrue(state_index.is_up_to_date(self.audio_file, digest))
+        self.assertFalse(state_index.is_up_to_date(self.audio_file,
+                                                   tags_digest({})))
+        utime(self.audio_file, ns=(0, 0))
+        self.assertFalse(state_index.is_up_to_date(self.audio_file, digest))
+        state_index.close()
+
+    def test_compact(self) -> None:
+        '''
+        1. Record a file, then delete it.
+        2. Compacting the index should remove its entry.
+        '''
+        state_index = StateIndex(self.state_file)
+        state_index.record(self.audio_file, tags_digest({}))
+        remove(self.audio_file)
+        self.assertEqual(state_index.compact(), 1)
+        self.assertEqual(state_index.compact(), 0)
+        state_index.close()
+
+    def test_run_cli_state_file(self) -> None:
+        '''
+        When running the CLI twice with the same tags and state file:
+        1. The first run should tag the file.
+        2. The second run should not open it.
+        3. With --force it's opened again.
+        '''
+        runner = CliRunner()
+        arguments = ["--file", self.audio_file, "--artist", "Lucifer",
+                     "--state-file", self.state_file]
+        result = runner.invoke(cli, arguments)
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("0 file(s) not opened", result.output)
+
+        result = runner.invoke(cli, arguments)
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("0 file(s) written, 0 file(s) skipped", result.output)
+        self.assertIn("1 file(s) not opened", result.output)
+
+        result = runner.invoke(cli, arguments + ["--force"])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("0 file(s) written, 1 file(s) skipped", result.output)
+
+        result = runner.invoke(cli, ["--compact-state",
+                                     "--state-file", self.state_file])
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(result.output, "0 stale entrie(s) removed from" +
+                         f" {self.state_file}.\n")
@@ -0,0 +1,114 @@
+import unittest
+from csv import DictReader
+from json import loads
+from pathlib import Path
+from shutil import copyfile, rmtree
+from tempfile import mkdtemp
+from os import path
+
+from click.testing import CliRunner
+
+from EzAudioMeta.main import cli, export_tags
+from tests.audio_files import untagged_mp3
+
+
+class TestTagExport(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.path_to_test_files = \
+            path.join(str(Path(__file__).parent.absolute()), "test_files")
+        self.audio_directory = mkdtemp()
+        self.output_directory = mkdtemp()
+        self.audio_files = []
+        for i in range(1, 5):
+            audio_file = untagged_mp3(self.audio_directory,
+                                      f"0{i}_exported_file")
+            self.audio_files.append(audio_file)
+        runner = CliRunner()
+        result = runner.invoke(cli, ["--files-directory",
+                                     self.audio_directory,
+                                     "--artist", "Los Luciferinos, \"LL\"",
+                                     "--parse-track-number",
+                                     "\\d+(?=_exported)",
+                                     "--jobs", "1"])
+        self.assertEqual(result.exit_code, 0)
+
+    def tearDown(self) -> None:
+        rmtree(self.audio_directory)
+        rmtree(self.output_directory)
+
+    def test_export_jsonl(self) -> None:
+        '''
+        1. Export the tags of a tagged directory as JSON lines with 2 jobs.
+        2. A line per file is expected, with all the tags.
+        '''
+        output = path.join(self.output_directory, "tags.jsonl")
+        runner = CliRunner()
+        result = runner.invoke(cli, ["--files-directory",
+                                     self.audio_directory,
+                                     "--export", "jsonl",
+                                     "--export-output", output,
+                                     "--jobs", "2"])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("4 file(s) exported.", result.output)
+
+        with open(output, encoding="utf-8") as exported:
+            rows = sorted((loads(line) for line in exported),
+                          key=lambda row: row["file"])
+        self.assertEqual([row["file"] for row in rows], self.audio_files)
+        for i, row in enumerate(rows, start=1):
+            self.assertEqual(list(row), ["file"] + export_tags)
+            self.assertEqual(row["artist"], "Los Luciferinos, \"LL\"")
+            self.assertEqual(row["tracknumber"], i)
+            self.assertIsNone(row["album"])
+
+    def test_export_csv_to_stdout(self) -> None:
+        '''
+        1. Export the tags of a single file as CSV to the standard output.
+        2. A header and a row are expected, quoted as CSV.
+        '''
+        runner = CliRunner()
+        result = runner.invoke(cli, ["--file", self.audio_files[1],
+                                     "--export", "csv"])
+        self.assertEqual(result.exit_code, 0)
+        rows = list(DictReader(result.stdout.splitlines()))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["file"], self.audio_files[1])
+        self.assertEqual(rows[0]["artist"], "Los Luciferinos, \"LL\"")
+        self.assertEqual(rows[0]["tracknumber"], "2")
+        self.assertEqual(rows[0]["album"], "")
+        self.assertIn("1 file(s) exported.", result.stderr)
+
+    def test_export_keep_going(self) -> None:
+        '''
+        1. Export a directory with an image renamed as an .mp3 file.
+        2. Without --keep-going, error code 1 and the file reported.
+        3. With --keep-going, the other files are exported and the failure
+           summarized.
+        '''
+        invalid_file = path.join(self.audio_directory, "00_not_audio.mp3")
+        copyfile(path.join(self.path_to_test_files, "test_file_picture.jpg"),
+                 invalid_file)
+        output = path.join(self.output_directory, "tags.jsonl")
+        runner = CliRunner()
+        result = runner.invoke(cli, ["--files-directory",
+                                     self.audio_directory,
+                                     "--export", "jsonl",
+                                     "--export-output", output])
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn(invalid_file, result.output)
+
+        result = runner.invoke(cli, ["--files-directory",
+                                     self.audio_directory,
+                                     "--export", "jsonl",
+                                     "--export-output", output,
+                                     "--keep-going"])
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn("4 file(s) exported.", result.output)
+        self.assertIn(f"{invalid_file} [load]", result.output)
+        with open(output, encoding="utf-8") as exported:
+            self.assertEqual(len(exported.readlines()), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
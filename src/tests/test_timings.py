@@ -0,0 +1,135 @@
+import unittest
+from pathlib import Path
+from pstats import Stats
+from shutil import copyfile, rmtree
+from tempfile import mkdtemp
+from os import environ, path
+from subprocess import run
+import sys
+
+from click.testing import CliRunner
+
+from EzAudioMeta.main import cli
+from EzAudioMeta.utilities.instrumentation import Profiler, StageTimings
+
+SRC_DIRECTORY = str(Path(__file__).parent.parent.absolute())
+
+
+class TestTimings(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.audio_directory = mkdtemp()
+        for i in range(1, 4):
+            copyfile(path.join(str(Path(__file__).parent.absolute()),
+                               "test_files", "01_audio_test_file_3.mp3"),
+                     path.join(self.audio_directory, f"0{i}_timed_file.mp3"))
+
+    def tearDown(self) -> None:
+        rmtree(self.audio_directory)
+
+    def test_stage_stats(self) -> None:
+        '''
+        1. Add the seconds of the stages of 20 files.
+        2. The count, total, p50, p95 and max of each stage are expected.
+        3. Only the slowest files are kept, the slowest first.
+        '''
+        timings = StageTimings(slowest=3)
+        for i in range(1, 21):
+            timings.add_file(f"file_{i}", {"load": i / 1000,
+                                           "write": 0.001})
+        stats = timings.stats()
+        self.assertEqual(list(stats), ["load", "write"])
+        count, total, p50, p95, maximum = stats["load"]
+        self.assertEqual(count, 20)
+        self.assertAlmostEqual(total, 0.21)
+        self.assertAlmostEqual(p50, 0.010)
+        self.assertAlmostEqual(p95, 0.019)
+        self.assertAlmostEqual(maximum, 0.020)
+        self.assertEqual([file for _, file in timings.slowest()],
+                         ["file_20", "file_19", "file_18"])
+
+    def test_stage_stats_sampled(self) -> None:
+        '''
+        1. Add the seconds of 20000 files, keeping only 1000 samples.
+        2. The count, total and max are exact.
+        3. The p50 and p95 are close to the exact ones.
+        '''
+        timings = StageTimings(samples=1000)
+        for i in range(1, 20_001):
+            timings.add("parse", i / 1_000_000)
+        self.assertEqual(len(timings._seconds["parse"]), 1000)
+        count, total, p50, p95, maximum = timings.stats()["parse"]
+        self.assertEqual(count, 20_000)
+        self.assertAlmostEqual(total, 200.01)
+        self.assertAlmostEqual(maximum, 0.02)
+        self.assertAlmostEqual(p50, 0.01, delta=0.001)
+        self.assertAlmostEqual(p95, 0.019, delta=0.001)
+
+    def test_run_cli_timings(self) -> None:
+        '''
+        1. Tag a directory with --timings.
+        2. The stats of every stage and the slowest files are printed.
+        '''
+        runner = CliRunner()
+        result = runner.invoke(cli, ["--files-directory",
+                                     self.audio_directory,
+                                     "--artist", "Los Luciferinos",
+                                     "--timings", "--jobs", "2"])
+        self.assertEqual(result.exit_code, 0)
+        for stage in ("discover", "parse", "read_header", "load", "set",
+                      "write"):
+            self.assertRegex(result.output, f"\\n{stage} +3 ")
+        self.assertIn("Slowest 3 file(s):", result.output)
+
+    def test_run_cli_profile(self) -> None:
+        '''
+        1. Tag a directory with --profile and 1 job.
+        2. A pstats file is written, the tagging itself is in it.
+        '''
+        stats_file = path.join(self.audio_directory, "run.stats")
+        runner = CliRunner()
+        result = runner.invoke(cli, ["--files-directory",
+                                     self.audio_directory,
+                                     "--artist", "Los Luciferinos",
+                                     "--profile", stats_file,
+                                     "--jobs", "1"])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn(f"Profile written to {stats_file}", result.output)
+        functions = [function for _, _, function in Stats(stats_file).stats]
+        self.assertIn("tag_file", functions)
+        self.assertIn("tag_files", functions)
+
+    def test_run_cli_profile_process(self) -> None:
+        '''
+        1. Run the cli in a process of its own with --profile, with 2 jobs
+           and a file name parser, so the pipeline threads are profiled too.
+        2. Exit code 0 expected, and the parsing (done in a thread of the
+           pipeline) is in the pstats file.
+        '''
+        stats_file = path.join(self.audio_directory, "run.stats")
+        env = dict(environ, PYTHONPATH=SRC_DIRECTORY)
+        process = run([sys.executable, "-m", "EzAudioMeta.main",
+                       "--files-directory", self.audio_directory,
+                       "--parse-track-number", "\\d+(?=_timed)",
+                       "--profile", stats_file, "--jobs", "2"],
+                      capture_output=True, text=True, env=env,
+                      cwd=SRC_DIRECTORY, timeout=120)
+        self.assertEqual(process.returncode, 0,
+                         process.stdout + process.stderr)
+        self.assertIn(f"Profile written to {stats_file}", process.stdout)
+        functions = [function for _, _, function in Stats(stats_file).stats]
+        self.assertIn("_parsed_tags", functions)
+        self.assertIn("tag_files", functions)
+
+    def test_nothing_profiled(self) -> None:
+        '''
+        1. Dump a profiler that was never enabled.
+        2. False expected, and no file written.
+        '''
+        stats_file = path.join(self.audio_directory, "empty.stats")
+        self.assertFalse(Profiler().dump(stats_file))
+        self.assertFalse(path.exists(stats_file))
+
+
+if __name__ == '__main__':
+    unittest.main()
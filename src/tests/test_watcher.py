@@ -0,0 +1,212 @@
+import unittest
+from os import environ, path, read
+from pathlib import Path
+from shutil import copyfile, rmtree
+from signal import SIGINT
+from subprocess import Popen, PIPE, STDOUT
+from tempfile import mkdtemp
+from threading import Thread
+from time import monotonic, sleep
+import select
+import sys
+
+from EzAudioMeta.audio import base_audio
+from EzAudioMeta.utilities.watcher import DirectoryWatcher, _Inotify
+
+SRC_DIRECTORY = str(Path(__file__).parent.parent.absolute())
+INOTIFY_AVAILABLE = _Inotify.open() is not None
+EXTENSIONS = frozenset(["mp3", "flac"])
+SETTLE = 0.3
+
+
+class WatcherTests:
+    '''
+    The tests of DirectoryWatcher, run with each method.
+    '''
+    polling = None
+
+    def setUp(self) -> None:
+        self.directory = mkdtemp()
+        self.existing_file = self.write_file("01_existing.mp3")
+        self.watcher = DirectoryWatcher(self.directory, EXTENSIONS,
+                                        recursive=True, settle=SETTLE,
+                                        polling=self.polling,
+                                        poll_interval=0.05,
+                                        rescan_interval=0.5)
+
+    def tearDown(self) -> None:
+        self.watcher.close()
+        rmtree(self.directory)
+
+    def write_file(self, name: str, data: bytes = b"audio") -> str:
+        file = path.join(self.directory, name)
+        with open(file, "ab") as audio_file:
+            audio_file.write(data)
+        return file
+
+    def test_method(self) -> None:
+        '''
+        1. The watcher uses the method asked for.
+        '''
+        self.assertEqual(self.watcher.method,
+                         "polling" if self.polling else "inotify")
+
+    def test_existing_and_new_files(self) -> None:
+        '''
+        1. The file already there is returned first.
+        2. A new audio file is returned, a file with another extension is
+           not.
+        3. Writing to a returned file (acknowledged) is not a change.
+        4. Modifying it again later is.
+        '''
+        self.assertEqual(self.watcher.poll(5), [self.existing_file])
+        self.watcher.acknowledge([self.existing_file])
+
+        new_file = self.write_file("02_new.flac")
+        self.write_file("cover.jpg")
+        self.assertEqual(self.watcher.poll(5), [new_file])
+        self.write_file("02_new.flac", b" tags")
+        self.watcher.acknowledge([new_file])
+        self.assertEqual(self.watcher.poll(SETTLE * 3), [])
+
+        sleep(0.01)
+        self.write_file("01_existing.mp3", b" more")
+        self.assertEqual(self.watcher.poll(5), [self.existing_file])
+
+    def test_new_sub_directory(self) -> None:
+        '''
+        1. Move a directory with a file into the watched directory.
+        2. Its file is returned.
+        '''
+        self.watcher.acknowledge(self.watcher.poll(5))
+        album = mkdtemp()
+        with open(path.join(album, "03_moved.mp3"), "wb") as audio_file:
+            audio_file.write(b"audio")
+        moved_album = path.join(self.directory, "album")
+        Path(album).rename(moved_album)
+        self.assertEqual(self.watcher.poll(5),
+                         [path.join(moved_album, "03_moved.mp3")])
+
+    def test_partially_written_file(self) -> None:
+        '''
+        1. Write a file bit by bit, for longer than the settle time.
+        2. It's returned once, after the last write, with all its data.
+        '''
+        self.watcher.acknowledge(self.watcher.poll(5))
+
+        def slow_copy() -> None:
+            for _ in range(8):
+                self.write_file("04_slow.mp3", b"x" * 1000)
+                sleep(SETTLE / 3)
+
+        copy = Thread(target=slow_copy)
+        copy.start()
+        settled = self.watcher.poll(10)
+        copy.join()
+        self.assertEqual(settled, [path.join(self.directory, "04_slow.mp3")])
+        self.assertEqual(path.getsize(settled[0]), 8000)
+
+
+class TestPollingWatcher(WatcherTests, unittest.TestCase):
+    polling = True
+
+    def test_only_changed_directories_listed(self) -> None:
+        '''
+        1. Poll a directory with a sub directory, without rescans.
+        2. A file added to the sub directory is returned.
+        3. A file modified in place is not, until everything is listed
+           again.
+        '''
+        sub_directory = path.join(self.directory, "album")
+        Path(sub_directory).mkdir()
+        watcher = DirectoryWatcher(self.directory, EXTENSIONS,
+                                   recursive=True, settle=SETTLE,
+                                   polling=True, poll_interval=0.05,
+                                   rescan_interval=3600)
+        try:
+            watcher.acknowledge(watcher.poll(5))
+            new_file = self.write_file(path.join("album", "05_new.mp3"))
+            self.assertEqual(watcher.poll(5), [new_file])
+            watcher.acknowledge([new_file])
+
+            sleep(0.01)
+            self.write_file("01_existing.mp3", b" more")
+            self.assertEqual(watcher.poll(SETTLE * 3), [])
+            watcher._next_rescan = 0
+            self.assertEqual(watcher.poll(5), [self.existing_file])
+        finally:
+            watcher.close()
+
+
+@unittest.skipUnless(INOTIFY_AVAILABLE, "inotify is not available")
+class TestInotifyWatcher(WatcherTests, unittest.TestCase):
+    polling = False
+
+
+class TestRunCliWatch(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.test_file = path.join(SRC_DIRECTORY, "tests", "test_files",
+                                   "01_audio_test_file_3.mp3")
+        self.audio_directory = mkdtemp()
+        self.output = ""
+
+    def tearDown(self) -> None:
+        rmtree(self.audio_directory)
+
+    def wait_for_output(self, process: Popen, text: str,
+                        timeout: float = 20) -> None:
+        deadline = monotonic() + timeout
+        while text not in self.output:
+            remaining = deadline - monotonic()
+            self.assertGreater(remaining, 0, self.output)
+            readable, _, _ = select.select([process.stdout], [], [],
+                                           remaining)
+            if readable:
+                data = read(process.stdout.fileno(), 4096)
+                self.assertTrue(data, self.output)
+                self.output += data.decode()
+
+    def test_run_cli_watch(self) -> None:
+        '''
+        1. Watch a directory with a file, with the artist and the parsed
+           track number.
+        2. The file already there is tagged.
+        3. A file copied in is tagged.
+        4. Ctrl+C stops the watch, exit code 0 expected.
+        '''
+        copyfile(self.test_file, path.join(self.audio_directory,
+                                           "01_watched_file.mp3"))
+        env = dict(environ, PYTHONPATH=SRC_DIRECTORY)
+        process = Popen([sys.executable, "-u", "-m", "EzAudioMeta.main",
+                         "--files-directory", self.audio_directory,
+                         "--watch", "--watch-settle", "0.2",
+                         "--artist", "Los Luciferinos",
+                         "--parse-track-number", "\\d+(?=_watched)",
+                         "--jobs", "1"],
+                        stdout=PIPE, stderr=STDOUT, env=env,
+                        cwd=SRC_DIRECTORY)
+        try:
+            self.wait_for_output(process, "1 file(s) written")
+            self.output = ""
+            copyfile(self.test_file, path.join(self.audio_directory,
+                                               "02_watched_file.mp3"))
+            self.wait_for_output(process, "1 file(s) written")
+            process.send_signal(SIGINT)
+            process.wait(20)
+        finally:
+            if process.poll() is None:
+                process.kill()
+            process.stdout.close()
+        self.assertEqual(process.returncode, 0)
+
+        audio = base_audio.BaseAudio()
+        for i in range(1, 3):
+            audio.load_track(path.join(self.audio_directory,
+                                       f"0{i}_watched_file.mp3"))
+            self.assertEqual(audio.get_tag("artist"), "Los Luciferinos")
+            self.assertEqual(audio.get_tag("tracknumber"), i)
+
+
+if __name__ == '__main__':
+    unittest.main()